@@ -0,0 +1,185 @@
+"""Fixed-rate load test of the API, with per-endpoint latency percentiles.
+
+Requests are sent at a fixed rate (``--rps``) for ``--duration`` seconds
+from a mix of endpoints, whatever the responses take. Latency is measured
+from when each request was *due*, so a server that falls behind shows up as
+growing latency instead of a quietly lower request rate.
+
+By default the app runs in-process on a seeded SQLite database, which needs
+no server and is good for comparing changes. ``--url`` points it at a
+running instance instead, whose database must already have been seeded
+with :mod:`benchmarks.seed` using the same ``--spots/--ratings/--reviews``::
+
+    python -m benchmarks.load --rps 200 --duration 30 --ratings 200000
+    python -m benchmarks.load --url http://localhost:8000 --rps 500
+
+The report is JSON: for each endpoint, requests, errors, achieved rate and
+p50/p95/p99/max latency in milliseconds.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks import seed as seeding
+
+# (name, weight, request builder). Builders get the seeded sample and an RNG
+# and return (method, path, json body or None).
+SCENARIOS = [
+    ("GET /ratings/{spotId}", 20, lambda s, r: ("GET", f"/ratings/{r.choice(s['spots'])}?limit=20", None)),
+    ("GET /reviews/{spotId}", 15, lambda s, r: ("GET", f"/reviews/{r.choice(s['spots'])}?limit=20", None)),
+    ("GET /ratings/{spotId}/average", 25, lambda s, r: ("GET", f"/ratings/{r.choice(s['spots'])}/average", None)),
+    ("POST /ratings/averages", 5, lambda s, r: ("POST", "/ratings/averages", {"spotIds": r.sample(s["spots"], min(20, len(s["spots"])))})),
+    ("GET /rating/{ratingId}", 10, lambda s, r: ("GET", f"/rating/{r.choice(s['ratings'])}", None)),
+    ("GET /review/{reviewId}", 10, lambda s, r: ("GET", f"/review/{r.choice(s['reviews'])}", None)),
+    ("POST /rating/{spotId}/user/{userId}", 6, lambda s, r: ("POST", f"/rating/{r.choice(s['spots'])}/user/load-{uuid4()}", {"rating": r.randint(1, 5)})),
+    ("POST /review/{spotId}/user/{userId}", 3, lambda s, r: ("POST", f"/review/{r.choice(s['spots'])}/user/load-{uuid4()}", {"review": "Load test review"})),
+    ("PATCH /rating/{ratingId}", 3, lambda s, r: ("PATCH", f"/rating/{r.choice(s['ratings'])}", {"rating": r.randint(1, 5)})),
+    ("PATCH /review/{reviewId}", 2, lambda s, r: ("PATCH", f"/review/{r.choice(s['reviews'])}", {"review": "Edited in a load test"})),
+    # Rare, and what they delete is gone for the rest of the run (later reads of it are 404s).
+    ("DELETE /rating/{ratingId}", 1, lambda s, r: ("DELETE", f"/rating/{r.choice(s['ratings'])}", None)),
+    ("DELETE /review/{reviewId}", 1, lambda s, r: ("DELETE", f"/review/{r.choice(s['reviews'])}", None)),
+    ("POST /ratings/bulk", 1, lambda s, r: ("POST", "/ratings/bulk", {"items": [
+        {"spot_id": r.choice(s["spots"]), "user_id": f"load-{uuid4()}", "rating": r.randint(1, 5)} for _ in range(20)
+    ]})),
+    ("POST /reviews/bulk", 1, lambda s, r: ("POST", "/reviews/bulk", {"items": [
+        {"spot_id": r.choice(s["spots"]), "user_id": f"load-{uuid4()}", "review": "Bulk load test review"} for _ in range(10)
+    ]})),
+    ("GET /ratings/{spotId}/trend", 2, lambda s, r: ("GET", f"/ratings/{r.choice(s['spots'])}/trend?period={r.choice(['day', 'week'])}&last=30", None)),
+    # Seeded reviews read "Benchmark review N lorem ipsum ...".
+    ("GET /search/reviews", 3, lambda s, r: ("GET", f"/search/reviews?q={r.choice(['lorem', 'benchmark+ipsum', 'quiet+wifi'])}&limit=20", None)),
+    ("GET /users/{userId}/ratings", 2, lambda s, r: ("GET", f"/users/bench-user-{r.randint(1, 20)}/ratings?limit=20", None)),
+    ("GET /users/{userId}/reviews", 1, lambda s, r: ("GET", f"/users/bench-user-{r.randint(1, 200)}/reviews?limit=20", None)),
+    ("POST /users/{userId}/ratings/lookup", 3, lambda s, r: ("POST", f"/users/bench-user-{r.randint(1, 20)}/ratings/lookup", {"spotIds": r.sample(s["spots"], min(20, len(s["spots"])))})),
+    ("GET /leaderboard", 2, lambda s, r: ("GET", "/leaderboard?limit=20&minCount=5", None)),
+    ("GET /export/ratings", 1, lambda s, r: ("GET", f"/export/ratings?spotId={r.choice(s['spots'][:50])}", None)),
+    ("GET /export/reviews", 1, lambda s, r: ("GET", f"/export/reviews?spotId={r.choice(s['spots'][:50])}", None)),
+    ("GET /health", 2, lambda s, r: ("GET", "/health", None)),
+]
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), math.ceil(p / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples: dict, errors: dict, duration: float) -> dict:
+    report = {}
+    for name in sorted(samples.keys() | errors.keys()):
+        latencies = sorted(samples.get(name, []))
+        count = len(latencies) + errors.get(name, 0)
+        report[name] = {
+            "requests": count,
+            "errors": errors.get(name, 0),
+            "rps": round(count / duration, 1),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        }
+    return report
+
+
+async def drive(client: httpx.AsyncClient, sample: dict, rps: float, duration: float, max_in_flight: int, rng: random.Random) -> dict:
+    names = [name for name, _, _ in SCENARIOS]
+    weights = [weight for _, weight, _ in SCENARIOS]
+    builders = {name: build for name, _, build in SCENARIOS}
+    samples, errors = defaultdict(list), defaultdict(int)
+    in_flight = asyncio.Semaphore(max_in_flight)
+    loop = asyncio.get_running_loop()
+
+    async def one(name: str, due: float):
+        method, path, body = builders[name](sample, rng)
+        async with in_flight:
+            try:
+                response = await client.request(method, path, json=body)
+                await response.aread()
+                ok = response.status_code < 500
+            except httpx.HTTPError:
+                ok = False
+        if ok:
+            samples[name].append((loop.time() - due) * 1000)
+        else:
+            errors[name] += 1
+
+    tasks = []
+    start = loop.time()
+    for i in range(int(rps * duration)):
+        due = start + i / rps
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(rng.choices(names, weights)[0], due)))
+    await asyncio.gather(*tasks)
+    return summarize(samples, errors, loop.time() - start)
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=30)
+    else:
+        import main
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=30)
+    async with client:
+        return await drive(client, args.sample, args.rps, args.duration, args.max_in_flight, rng)
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="base URL of a running instance; default runs the app in-process")
+    parser.add_argument("--rps", type=float, default=100)
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--spots", type=int, default=1000)
+    parser.add_argument("--ratings", type=int, default=50_000)
+    parser.add_argument("--reviews", type=int, default=10_000)
+    parser.add_argument("--skew", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-seed", action="store_true", help="the database is already seeded with these settings")
+    args = parser.parse_args(argv)
+
+    if not args.url:
+        os.environ.setdefault("DB_MODE", "sqlite")
+        os.environ.setdefault("SQLITE_PATH", os.path.join(tempfile.mkdtemp(prefix="bench-"), "bench.db"))
+    if args.url or args.no_seed:
+        # Same deterministic ids and spot names seeding would have produced.
+        args.sample = {
+            "spots": [seeding.spot_id(n) for n in range(min(args.spots, 1000))],
+            "ratings": [str(seeding.row_id(1, n)) for n in range(min(args.ratings, 1000))],
+            "reviews": [str(seeding.row_id(2, n)) for n in range(min(args.reviews, 1000))],
+        }
+    else:
+        args.sample = seeding.seed(args.spots, args.ratings, args.reviews, args.skew, args.seed)
+
+    started = time.perf_counter()
+    endpoints = asyncio.run(run(args))
+    print(json.dumps({
+        "target": args.url or f"in-process ({os.environ.get('DB_MODE')})",
+        "rps": args.rps,
+        "duration_s": args.duration,
+        "wall_s": round(time.perf_counter() - started, 1),
+        "endpoints": endpoints,
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,91 @@
+"""Micro-benchmarks for model construction and serialization (pytest-benchmark).
+
+Not part of the test suite; run them explicitly and compare runs with
+pytest-benchmark's own tooling::
+
+    python -m pytest benchmarks/micro.py --benchmark-autosave
+    python -m pytest benchmarks/micro.py --benchmark-compare
+"""
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+
+import main
+from models.rating import RatingAggregation, RatingBulkItem, RatingPage, RatingRead, RatingResponse
+from models.review import ReviewCreate
+from services import aggregates, bulk
+from utils import pagination
+
+ROW = {
+    "id": "00000000-0000-4000-8000-000000000001", "spot_id": "spot-1", "user_id": "user-1", "rating": 4,
+    "created_at": datetime(2025, 1, 15, 10, 20, 30), "updated_at": None,
+}
+AGGREGATE = {"spot_id": "spot-1", "rating_sum": 4012, "rating_count": 1000,
+             "count_1": 50, "count_2": 100, "count_3": 200, "count_4": 300, "count_5": 350}
+REQUEST = Request({
+    "type": "http", "method": "GET", "scheme": "http", "server": ("bench", 80),
+    "path": "/ratings/spot-1", "query_string": b"limit=50", "headers": [],
+})
+PAGE_ROWS = [dict(ROW, id=f"00000000-0000-4000-8000-{i:012d}") for i in range(51)]
+
+
+def rating_read():
+    return RatingRead(id=ROW["id"], user_id=ROW["user_id"], rating=ROW["rating"],
+                      postDate=ROW["created_at"], created_at=ROW["created_at"], updated_at=None)
+
+
+def test_rating_read_construction(benchmark):
+    benchmark(rating_read)
+
+
+def test_rating_response_serialization(benchmark):
+    response = RatingResponse(data=rating_read(), links=[{"href": "self", "rel": "/rating/x", "type": "GET"}])
+    benchmark(response.model_dump_json)
+
+
+def test_rating_response_jsonable_encoder(benchmark):
+    """What FastAPI does for a handler's returned dict before validating it."""
+    body = {"data": rating_read(), "links": [{"href": "self", "rel": "/rating/x", "type": "GET"}]}
+    benchmark(lambda: json.dumps(jsonable_encoder(body)))
+
+
+def test_review_create_validation(benchmark):
+    payload = {"review": "Quiet, good wifi, plenty of outlets.", "postDate": "2025-01-15T10:20:30Z"}
+    benchmark(ReviewCreate.model_validate, payload)
+
+
+def test_aggregation_from_row(benchmark):
+    benchmark(aggregates.to_aggregation, "spot-1", AGGREGATE)
+
+
+def test_aggregation_serialization(benchmark):
+    benchmark(RatingAggregation.model_dump_json, aggregates.to_aggregation("spot-1", AGGREGATE))
+
+
+def test_ratings_page_build_and_validate(benchmark):
+    """Page of 50 as GET /ratings/{spotId} builds it, then response-model validation."""
+    keys = main.RATING_ORDERS["newest"]
+    selected = list(main.RATING_FIELDS)
+
+    def build():
+        rows, cursor = pagination.split_page(PAGE_ROWS, keys, "newest", 50)
+        page = main.list_page(REQUEST, rows, selected, main.RATING_FIELDS, "/rating", cursor)
+        return RatingPage.model_validate(page).model_dump_json()
+
+    benchmark(build)
+
+
+def test_bulk_rating_queries(benchmark):
+    items = [RatingBulkItem(spot_id=f"spot-{i % 20}", user_id=f"user-{i}", rating=1 + i % 5) for i in range(500)]
+    benchmark(bulk.rating_queries, items)
+
@@ -0,0 +1,130 @@
+"""Seed a benchmark dataset into the configured database.
+
+Spots get ratings and reviews with Zipf-like popularity (``--skew``): the
+most popular spot has about ``rank ** skew`` times the ratings of the
+``rank``-th one, which is roughly how real spots are distributed and what
+makes caches and per-spot indexes matter. Rows go in through the bulk
+insert builders, so the aggregates and version counters are consistent
+with them.
+
+Use a local backend, e.g. a SQLite file::
+
+    DB_MODE=sqlite SQLITE_PATH=/tmp/bench.db python -m benchmarks.seed --spots 10000 --ratings 5000000
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from uuid import UUID
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.rating import RatingBulkItem
+from models.review import ReviewBulkItem
+from services import bulk
+from services.database import db_mode, execute_query
+
+CHUNK_SIZE = 1000
+START = datetime(2024, 1, 1)
+
+
+def executor():
+    """The synchronous executor for the configured ``DB_MODE``."""
+    if db_mode() == "sqlite":
+        from services.sqlite_database import execute_query_sqlite
+
+        return execute_query_sqlite
+    return execute_query
+
+
+def spot_id(n: int) -> str:
+    return f"bench-spot-{n}"
+
+
+def row_id(kind: int, n: int) -> UUID:
+    """Deterministic ids, so a seeded dataset can be found again without storing them."""
+    return UUID(f"{kind:08x}-0000-4000-8000-{n:012x}")
+
+
+def spot_picker(spots: int, skew: float, rng: random.Random):
+    cum_weights = list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, spots + 1)))
+    population = range(spots)
+    return lambda k: rng.choices(population, cum_weights=cum_weights, k=k)
+
+
+def seed(spots: int, ratings: int, reviews: int, skew: float = 1.0, random_seed: int = 42) -> dict:
+    """Insert the dataset; returns a sample of ids for the load test to request."""
+    rng = random.Random(random_seed)
+    pick = spot_picker(spots, skew, rng)
+    execute = executor()
+
+    def run_query(queries, only_one=False):
+        return execute(queries, only_one)
+
+    per_spot: dict = {}
+    sample = {"spots": [spot_id(n) for n in range(min(spots, 1000))], "ratings": [], "reviews": []}
+
+    def ratings_chunk(start: int, size: int) -> list:
+        items = []
+        for offset, spot in enumerate(pick(size)):
+            n = start + offset
+            # Users are numbered per spot, so every (spot, user) pair is new.
+            user = per_spot[spot] = per_spot.get(spot, 0) + 1
+            items.append(RatingBulkItem(
+                id=row_id(1, n), spot_id=spot_id(spot), user_id=f"bench-user-{user}",
+                rating=rng.choices((1, 2, 3, 4, 5), weights=(1, 1, 3, 6, 5))[0],
+                postDate=START + timedelta(seconds=n),
+            ))
+        return items
+
+    def reviews_chunk(start: int, size: int) -> list:
+        return [
+            ReviewBulkItem(
+                id=row_id(2, start + offset), spot_id=spot_id(spot), user_id=f"bench-user-{start + offset}",
+                review=f"Benchmark review {start + offset} " + "lorem ipsum " * rng.randint(1, 20),
+                postDate=START + timedelta(seconds=start + offset),
+            )
+            for offset, spot in enumerate(pick(size))
+        ]
+
+    for total, make_chunk, build, kind in (
+        (ratings, ratings_chunk, bulk.rating_queries, "ratings"),
+        (reviews, reviews_chunk, bulk.review_queries, "reviews"),
+    ):
+        for start in range(0, total, CHUNK_SIZE):
+            items = make_chunk(start, min(CHUNK_SIZE, total - start))
+            run_query(build(items))
+            if len(sample[kind]) < 1000:
+                sample[kind].extend(str(item.id) for item in items[:1000 - len(sample[kind])])
+    return sample
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--spots", type=int, default=1000)
+    parser.add_argument("--ratings", type=int, default=100_000)
+    parser.add_argument("--reviews", type=int, default=20_000)
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent of spot popularity")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    seed(args.spots, args.ratings, args.reviews, args.skew, args.seed)
+    print(json.dumps({
+        "db_mode": db_mode(),
+        "spots": args.spots,
+        "ratings": args.ratings,
+        "reviews": args.reviews,
+        "seconds": round(time.perf_counter() - start, 1),
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,104 @@
+"""Rows per second through the list endpoints' response path, old versus new.
+
+Times what happens to a page of ratings after it has been read: the
+``response_model`` path (FastAPI validating the page dict into
+``RatingPage``, dumping it back out and encoding it with :mod:`json`)
+against :class:`utils.fast_json.FastJSONResponse` encoding the dict as is.
+Page building itself is the same for both and is left out.
+
+    python -m benchmarks.serialization --rows 1000 --repeat 200
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.routing import serialize_response
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+import main
+from utils import fast_json, pagination
+from utils.fast_json import FastJSONResponse
+
+START = datetime(2025, 1, 15, 10, 20, 30)
+
+
+def page(rows: int) -> dict:
+    request = Request({
+        "type": "http", "method": "GET", "scheme": "http", "server": ("bench", 80),
+        "path": "/ratings/spot-1", "query_string": f"limit={rows}".encode(), "headers": [],
+    })
+    data = [
+        {
+            "id": f"00000000-0000-4000-8000-{n:012d}", "user_id": f"user-{n}", "rating": 1 + n % 5,
+            "created_at": START - timedelta(seconds=n), "updated_at": None if n % 3 else START,
+        }
+        for n in range(rows + 1)
+    ]
+    keys = main.RATING_ORDERS["newest"]
+    data, cursor = pagination.split_page(data, keys, "newest", rows)
+    return main.list_page(request, data, list(main.RATING_FIELDS), main.RATING_FIELDS, "/rating", cursor)
+
+
+def response_field():
+    for route in main.app.routes:
+        if getattr(route, "path", None) == "/ratings/{spotId}" and "GET" in route.methods:
+            return route.response_field
+    raise LookupError("GET /ratings/{spotId} not found")
+
+
+async def validated(content: dict, field) -> bytes:
+    """What FastAPI does with a returned dict under ``response_model_exclude_unset=True``."""
+    body = await serialize_response(field=field, response_content=content, exclude_unset=True, is_coroutine=True)
+    return JSONResponse(body).body
+
+
+def fast(content: dict) -> bytes:
+    return FastJSONResponse(content).body
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return time.perf_counter() - start
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=1000, help="rows per page")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    content = page(args.rows)
+    field = response_field()
+    loop = asyncio.new_event_loop()
+    try:
+        old = lambda: loop.run_until_complete(validated(content, field))
+        if json.loads(old()) != json.loads(fast(content)):
+            raise SystemExit("the two paths produce different JSON")
+        report = {"rows": args.rows, "repeat": args.repeat, "encoder": "orjson" if fast_json.orjson else "pydantic-core"}
+        for name, fn in (("response_model", old), ("fast_json", lambda: fast(content))):
+            fn()
+            seconds = timed(fn, args.repeat)
+            report[name] = {
+                "rows_per_s": round(args.rows * args.repeat / seconds),
+                "ms_per_page": round(seconds / args.repeat * 1000, 3),
+            }
+    finally:
+        loop.close()
+    report["speedup"] = round(report["response_model"]["ms_per_page"] / report["fast_json"]["ms_per_page"], 1)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,151 @@
+"""Round trips and latency of the write handlers with and without read-back.
+
+Runs the POST/PATCH handlers in-process against a fake database that sleeps
+``--rtt`` milliseconds per statement (plus one for the COMMIT), which is what
+dominates write latency against Cloud SQL. Compares ``WRITE_READ_BACK=true``
+(INSERT/UPDATE followed by ``SELECT *``) with the default of building the
+response from the values written. Rating POSTs upsert and always read the
+user's row back in the same transaction, so they cost the same either way.
+``add_rating_write_behind`` is POST /rating with ``RATING_WRITE_BEHIND=true``
+up to the 202 (the queue is not flushed): one primary read to find the id
+the rating will have.
+
+    python -m benchmarks.write_roundtrips --requests 200 --rtt 1.0
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import Response
+
+import main
+from models.rating import RatingCreate, RatingUpdate
+from models.review import ReviewCreate, ReviewUpdate
+
+
+class UnflushedQueue:
+    """Stands in for main.rating_queue: accepts everything, writes nothing."""
+
+    def offer(self, item) -> bool:
+        return True
+
+
+class FakeDatabase:
+    def __init__(self, rtt_ms: float):
+        self.rtt = rtt_ms / 1000
+        self.statements = 0
+        self.rows: dict = {}
+
+    async def run_query(self, queries, only_one=False):
+        self.statements += len(queries) + 1
+        await asyncio.sleep(self.rtt * (len(queries) + 1))
+        for sql, params in queries:
+            if sql.startswith("INSERT INTO reviews") or sql.startswith("INSERT INTO ratings"):
+                row_id, spot_id, user_id, value, created_at = params
+                self.rows[row_id] = {
+                    "table": sql.split()[2], "id": row_id, "spot_id": spot_id, "user_id": user_id,
+                    "review": value, "rating": value, "created_at": created_at, "updated_at": None,
+                }
+        sql, params = queries[-1]
+        if sql.startswith("SELECT") and "user_id = %s" in sql:
+            row = next(
+                (r for r in self.rows.values() if r["table"] == "ratings" and (r["spot_id"], r["user_id"]) == params),
+                None,
+            )
+            if only_one:
+                return row
+            return [row] if row else []
+        if sql.startswith("SELECT"):
+            row = self.rows.get(str(params[0]))
+            if only_one:
+                return row
+            return [row] if row else []
+        return 1
+
+
+async def run(requests: int, rtt: float, read_back: bool) -> dict:
+    db = FakeDatabase(rtt)
+    main.run_query = db.run_query
+    main.WRITE_READ_BACK = read_back
+    await main.get_cache().clear()
+    results = {}
+
+    async def measure(name, make_call):
+        db.statements = 0
+        start = time.perf_counter()
+        for i in range(requests):
+            await make_call(i)
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "mean_ms": round(elapsed / requests * 1000, 3),
+            "statements_per_request": round(db.statements / requests, 2),
+        }
+
+    review_ids, rating_ids = [], []
+
+    async def add_review(i):
+        body = ReviewCreate(review=f"review {i}", postDate=datetime(2025, 1, 15))
+        review_ids.append(str(body.id))
+        await main.create_review("spot-1", "user-1", body)
+
+    async def add_rating(i):
+        body = RatingCreate(rating=1 + i % 5, postDate=datetime(2025, 1, 15))
+        rating_ids.append(str(body.id))
+        await main.create_rating("spot-1", f"user-{i}", body)
+
+    async def queue_rating(i):
+        body = RatingCreate(rating=1 + i % 5, postDate=datetime(2025, 1, 15))
+        await main.queue_rating(Response(), "spot-2", f"user-{i}", body)
+
+    async def update_review(i):
+        await main.update_review(review_ids[i], ReviewUpdate(review=f"edited {i}"))
+
+    async def update_rating(i):
+        await main.update_rating(rating_ids[i], RatingUpdate(rating=1 + (i + 1) % 5))
+
+    await measure("add_review", add_review)
+    await measure("add_rating", add_rating)
+    rating_queue, main.rating_queue = main.rating_queue, UnflushedQueue()
+    try:
+        await measure("add_rating_write_behind", queue_rating)
+    finally:
+        main.rating_queue = rating_queue
+        main.pending_rating_ids.clear()
+    # Nothing is cached yet, so these PATCHes have to read the row back.
+    await measure("update_review_cold", update_review)
+    await measure("update_rating_cold", update_rating)
+    # Typical case: the row was read (and cached) shortly before it's edited.
+    for review_id in review_ids:
+        await main.cached_row("review", review_id)
+    for rating_id in rating_ids:
+        await main.cached_row("rating", rating_id)
+    await measure("update_review_warm", update_review)
+    await measure("update_rating_warm", update_rating)
+    return results
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rtt", type=float, default=1.0, help="simulated ms per statement")
+    args = parser.parse_args(argv)
+
+    report = {
+        "rtt_ms": args.rtt,
+        "read_back": asyncio.run(run(args.requests, args.rtt, True)),
+        "no_read_back": asyncio.run(run(args.requests, args.rtt, False)),
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -1,53 +1,136 @@
 from __future__ import annotations
 
+import json
+import logging
 import os
 import socket
-from datetime import datetime
+from datetime import datetime, timedelta
 from uuid import UUID, uuid4
 
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from fastapi import Query, Path
-from typing import Optional, List
+from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html, get_swagger_ui_oauth2_redirect_html
+from typing import Literal, Optional, List
 
-from models.health import Health
+from models.health import CacheStats, Health, PoolStats, ReplicaStats, WriteBehindStats
 
-from models.rating import RatingCreate, RatingRead, RatingUpdate, RatingResponse, RatingAggregation, RatingAggregationResponse
-from models.review import ReviewCreate, ReviewRead, ReviewUpdate, ReviewResponse
+from models.rating import RatingCreate, RatingRead, RatingUpdate, RatingResponse, RatingAggregation, RatingAggregationResponse, RatingAggregationBatchRequest, RatingPage, RatingListItemResponse, RatingBulkItem, LeaderboardResponse, RatingTrendResponse, UserRatingLookupRequest, UserSpotRatingResponse
+from models.review import ReviewCreate, ReviewRead, ReviewUpdate, ReviewResponse, ReviewPage, ReviewListItemResponse, ReviewBulkItem, ReviewSearchPage
+from models.bulk import BulkRequest, BulkResponse
 
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response, StreamingResponse
 from starlette.requests import Request
-import mysql.connector
-
-def get_connection():
-    if os.environ.get("ENV") == "local":
-        return mysql.connector.connect(
-            host="127.0.0.1",
-            user="root",
-            password=os.environ.get("DB_PASSWORD", ""),
-            database=os.environ.get("DB_NAME", "mydb"),
-            port=3306
-        )
-    else:
-        return mysql.connector.connect(
-            host=os.environ["DB_HOST"],
-            user=os.environ["DB_USER"],
-            password=os.environ["DB_PASSWORD"],
-            database=os.environ["DB_NAME"],
-            port=int(os.environ.get("DB_PORT", 3306))
+from contextlib import asynccontextmanager
+
+from services import aggregates, bulk, idempotency, leaderboard, migrations, ratings, replicas, rollups, search, versions
+from services.cache import get_cache
+from services.database import check_sql_mode, db_mode, db_timestamp, execute_query, get_pool, run_query, set_pool, stream_rows
+from services.async_database import async_pool_stats, close_async_pool
+from services.sqlite_database import close_sqlite
+from services.write_behind import WriteBehindQueue
+from middleware import profiling
+from middleware.compression import CompressionMiddleware
+from middleware.profiling import ProfilingMiddleware
+from middleware.read_routing import ReadRoutingMiddleware
+from middleware.timing import TimedRoute, TimingMiddleware
+from utils import compression, http_cache, metrics, oas, pagination, slow_queries
+from utils.compression import StaticPayload, StaticPayloads
+from utils.fast_json import FastJSONResponse, dumps
+from utils.config import env_bool, env_float, env_int
+import anyio.to_thread
+
+MAX_AVERAGES_BATCH = env_int("RATING_AVERAGES_MAX_BATCH", 100)
+DEFAULT_PAGE_SIZE = env_int("DEFAULT_PAGE_SIZE", 50)
+MAX_PAGE_SIZE = env_int("MAX_PAGE_SIZE", 200)
+EXPORT_CHUNK_SIZE = env_int("EXPORT_CHUNK_SIZE", 1000)
+# Re-read written rows instead of building the response from the values written.
+WRITE_READ_BACK = env_bool("WRITE_READ_BACK", False)
+BULK_MAX_ITEMS = env_int("BULK_MAX_ITEMS", 5000)
+BULK_CHUNK_SIZE = env_int("BULK_CHUNK_SIZE", 500)
+RATING_WRITE_BEHIND = env_bool("RATING_WRITE_BEHIND", False)
+LEADERBOARD_TTL = env_float("LEADERBOARD_TTL", 10.0)
+MAX_TREND_BUCKETS = env_int("MAX_TREND_BUCKETS", 366)
+MAX_USER_RATINGS_BATCH = env_int("USER_RATINGS_MAX_BATCH", 100)
+
+port = int(os.environ.get("FASTAPIPORT", 8000))
+
+logger = logging.getLogger(__name__)
+
+
+# (spot_id, user_id) -> id of a queued rating that isn't written yet, so
+# every queued rating of the pair gets the id the row will end up with.
+pending_rating_ids: dict = {}
+
+
+async def flush_ratings(items: list) -> int:
+    """Write-behind flush: insert queued ratings, returns how many failed."""
+    results = await bulk.insert_valid(
+        list(enumerate(items)), bulk.rating_queries, run_query, BULK_CHUNK_SIZE, bulk.rating_outcomes
+    )
+    for item in items:
+        pending_rating_ids.pop(ratings.spot_user(item), None)
+    failed = [r for r in results if r["status"] >= 400]
+    for r in failed:
+        logger.error("write-behind rating %s not saved: %s", r["id"], r["error"])
+    written = [r for r in results if r["status"] < 400]
+    if written:
+        await get_cache().invalidate(
+            *{f"ratings:{items[r['index']].spot_id}" for r in written},
+            *(f"rating:{r['id']}" for r in written),
         )
+    return len(failed)
 
 
+rating_queue = WriteBehindQueue(
+    flush_ratings,
+    max_size=env_int("WRITE_BEHIND_MAX_QUEUE", 10000),
+    batch_size=env_int("WRITE_BEHIND_BATCH_SIZE", 500),
+    flush_interval=env_float("WRITE_BEHIND_FLUSH_INTERVAL", 0.5),
+)
 
 
-port = int(os.environ.get("FASTAPIPORT", 8000))
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Sync handlers and DB_MODE=sync queries run on this threadpool.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = env_int("DB_THREADPOOL_SIZE", 40)
+    if db_mode() != "sqlite":
+        await check_sql_mode()
+    # The SQLite schema is created on first use; migrations are for MySQL.
+    if env_bool("DB_MIGRATE_ON_STARTUP", False) and db_mode() != "sqlite":
+        applied = await anyio.to_thread.run_sync(migrations.upgrade, execute_query)
+        if applied:
+            logger.info("applied schema migrations %s", applied)
+    elif db_mode() != "sqlite":
+        await anyio.to_thread.run_sync(migrations.require_current, execute_query)
+    if RATING_WRITE_BEHIND:
+        rating_queue.start()
+    if replicas.ENABLED and db_mode() != "sqlite":
+        replicas.get_replicas().start(db_mode())
+    await anyio.to_thread.run_sync(static_payloads.warm)
+    yield
+    # Drain queued ratings before the pools they need are closed.
+    await rating_queue.stop()
+    if replicas.ENABLED:
+        await replicas.get_replicas().stop()
+    # Close pooled DB connections so Cloud SQL frees the slots right away.
+    set_pool(None)
+    await close_async_pool()
+    close_sqlite()
 
 
 app = FastAPI(
     title="reviews and ratings",
     description="description",
     version="0.1.0",
+    lifespan=lifespan,
+    # Served below from precompressed payloads instead of being rebuilt per hit.
+    openapi_url=None,
+    docs_url=None,
+    redoc_url=None,
 )
+if metrics.ENABLED:
+    app.router.route_class = TimedRoute
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -57,6 +140,32 @@ app.add_middleware(
     allow_methods=["GET", "POST", "OPTIONS"],
     allow_headers=["*"],
 )
+if compression.ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=compression.MIN_SIZE,
+        gzip_level=compression.GZIP_LEVEL,
+        brotli_quality=compression.BROTLI_QUALITY,
+    )
+if metrics.ENABLED:
+    app.add_middleware(TimingMiddleware, server_timing=metrics.SERVER_TIMING)
+# Routes whose callers must read their own writes; see ReadRoutingMiddleware.
+WRITE_ROUTES = {
+    ("POST", "/review/{spotId}/user/{userId}"),
+    ("PATCH", "/review/{reviewId}"),
+    ("DELETE", "/review/{reviewId}"),
+    ("POST", "/reviews/bulk"),
+    ("POST", "/rating/{spotId}/user/{userId}"),
+    ("PATCH", "/rating/{ratingId}"),
+    ("DELETE", "/rating/{ratingId}"),
+    ("POST", "/ratings/bulk"),
+}
+if replicas.ENABLED:
+    app.add_middleware(
+        ReadRoutingMiddleware, window=replicas.get_replicas().read_your_writes_window, writes=WRITE_ROUTES
+    )
+if slow_queries.ENABLED or profiling.EVERY_N or profiling.TOKEN:
+    app.add_middleware(ProfilingMiddleware, every=profiling.EVERY_N, token=profiling.TOKEN, directory=profiling.DIRECTORY)
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -90,6 +199,36 @@ def make_health(echo: Optional[str], path_echo: Optional[str]=None) -> Health:
 def get_health_no_path(echo: str | None = Query(None, description="Optional echo string")):
     return make_health(echo=echo, path_echo=None)
 
+@app.get("/health/cache", response_model=CacheStats, response_model_exclude_none=True)
+def get_cache_stats():
+    return CacheStats(**get_cache().stats())
+
+@app.get("/health/write-behind", response_model=WriteBehindStats)
+def get_write_behind_stats():
+    return WriteBehindStats(**rating_queue.stats())
+
+@app.get("/health/db/pool", response_model=PoolStats)
+def get_pool_stats():
+    if db_mode() == "sqlite":
+        raise HTTPException(status_code=503, detail="DB_MODE=sqlite has no connection pool.")
+    if db_mode() == "async":
+        stats = async_pool_stats()
+        if stats is None:
+            raise HTTPException(status_code=503, detail="Database pool has not been initialized yet.")
+        return PoolStats(**stats)
+    return PoolStats(**get_pool().stats())
+
+@app.get("/health/db/replicas", response_model=List[ReplicaStats])
+def get_replica_stats():
+    replica_set = replicas.get_replicas()
+    return [ReplicaStats(**stats) for stats in replica_set.stats()] if replica_set else []
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=false).")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health/{path_echo}", response_model=Health)
 def get_health_with_path(
     path_echo: str = Path(..., description="Required echo in the URL path"),
@@ -97,55 +236,117 @@ def get_health_with_path(
 ):
     return make_health(echo=echo, path_echo=path_echo)
 
+async def cached_row(kind: str, row_id: str) -> dict:
+    """The review/rating row with id ``row_id``, from the cache when possible; 404 if missing."""
+    async def load():
+        queries = [(f"SELECT * FROM {kind}s WHERE id = %s;", (row_id,))]
+        results = await run_query(queries)
+        if len(results) == 0:
+            raise HTTPException(status_code=404, detail=f"{kind.capitalize()} ID {row_id} not found.")
+        return results[0]
 
-def execute_query(queries: list, only_one=False):
-    conn, cursor = None, None
-    result = None
+    return await get_cache().get_or_load(f"{kind}:{row_id}", load)
+
+
+IDEMPOTENCY_KEY = Header(
+    None,
+    alias=idempotency.HEADER,
+    max_length=idempotency.MAX_KEY_LENGTH,
+    description="Client-chosen key; retries with the same key return the first response instead of writing again",
+)
+
+
+async def idempotent_replay(key: str, request_fingerprint: str) -> Optional[Response]:
+    """The stored response for a key that was already used, or None if it wasn't."""
+    stored = await run_query([idempotency.lookup_query(key)], only_one=True)
+    if not stored:
+        return None
+    if stored["fingerprint"] != request_fingerprint:
+        raise HTTPException(status_code=422, detail=f"{idempotency.HEADER} was already used for a different request.")
+    if stored["status_code"] is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"A request with this {idempotency.HEADER} is still being processed.",
+            headers={"Retry-After": "1"},
+        )
+    return Response(
+        content=stored["response"],
+        status_code=stored["status_code"],
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+async def idempotent(request: Request, response: Response, key: Optional[str], model, write):
+    """Run ``write(claim)`` at most once per Idempotency-Key.
+
+    ``write`` puts the ``claim`` statements first in its transaction and
+    returns ``(status_code, body)``. Without a key it just runs.
+    """
+    if key is None:
+        status_code, body = await write([])
+        response.status_code = status_code
+        return body
+    request_fingerprint = idempotency.fingerprint(request.method, request.url.path, await request.body())
+    replay = await idempotent_replay(key, request_fingerprint)
+    if replay is not None:
+        return replay
+    try:
+        status_code, body = await write([idempotency.claim_query(key, request_fingerprint)])
+    except HTTPException:
+        # A concurrent request with the same key may have rolled this one back.
+        replay = await idempotent_replay(key, request_fingerprint)
+        if replay is not None:
+            return replay
+        raise
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        for i, (query, params) in enumerate(queries):
-            cursor.execute(query, params)
-            if i == len(queries) - 1:
-                if query.strip().upper().startswith("SELECT"):
-                    if only_one:
-                        result = cursor.fetchone()
-                    else:
-                        result = cursor.fetchall()
-                else:
-                    result = cursor.rowcount
-
-        conn.commit()
-    except mysql.connector.Error as err:
-        if conn:
-            conn.rollback()
-        raise Exception(f"DB Error: {err}")
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-            
-    return result
+        stored = model.model_validate(body).model_dump_json()
+        await run_query([idempotency.complete_query(key, status_code, stored)])
+    except Exception:
+        logger.exception("could not store the response for %s %s", idempotency.HEADER, key)
+        # Left claimed, the key would answer 409 to every retry until it expired.
+        try:
+            await run_query([idempotency.release_query(key)])
+        except Exception:
+            logger.exception("could not release %s %s", idempotency.HEADER, key)
+    response.status_code = status_code
+    return body
+
 
 @app.post("/review/{spotId}/user/{userId}", status_code=201, response_model=ReviewResponse)
-def add_review(spotId: str, userId: str, body: ReviewCreate):
+async def add_review(
+    request: Request,
+    response: Response,
+    spotId: str,
+    userId: str,
+    body: ReviewCreate,
+    idempotency_key: Optional[str] = IDEMPOTENCY_KEY,
+):
+    return await idempotent(
+        request, response, idempotency_key, ReviewResponse,
+        lambda claim: create_review(spotId, userId, body, claim),
+    )
+
+async def create_review(spotId: str, userId: str, body: ReviewCreate, claim: list = ()) -> tuple:
+    created_at = db_timestamp(body.postDate)
     try:
         queries = [
+            *claim,
+            versions.bump_query(spotId, "reviews"),
             (
                 "INSERT INTO reviews (id, spot_id, user_id, review, created_at) VALUES (%s, %s, %s, %s, %s);",
-                (str(body.id), spotId, userId, body.review, body.postDate)
-            ),
-            (
-                "SELECT * FROM reviews WHERE id = %s;",
-                (str(body.id),)
+                (str(body.id), spotId, userId, body.review, created_at)
             )
         ]
-        result = execute_query(queries, only_one=True)
+        if WRITE_READ_BACK:
+            queries.append(("SELECT * FROM reviews WHERE id = %s;", (str(body.id),)))
+        result = await run_query(queries, only_one=WRITE_READ_BACK)
         if not result:
             raise HTTPException(status_code=500, detail="Failed to create and retrieve the new review.")
-        
+        await get_cache().invalidate(f"reviews:{spotId}")
+
+        if not WRITE_READ_BACK:
+            result = {"id": body.id, "review": body.review, "created_at": created_at, "updated_at": None}
         new_review = ReviewRead(
             id = result["id"],
             user_id=userId,
@@ -155,7 +356,7 @@ def add_review(spotId: str, userId: str, body: ReviewCreate):
             postDate=result["created_at"]
         )
 
-        return {
+        return 201, {
             "data": new_review,
             "links": [
                 {
@@ -165,28 +366,74 @@ def add_review(spotId: str, userId: str, body: ReviewCreate):
                 }
             ]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def bulk_create(kind: str, body: BulkRequest, model, build_queries, outcomes=None):
+    if len(body.items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_ITEMS} items can be uploaded at once.")
+    results = await bulk.ingest(body.items, model, build_queries, run_query, BULK_CHUNK_SIZE, outcomes)
+    # 201 created; 200 replaced or superseded, which still changed a stored row.
+    written = [r for r in results if r["status"] < 400]
+    spots = {body.items[r["index"]]["spot_id"] for r in written}
+    if written:
+        await get_cache().invalidate(
+            *(f"{kind}s:{spot}" for spot in spots),
+            *{f"{kind}:{r['id']}" for r in written},
+        )
+    return {
+        "data": results,
+        "created": sum(1 for r in results if r["status"] == 201),
+        "failed": sum(1 for r in results if r["status"] >= 400),
+        "links": [
+            {
+                "href": "collection",
+                "rel": f"/{kind}s/{spot}",
+                "type" : "GET"
+            } for spot in sorted(spots)
+        ]
+    }
+
+@app.post("/reviews/bulk", status_code=200, response_model=BulkResponse)
+async def add_reviews_bulk(body: BulkRequest):
+    """Creates many reviews (items shaped like ReviewBulkItem) with per-item results."""
+    return await bulk_create("review", body, ReviewBulkItem, bulk.review_queries)
+
+@app.post("/ratings/bulk", status_code=200, response_model=BulkResponse)
+async def add_ratings_bulk(body: BulkRequest):
+    """Creates many ratings (items shaped like RatingBulkItem) with per-item results."""
+    return await bulk_create("rating", body, RatingBulkItem, bulk.rating_queries, bulk.rating_outcomes)
+
 @app.patch("/review/{reviewId}", status_code=200, response_model=ReviewResponse)
-def update_review(reviewId: UUID, body: ReviewUpdate):
+async def update_review(reviewId: UUID, body: ReviewUpdate):
     reviewId = str(reviewId)
     if body.review is None:
         raise HTTPException(status_code=400, detail="Can't update review without review field")
+    updated_at = db_timestamp()
     try:
+        # user_id, spot_id and created_at never change, so when the row is
+        # cached the UPDATE doesn't need a read-back.
+        current = None if WRITE_READ_BACK else await get_cache().get(f"review:{reviewId}")
         queries = [
+            versions.bump_for_row_query("reviews", reviewId),
             (
-                "UPDATE reviews SET review = %s, updated_at = UTC_TIMESTAMP() WHERE id = %s",
-                (body.review, str(reviewId))
-            ),
-            (
-                "SELECT * FROM reviews WHERE id = %s;",
-                (str(reviewId),)
+                "UPDATE reviews SET review = %s, updated_at = %s WHERE id = %s",
+                (body.review, updated_at, str(reviewId))
             )
         ]
-        result = execute_query(queries, only_one=True)
+        if current is None:
+            queries.append(("SELECT * FROM reviews WHERE id = %s;", (str(reviewId),)))
+        result = await run_query(queries, only_one=current is None)
+        if not result and current is not None:
+            # An UPDATE that changes nothing can report 0 rows; check the row is really gone.
+            result = await run_query([("SELECT id FROM reviews WHERE id = %s;", (reviewId,))], only_one=True)
         if not result:
             raise HTTPException(status_code=404, detail=f"Review ID {reviewId} not found.")
+        if current is not None:
+            result = {**current, "review": body.review, "updated_at": updated_at}
+        await get_cache().invalidate(f"review:{reviewId}", f"reviews:{result['spot_id']}")
 
         updated_review = ReviewRead(
             id = result["id"],
@@ -207,29 +454,91 @@ def update_review(reviewId: UUID, body: ReviewUpdate):
                 }
             ]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/rating/{spotId}/user/{userId}", status_code=201, response_model=RatingResponse)
-def add_rating(spotId: str, userId: str, body: RatingCreate):
+async def add_rating(
+    request: Request,
+    response: Response,
+    spotId: str,
+    userId: str,
+    body: RatingCreate,
+    idempotency_key: Optional[str] = IDEMPOTENCY_KEY,
+):
+    """Rates the spot; 201 for the user's first rating of it, 200 when it replaces their earlier one."""
+    if RATING_WRITE_BEHIND:
+        # Retries need no key here: the queued upsert collapses them anyway.
+        return await queue_rating(response, spotId, userId, body)
+    return await idempotent(
+        request, response, idempotency_key, RatingResponse,
+        lambda claim: create_rating(spotId, userId, body, claim),
+    )
+
+async def queue_rating(response: Response, spotId: str, userId: str, body: RatingCreate) -> dict:
+    created_at = db_timestamp(body.postDate)
+    updated_at = None
+    # The upsert keeps the id of the user's existing rating, so answer with
+    # that one. This primary-key seek is the one round trip left on the
+    # write-behind path (see benchmarks/write_roundtrips.py).
     try:
-        queries = [
-            (
-                "INSERT INTO ratings (id, spot_id, user_id, rating, created_at) VALUES (%s, %s, %s, %s, %s);",
-                (str(body.id), spotId, userId, body.rating, body.postDate)
-            ),
-            (
-                "SELECT * FROM ratings WHERE id = %s;",
-                (str(body.id),)
-            )
+        existing = await run_query([ratings.read_query(spotId, userId)], only_one=True)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if existing:
+        created_at, updated_at = existing["created_at"], created_at
+    # No await from here to offer(): a concurrent request for the pair sees this id.
+    queued_before = (spotId, userId) in pending_rating_ids
+    rating_id = pending_rating_ids.setdefault((spotId, userId), existing["id"] if existing else str(body.id))
+    item = RatingBulkItem(spot_id=spotId, user_id=userId, **{**body.model_dump(), "id": rating_id})
+    if not rating_queue.offer(item):
+        if not queued_before:
+            del pending_rating_ids[(spotId, userId)]
+        raise HTTPException(
+            status_code=503,
+            detail="Too many ratings waiting to be saved; retry shortly.",
+            headers={"Retry-After": "1"},
+        )
+    response.status_code = 202
+    return {
+        "data": RatingRead(
+            id=rating_id,
+            user_id=userId,
+            rating=body.rating,
+            postDate=created_at,
+            created_at=created_at,
+            updated_at=updated_at,
+        ),
+        "links": [
+            {
+                "href": "self",
+                "rel": f"/rating/{rating_id}",
+                "type" : "GET"
+            }
         ]
-        result = execute_query(queries, only_one=True)
+    }
+
+async def create_rating(spotId: str, userId: str, body: RatingCreate, claim: list = ()) -> tuple:
+    item = RatingBulkItem(spot_id=spotId, user_id=userId, **body.model_dump())
+    try:
+        # The read-back shares the transaction (no extra round trip) and tells
+        # whether the upsert created the row or replaced the user's rating.
+        queries = [*claim, *ratings.upsert_queries([item]), ratings.read_query(spotId, userId)]
+        try:
+            result = await run_query(queries, only_one=True)
+        except Exception as e:
+            if ratings.ID_TAKEN in str(e):
+                raise HTTPException(status_code=409, detail=f"Rating ID {body.id} belongs to another rating.")
+            raise
         if not result:
             raise HTTPException(status_code=500, detail="Failed to create and retrieve the new rating.")
-        
+        await get_cache().invalidate(f"ratings:{spotId}", f"rating:{result['id']}")
+
         new_rating = RatingRead(
             id=result["id"],
-            user_id=userId,          
+            user_id=userId,
             spot_id=spotId,
             rating=result["rating"],
             postDate=result["created_at"],
@@ -237,7 +546,7 @@ def add_rating(spotId: str, userId: str, body: RatingCreate):
             updated_at=result["updated_at"]
         )
 
-        return {
+        return 201 if str(result["id"]) == str(body.id) else 200, {
             "data": new_rating,
             "links": [
                 {
@@ -247,28 +556,39 @@ def add_rating(spotId: str, userId: str, body: RatingCreate):
                 }
             ]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.patch("/rating/{ratingId}", status_code=200, response_model=RatingResponse)
-def update_rating(ratingId: UUID, body: RatingUpdate):
+async def update_rating(ratingId: UUID, body: RatingUpdate):
     ratingId = str(ratingId)
     if body.rating is None:
         raise HTTPException(status_code=400, detail="Can't update rating without rating field")
+    updated_at = db_timestamp()
     try:
+        current = None if WRITE_READ_BACK else await get_cache().get(f"rating:{ratingId}")
         queries = [
+            aggregates.change_rating_query(ratingId, body.rating),
+            rollups.change_rating_query(ratingId, body.rating),
+            versions.bump_for_row_query("ratings", ratingId),
             (
-                "UPDATE ratings SET rating = %s, updated_at = UTC_TIMESTAMP() WHERE id = %s",
-                (body.rating, str(ratingId))
-            ),
-            (
-                "SELECT * FROM ratings WHERE id = %s;",
-                (str(ratingId),)
+                "UPDATE ratings SET rating = %s, updated_at = %s WHERE id = %s",
+                (body.rating, updated_at, str(ratingId))
             )
         ]
-        result = execute_query(queries, only_one=True)
+        if current is None:
+            queries.append(("SELECT * FROM ratings WHERE id = %s;", (str(ratingId),)))
+        result = await run_query(queries, only_one=current is None)
+        if not result and current is not None:
+            # An UPDATE that changes nothing can report 0 rows; check the row is really gone.
+            result = await run_query([("SELECT id FROM ratings WHERE id = %s;", (ratingId,))], only_one=True)
         if not result:
             raise HTTPException(status_code=404, detail=f"Rating ID {ratingId} not found.")
+        if current is not None:
+            result = {**current, "rating": body.rating, "updated_at": updated_at}
+        await get_cache().invalidate(f"rating:{ratingId}", f"ratings:{result['spot_id']}")
         updated_rating = RatingRead(
             id=result["id"],
             user_id=result["user_id"],
@@ -288,50 +608,71 @@ def update_rating(ratingId: UUID, body: RatingUpdate):
                 }
             ]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/review/{reviewId}", status_code=204)
-def delete_review(reviewId: UUID):
+async def delete_review(reviewId: UUID):
     reviewId = str(reviewId)
     try:
-        queries = [(
-            "DELETE FROM reviews WHERE id = %s",
-            (str(reviewId),)
-        )]
-        rows_deleted = execute_query(queries)
+        # The spot is needed to invalidate its cached lists.
+        found = await run_query([("SELECT spot_id FROM reviews WHERE id = %s;", (reviewId,))], only_one=True)
+        if not found:
+            raise HTTPException(status_code=404, detail=f"Review ID {reviewId} not found.")
+        queries = [
+            versions.bump_for_row_query("reviews", reviewId),
+            (
+                "DELETE FROM reviews WHERE id = %s",
+                (str(reviewId),)
+            )
+        ]
+        rows_deleted = await run_query(queries)
         if rows_deleted == 0:
             raise HTTPException(status_code=404, detail=f"Review ID {reviewId} not found.")
+        await get_cache().invalidate(f"review:{reviewId}", f"reviews:{found['spot_id']}")
         return None
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/rating/{ratingId}", status_code=204)
-def delete_rating(ratingId: UUID):
+async def delete_rating(ratingId: UUID):
     ratingId = str(ratingId)
     try:
-        queries = [(
-            "DELETE FROM ratings WHERE id = %s",
-            (str(ratingId),)
-        )]
-        rows_deleted = execute_query(queries)
+        # The spot is needed to invalidate its cached lists and average.
+        found = await run_query([("SELECT spot_id FROM ratings WHERE id = %s;", (ratingId,))], only_one=True)
+        if not found:
+            raise HTTPException(status_code=404, detail=f"Rating ID {ratingId} not found.")
+        queries = [
+            aggregates.remove_rating_query(ratingId),
+            rollups.remove_rating_query(ratingId),
+            versions.bump_for_row_query("ratings", ratingId),
+            (
+                "DELETE FROM ratings WHERE id = %s",
+                (str(ratingId),)
+            )
+        ]
+        rows_deleted = await run_query(queries)
         if rows_deleted == 0:
             raise HTTPException(status_code=404, detail=f"Rating ID {ratingId} not found.")
+        await get_cache().invalidate(f"rating:{ratingId}", f"ratings:{found['spot_id']}")
         return None
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/review/{reviewId}", status_code=200, response_model = ReviewResponse)
-def get_review(reviewId: UUID):
+async def get_review(reviewId: UUID):
     reviewId = str(reviewId)
-    queries = [("SELECT * FROM reviews WHERE id = %s;", (reviewId,))]
-    results = execute_query(queries)
-    if len(results) == 0:
-        raise HTTPException(status_code=404, detail=f"Review ID {reviewId} not found.")
+    item = await cached_row("review", reviewId)
 
-    item = results[0]
     review_read = ReviewRead(
         id = item["id"],
+        user_id = item["user_id"],
         review = item["review"],
         created_at=item["created_at"],
         updated_at=item["updated_at"],
@@ -350,16 +691,13 @@ def get_review(reviewId: UUID):
     }
 
 @app.get("/rating/{ratingId}", status_code=200, response_model = RatingResponse)
-def get_rating(ratingId: UUID):
+async def get_rating(ratingId: UUID):
     ratingId = str(ratingId)
-    queries = [("SELECT * FROM ratings WHERE id = %s;", (ratingId,))]
-    results = execute_query(queries)
-    if len(results) == 0:
-        raise HTTPException(status_code=404, detail=f"Rating ID {ratingId} not found.")
+    item = await cached_row("rating", ratingId)
 
-    item = results[0]
     rating_read = RatingRead(
         id = item["id"],
+        user_id = item["user_id"],
         rating = item["rating"],
         created_at=item["created_at"],
         updated_at=item["updated_at"],
@@ -377,92 +715,295 @@ def get_rating(ratingId: UUID):
         ]
     }
 
-@app.get("/ratings/{spotId}", status_code=200, response_model=List[RatingResponse])
-def get_ratings(spotId: str):
-    queries = [("SELECT * FROM ratings WHERE spot_id = %s;", (spotId,))]
-    results = execute_query(queries)
-    items = []
-    links = []
-    for item in results:
-        items.append(
-            RatingRead(
-                id = item["id"],
-                user_id = item["user_id"],
-                rating = item["rating"],
-                created_at=item["created_at"],
-                updated_at=item["updated_at"],
-                postDate = item["created_at"]
-            )
-        )
-        links.append({
-            "href": "self",
-            "rel": f"/rating/{item['id']}",
-            "type" : "GET"
-        })
-    response_data = [
+# Output field -> column for the list endpoints' fields= projection.
+RATING_FIELDS = {
+    "id": "id",
+    "user_id": "user_id",
+    "rating": "rating",
+    "postDate": "created_at",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}
+REVIEW_FIELDS = {
+    "id": "id",
+    "user_id": "user_id",
+    "review": "review",
+    "postDate": "created_at",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}
+# Sort orders as (column, descending) pairs; the last key must be unique.
+NEWEST = (("created_at", True), ("id", True))
+OLDEST = (("created_at", False), ("id", False))
+RATING_ORDERS = {"newest": NEWEST, "oldest": OLDEST, "highest": (("rating", True),) + NEWEST}
+REVIEW_ORDERS = {"newest": NEWEST, "oldest": OLDEST}
+SEARCH_FIELDS = {**REVIEW_FIELDS, "spot_id": "spot_id", "score": "score"}
+# A user's history: which spot each row is about, in the orders the (user_id, created_at, id) indexes serve.
+USER_RATING_FIELDS = {"id": "id", "spot_id": "spot_id", **RATING_FIELDS}
+USER_REVIEW_FIELDS = {"id": "id", "spot_id": "spot_id", **REVIEW_FIELDS}
+USER_ORDERS = {"newest": NEWEST, "oldest": OLDEST}
+
+
+async def spot_version(spotId: str, kind: str) -> dict:
+    """The spot's change counter, used to answer conditional GETs without reading rows."""
+    async def load():
+        result = await run_query([versions.read_query(spotId, kind)], only_one=True)
+        return versions.to_version(result)
+
+    return await get_cache().get_or_load(f"version:{kind}:{spotId}", load, tags=[f"{kind}:{spotId}"])
+
+
+def list_page(request: Request, rows: list, fields: list, field_columns: dict, item_path: str, next_cursor: Optional[str]):
+    data = [
         {
-            "data": item,
-            "links": [link]
-        } for item, link in zip(items, links)
+            "data": {field: row[field_columns[field]] for field in fields},
+            "links": [
+                {
+                    "href": "self",
+                    "rel": f"{item_path}/{row['id']}",
+                    "type" : "GET"
+                }
+            ]
+        } for row in rows
     ]
-    return response_data
-
-@app.get("/reviews/{spotId}", status_code=200, response_model=List[ReviewResponse])
-def get_reviews(spotId: str):
-    queries = [("SELECT * FROM reviews WHERE spot_id = %s;", (spotId,))]
-    results = execute_query(queries)
-    items = []
     links = []
-    for item in results:
-        items.append(
-            ReviewRead(
-                id = item["id"],
-                user_id = item["user_id"],
-                review = item["review"],
-                created_at=item["created_at"],
-                updated_at=item["updated_at"],
-                postDate=item["created_at"]
-            )
-        )
+    if next_cursor:
+        url = request.url.include_query_params(cursor=next_cursor)
         links.append({
-            "href": "self",
-            "rel": f"/review/{item['id']}",
+            "href": "next",
+            "rel": f"{url.path}?{url.query}",
             "type" : "GET"
         })
+    return {"data": data, "links": links}
 
-    response_data = [
-        {
-            "data": item,
-            "links": [link]
-        } for item, link in zip(items, links)
-    ]
-    return response_data
 
-@app.get("/ratings/{spotId}/average", status_code=200, response_model=RatingAggregationResponse)
-def get_average_rating(spotId: str):
-    queries = [(
-        "SELECT AVG(rating) AS average_rating, COUNT(rating) as rating_count FROM ratings WHERE spot_id = %s;", 
-        (spotId,)
-    )]
-    result = execute_query(queries, only_one=True)
-    response = None
-
-    if not result or result["average_rating"] is None:
-        response = RatingAggregation(
-            spotId=spotId,
-            average_rating=0.0,
-            rating_count=0
+NEXT_LINK_RESPONSE = {
+    200: {"headers": {"Link": {"description": '`<...>; rel="next"` while there are more pages to fetch', "schema": {"type": "string"}}}}
+}
+
+
+def next_link_header(page: dict) -> dict:
+    """A page's "next" link as an RFC 8288 ``Link`` header, for lists whose body is a bare array."""
+    for link in page["links"]:
+        if link["href"] == "next":
+            return {"Link": f'<{link["rel"]}>; rel="next"'}
+    return {}
+
+
+@app.get("/ratings/{spotId}", status_code=200, response_model=List[RatingListItemResponse], response_model_exclude_unset=True, responses=NEXT_LINK_RESPONSE)
+async def get_ratings(
+    request: Request,
+    spotId: str,
+    limit: Optional[int] = Query(
+        None, ge=1, le=MAX_PAGE_SIZE, description="Ratings per page; without it (and no cursor) every one of the spot's ratings is returned"
+    ),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's Link: rel=\"next\" header"),
+    order: Literal["newest", "oldest", "highest"] = Query("newest", description="Sort order"),
+    fields: Optional[str] = Query(None, description="Comma separated fields to return, e.g. id,rating"),
+):
+    keys = RATING_ORDERS[order]
+    if cursor and limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    try:
+        selected = pagination.parse_fields(fields, RATING_FIELDS)
+        columns = [RATING_FIELDS[field] for field in selected]
+        queries = [pagination.page_query("ratings", "spot_id", spotId, columns, keys, order, cursor, limit)]
+    except pagination.PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def load():
+        results = await run_query(queries)
+        rows, next_cursor = pagination.split_page(results, keys, order, limit)
+        return list_page(request, rows, selected, RATING_FIELDS, "/rating", next_cursor)
+
+    def tags(page):
+        return [f"ratings:{spotId}", *(f"rating:{item['data']['id']}" for item in page["data"])]
+
+    cache_key = f"ratings:{spotId}:{order}:{limit}:{fields or ''}:{cursor or ''}"
+    version = await spot_version(spotId, "ratings")
+    etag = http_cache.make_etag(cache_key, version["version"])
+    headers = http_cache.validator_headers("ratings", etag, version["updated_at"])
+    if http_cache.not_modified(request, etag, version["updated_at"]):
+        return Response(status_code=304, headers=headers)
+    page = await get_cache().get_or_load(cache_key, load, tags=tags)
+    # The body stays the array these endpoints have always returned; the next page is in the Link header.
+    return FastJSONResponse(page["data"], headers={**headers, **next_link_header(page)})
+
+@app.get("/reviews/{spotId}", status_code=200, response_model=List[ReviewListItemResponse], response_model_exclude_unset=True, responses=NEXT_LINK_RESPONSE)
+async def get_reviews(
+    request: Request,
+    spotId: str,
+    limit: Optional[int] = Query(
+        None, ge=1, le=MAX_PAGE_SIZE, description="Reviews per page; without it (and no cursor) every one of the spot's reviews is returned"
+    ),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's Link: rel=\"next\" header"),
+    order: Literal["newest", "oldest"] = Query("newest", description="Sort order"),
+    fields: Optional[str] = Query(None, description="Comma separated fields to return, e.g. id,user_id"),
+):
+    keys = REVIEW_ORDERS[order]
+    if cursor and limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    try:
+        selected = pagination.parse_fields(fields, REVIEW_FIELDS)
+        columns = [REVIEW_FIELDS[field] for field in selected]
+        queries = [pagination.page_query("reviews", "spot_id", spotId, columns, keys, order, cursor, limit)]
+    except pagination.PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def load():
+        results = await run_query(queries)
+        rows, next_cursor = pagination.split_page(results, keys, order, limit)
+        return list_page(request, rows, selected, REVIEW_FIELDS, "/review", next_cursor)
+
+    def tags(page):
+        return [f"reviews:{spotId}", *(f"review:{item['data']['id']}" for item in page["data"])]
+
+    cache_key = f"reviews:{spotId}:{order}:{limit}:{fields or ''}:{cursor or ''}"
+    version = await spot_version(spotId, "reviews")
+    etag = http_cache.make_etag(cache_key, version["version"])
+    headers = http_cache.validator_headers("reviews", etag, version["updated_at"])
+    if http_cache.not_modified(request, etag, version["updated_at"]):
+        return Response(status_code=304, headers=headers)
+    page = await get_cache().get_or_load(cache_key, load, tags=tags)
+    # The body stays the array these endpoints have always returned; the next page is in the Link header.
+    return FastJSONResponse(page["data"], headers={**headers, **next_link_header(page)})
+
+@app.get("/search/reviews", status_code=200, response_model=ReviewSearchPage)
+async def search_reviews(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200, description="Words to search review text for"),
+    spotId: Optional[str] = Query(None, description="Only search this spot's reviews"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Matches per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's next link"),
+):
+    """Reviews matching any of the words, most relevant first (see services/search.py)."""
+    words = search.terms(q)
+    if not words:
+        raise HTTPException(status_code=400, detail="Search text must contain at least one word.")
+    try:
+        offset = search.decode_offset(cursor) if cursor else 0
+    except pagination.PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    results = await run_query([search.search_query(words, spotId, limit, offset, sqlite=db_mode() == "sqlite")])
+    rows, next_cursor = search.split_page(results, limit, offset)
+    return FastJSONResponse(list_page(request, rows, list(SEARCH_FIELDS), SEARCH_FIELDS, "/review", next_cursor))
+
+async def user_page(request: Request, table: str, userId: str, field_columns: dict, item_path: str,
+                    limit: int, cursor: Optional[str], order: str, fields: Optional[str]):
+    keys = USER_ORDERS[order]
+    try:
+        selected = pagination.parse_fields(fields, field_columns)
+        columns = [field_columns[field] for field in selected]
+        queries = [pagination.page_query(table, "user_id", userId, columns, keys, order, cursor, limit)]
+    except pagination.PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    results = await run_query(queries)
+    rows, next_cursor = pagination.split_page(results, keys, order, limit)
+    return FastJSONResponse(list_page(request, rows, selected, field_columns, item_path, next_cursor))
+
+@app.get("/users/{userId}/ratings", status_code=200, response_model=RatingPage, response_model_exclude_unset=True)
+async def get_user_ratings(
+    request: Request,
+    userId: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Ratings per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's next link"),
+    order: Literal["newest", "oldest"] = Query("newest", description="Sort order"),
+    fields: Optional[str] = Query(None, description="Comma separated fields to return, e.g. spot_id,rating"),
+):
+    """Every rating the user has posted, across spots."""
+    return await user_page(request, "ratings", userId, USER_RATING_FIELDS, "/rating", limit, cursor, order, fields)
+
+@app.get("/users/{userId}/reviews", status_code=200, response_model=ReviewPage, response_model_exclude_unset=True)
+async def get_user_reviews(
+    request: Request,
+    userId: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Reviews per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's next link"),
+    order: Literal["newest", "oldest"] = Query("newest", description="Sort order"),
+    fields: Optional[str] = Query(None, description="Comma separated fields to return, e.g. spot_id,review"),
+):
+    """Every review the user has written, across spots."""
+    return await user_page(request, "reviews", userId, USER_REVIEW_FIELDS, "/review", limit, cursor, order, fields)
+
+@app.post("/users/{userId}/ratings/lookup", status_code=200, response_model=List[UserSpotRatingResponse])
+async def lookup_user_ratings(userId: str, body: UserRatingLookupRequest):
+    """The user's own rating of each spot (nulls where they haven't rated it), in one query."""
+    spot_ids = list(dict.fromkeys(body.spotIds))
+    if len(spot_ids) > MAX_USER_RATINGS_BATCH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_USER_RATINGS_BATCH} spot ids can be requested at once.",
         )
+    results = await run_query([ratings.user_ratings_query(userId, spot_ids)])
+    rows = {row["spot_id"]: row for row in results}
+
+    items = []
+    for spot_id in spot_ids:
+        row = rows.get(spot_id)
+        data, links = {"spotId": spot_id}, []
+        if row:
+            data.update(id=row["id"], rating=row["rating"], created_at=row["created_at"], updated_at=row["updated_at"])
+            links.append({
+                "href": "self",
+                "rel": f"/rating/{row['id']}",
+                "type" : "GET"
+            })
+        items.append({"data": data, "links": links})
+    return items
+
+def ndjson_row(row: dict, fields: dict) -> bytes:
+    item = {field: row[column] for field, column in fields.items()}
+    return (json.dumps(item, default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v)) + "\n").encode()
+
+
+def export_response(table: str, fields: dict, spotId: Optional[str], filename: str) -> StreamingResponse:
+    columns = ", ".join(dict.fromkeys(["spot_id", *fields.values()]))
+    if spotId is None:
+        query, params = f"SELECT {columns} FROM {table};", ()
     else:
-        avg_rating = round(float(result["average_rating"]), 1)
-        response = RatingAggregation (
-            spotId=spotId,
-            average_rating=avg_rating,
-            rating_count=result["rating_count"]
-        )
-    
+        query, params = f"SELECT {columns} FROM {table} WHERE spot_id = %s ORDER BY created_at, id;", (spotId,)
+    export_fields = {"spot_id": "spot_id", **fields}
+
+    async def lines():
+        async for rows in stream_rows(query, params, EXPORT_CHUNK_SIZE):
+            yield b"".join(ndjson_row(row, export_fields) for row in rows)
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/export/reviews", status_code=200, response_class=StreamingResponse)
+async def export_reviews(spotId: Optional[str] = Query(None, description="Only export this spot's reviews")):
+    """Streams reviews as newline-delimited JSON, one review per line."""
+    return export_response("reviews", REVIEW_FIELDS, spotId, f"reviews-{spotId or 'all'}.ndjson")
+
+@app.get("/export/ratings", status_code=200, response_class=StreamingResponse)
+async def export_ratings(spotId: Optional[str] = Query(None, description="Only export this spot's ratings")):
+    """Streams ratings as newline-delimited JSON, one rating per line."""
+    return export_response("ratings", RATING_FIELDS, spotId, f"ratings-{spotId or 'all'}.ndjson")
+
+@app.get("/ratings/{spotId}/average", status_code=200, response_model=RatingAggregationResponse)
+async def get_average_rating(request: Request, response: Response, spotId: str):
+    async def load():
+        queries = [aggregates.read_aggregate_query(spotId)]
+        result = await run_query(queries, only_one=True)
+        return aggregates.to_aggregation(spotId, result).model_dump()
+
+    version = await spot_version(spotId, "ratings")
+    etag = http_cache.make_etag(f"average:{spotId}", version["version"])
+    headers = http_cache.validator_headers("average", etag, version["updated_at"])
+    if http_cache.not_modified(request, etag, version["updated_at"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    # Tagged with the spot's ratings so every rating write for the spot drops it.
+    aggregation = await get_cache().get_or_load(f"average:{spotId}", load, tags=[f"ratings:{spotId}"])
+
     return {
-        "data": response,
+        "data": aggregation,
         "links": [
             {
                 "href": "collection",
@@ -473,13 +1014,156 @@ def get_average_rating(spotId: str):
     }
 
 
+@app.get("/ratings/{spotId}/trend", status_code=200, response_model=RatingTrendResponse)
+async def get_rating_trend(
+    request: Request,
+    response: Response,
+    spotId: str,
+    period: Literal["day", "week"] = Query("day", description="Bucket size; weeks start on Monday"),
+    last: int = Query(30, ge=1, le=MAX_TREND_BUCKETS, description="Number of buckets, ending with the current one"),
+):
+    """Average over the last N days or weeks, and per bucket, from the rollups (see services/rollups.py)."""
+    if period == "day" and last > rollups.day_retention():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Daily buckets are kept for {rollups.day_retention()} days; use period=week for longer windows.",
+        )
+    today = datetime.utcnow().date()
+    since = rollups.bucket_start(period, today) - timedelta(days=(last - 1) * (1 if period == "day" else 7))
+
+    async def load():
+        results = await run_query([rollups.read_query(spotId, period, since)])
+        return rollups.to_trend(spotId, period, last, today, results)
+
+    # The window moves at midnight UTC even when no ratings are written.
+    cache_key = f"trend:{spotId}:{period}:{last}:{today.isoformat()}"
+    version = await spot_version(spotId, "ratings")
+    etag = http_cache.make_etag(cache_key, version["version"])
+    headers = http_cache.validator_headers("average", etag, None)
+    if http_cache.not_modified(request, etag, None):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    trend = await get_cache().get_or_load(cache_key, load, tags=[f"ratings:{spotId}"])
+
+    return {
+        "data": trend,
+        "links": [
+            {
+                "href": "average",
+                "rel": f"/ratings/{spotId}/average",
+                "type" : "GET"
+            }
+        ]
+    }
+
+
+@app.post("/ratings/averages", status_code=200, response_model=List[RatingAggregationResponse])
+async def get_average_ratings(body: RatingAggregationBatchRequest):
+    spot_ids = list(dict.fromkeys(body.spotIds))
+    if len(spot_ids) > MAX_AVERAGES_BATCH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_AVERAGES_BATCH} spot ids can be requested at once.",
+        )
+    queries = [aggregates.read_aggregates_query(spot_ids)]
+    results = await run_query(queries)
+    rows = {row["spot_id"]: row for row in results}
+
+    return [
+        {
+            "data": aggregates.to_aggregation(spot_id, rows.get(spot_id)),
+            "links": [
+                {
+                    "href": "collection",
+                    "rel": f"/ratings/{spot_id}",
+                    "type" : "GET"
+                }
+            ]
+        } for spot_id in spot_ids
+    ]
+
+
+@app.get("/leaderboard", status_code=200, response_model=LeaderboardResponse)
+async def get_leaderboard(
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE, description="Number of spots"),
+    minCount: int = Query(0, ge=0, description="Only rank spots with at least this many ratings"),
+):
+    """Top-rated spots by Bayesian average (see services/leaderboard.py)."""
+    async def load():
+        results = await run_query([leaderboard.top_query(limit, minCount)])
+        return [leaderboard.to_entry(rank, row) for rank, row in enumerate(results, 1)]
+
+    # Not tagged: every rating write would drop it. A few seconds stale is fine for a ranking.
+    entries = await get_cache().get_or_load(f"leaderboard:{limit}:{minCount}", load, ttl=LEADERBOARD_TTL)
+
+    return {
+        "data": entries,
+        "links": [
+            {
+                "href": "self",
+                "rel": f"/leaderboard?limit={limit}&minCount={minCount}",
+                "type" : "GET"
+            }
+        ]
+    }
+
 
 # -----------------------------------------------------------------------------
-# Root
+# Root and docs: static payloads built once (at startup, or on first hit) with
+# their compressed variants, then served as stored bytes
 # -----------------------------------------------------------------------------
+OPENAPI_URL = "/openapi.json"
+DOCS_URL = "/docs"
+OAUTH2_REDIRECT_URL = "/docs/oauth2-redirect"
+REDOC_URL = "/redoc"
+OAS_YAML_PATH = oas.OAS_YAML_PATH
+
+static_payloads = StaticPayloads()
+static_payloads.register("root", lambda: StaticPayload(
+    dumps({"message": "Welcome to the Reviews and Ratings API. See /docs for OpenAPI UI."}), "application/json"
+))
+static_payloads.register("openapi", lambda: StaticPayload(dumps(app.openapi()), "application/json"))
+static_payloads.register("docs", lambda: StaticPayload(get_swagger_ui_html(
+    openapi_url=OPENAPI_URL, title=f"{app.title} - Swagger UI", oauth2_redirect_url=OAUTH2_REDIRECT_URL,
+).body, "text/html"))
+static_payloads.register("oauth2-redirect", lambda: StaticPayload(get_swagger_ui_oauth2_redirect_html().body, "text/html"))
+static_payloads.register("redoc", lambda: StaticPayload(
+    get_redoc_html(openapi_url=OPENAPI_URL, title=f"{app.title} - ReDoc").body, "text/html"
+))
+
+
+def read_oas_yaml() -> StaticPayload:
+    with open(OAS_YAML_PATH, "rb") as f:
+        return StaticPayload(f.read(), "application/yaml")
+
+
+static_payloads.register("oas.yaml", read_oas_yaml)
+
+
+@app.get(OPENAPI_URL, include_in_schema=False)
+def get_openapi_schema(request: Request):
+    return static_payloads.get("openapi").response(request)
+
+@app.get(DOCS_URL, include_in_schema=False)
+def get_docs(request: Request):
+    return static_payloads.get("docs").response(request)
+
+@app.get(OAUTH2_REDIRECT_URL, include_in_schema=False)
+def get_docs_oauth2_redirect(request: Request):
+    return static_payloads.get("oauth2-redirect").response(request)
+
+@app.get(REDOC_URL, include_in_schema=False)
+def get_redoc(request: Request):
+    return static_payloads.get("redoc").response(request)
+
+@app.get("/oas.yaml", include_in_schema=False)
+def get_oas_yaml(request: Request):
+    return static_payloads.get("oas.yaml").response(request)
+
 @app.get("/")
-def root():
-    return {"message": "Welcome to the Reviews and Ratings API. See /docs for OpenAPI UI."}
+def root(request: Request):
+    return static_payloads.get("root").response(request)
 
 # -----------------------------------------------------------------------------
 # Entrypoint for `python main.py`
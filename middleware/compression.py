@@ -0,0 +1,86 @@
+"""gzip/brotli compression of JSON and text responses (see :mod:`utils.compression`).
+
+Plain ASGI, like :class:`middleware.timing.TimingMiddleware`. A response
+that fits in one body message is compressed whole when it is at least
+``minimum_size`` bytes; a streamed one (the NDJSON exports) is compressed
+chunk by chunk and flushed after each, so the client still gets rows as
+they are read. Responses that already carry a ``Content-Encoding`` (the
+precompressed static payloads) and non-text types are passed through.
+"""
+from __future__ import annotations
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from utils.compression import Encoder, compressible, negotiate
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "br": brotli_quality}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _Responder(send, encoding, self.levels[encoding], self.minimum_size).send)
+
+
+class _Responder:
+    def __init__(self, send, encoding: str, level: int, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self.start = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def send(self, message):
+        if self.passthrough:
+            await self._send(message)
+            return
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.encoder is None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            if (
+                "content-encoding" in headers
+                or not compressible(headers.get("content-type"))
+                or self.start["status"] in (204, 304)
+                or (not more_body and len(body) < self.minimum_size)
+            ):
+                if compressible(headers.get("content-type")):
+                    headers.add_vary_header("Accept-Encoding")
+                self.passthrough = True
+                await self._send(self.start)
+                await self._send(message)
+                return
+
+            self.encoder = Encoder(self.encoding, self.level)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+                body = self.encoder.chunk(body)
+            else:
+                body = self.encoder.finish(body)
+                headers["Content-Length"] = str(len(body))
+            await self._send(self.start)
+            await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        body = self.encoder.chunk(body) if more_body else self.encoder.finish(body)
+        await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
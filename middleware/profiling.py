@@ -0,0 +1,100 @@
+"""Sampled request profiling, and the request context for the slow-query log.
+
+Every request's ASGI scope is made visible to :mod:`utils.slow_queries`, so
+a slow statement is logged with the route that ran it.
+
+Profiling is off by default. ``PROFILE_EVERY_N=N`` profiles one request in
+N; ``PROFILE_TOKEN=secret`` profiles any request sent with
+``X-Debug-Profile: secret``. Each profiled request writes a cProfile dump to
+``PROFILE_DIR`` (default ``profiles``), named after the route and duration::
+
+    python -m pstats profiles/20240101T120000-GET-ratings_spotId-41ms-1a2b3c4d.prof
+    flameprof profiles/....prof > flame.svg     # or snakeviz, or speedscope
+
+The profiler runs on the event loop thread, one request at a time (others
+are not profiled while it runs). Anything else the loop does meanwhile shows
+up in the profile, and queries run on the threadpool (``DB_MODE=sync`` and
+``sqlite``) show up as the time spent awaiting them.
+"""
+from __future__ import annotations
+
+import cProfile
+import hmac
+import itertools
+import os
+import re
+import threading
+import time
+from typing import Optional
+from uuid import uuid4
+
+import anyio.to_thread
+
+from utils import slow_queries
+from utils.config import env_int, env_str
+
+HEADER = b"x-debug-profile"
+
+EVERY_N = env_int("PROFILE_EVERY_N", 0)
+TOKEN = env_str("PROFILE_TOKEN")
+DIRECTORY = env_str("PROFILE_DIR", "profiles")
+
+_SLUG = re.compile(r"[^A-Za-z0-9]+")
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, every: int = 0, token: Optional[str] = None, directory: str = "profiles"):
+        self.app = app
+        self.every = every
+        self.token = token.encode() if token else None
+        self.directory = directory
+        self._counter = itertools.count(1)
+        self._busy = threading.Lock()
+
+    def _wanted(self, scope) -> bool:
+        if self.token is not None:
+            for name, value in scope["headers"]:
+                if name == HEADER:
+                    return hmac.compare_digest(value, self.token)
+        return self.every > 0 and next(self._counter) % self.every == 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = slow_queries.set_request_scope(scope)
+        try:
+            if (self.every or self.token) and self._wanted(scope) and self._busy.acquire(blocking=False):
+                await self._profiled(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            slow_queries.reset_request_scope(token)
+
+    async def _profiled(self, scope, receive, send):
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                profiler.disable()
+        finally:
+            self._busy.release()
+            await anyio.to_thread.run_sync(self._dump, profiler, scope, time.perf_counter() - start)
+
+    def _dump(self, profiler: cProfile.Profile, scope, seconds: float) -> str:
+        route = getattr(scope.get("route"), "path", None) or "unmatched"
+        name = "{}-{}-{}-{}ms-{}.prof".format(
+            time.strftime("%Y%m%dT%H%M%S", time.gmtime()),
+            scope["method"],
+            _SLUG.sub("_", route).strip("_") or "root",
+            round(seconds * 1000),
+            uuid4().hex[:8],
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        profiler.dump_stats(path)
+        return path
@@ -0,0 +1,74 @@
+"""Sends GET reads to the read replicas, and a client's reads right after its writes to the primary.
+
+See :mod:`services.replicas`. A successful write (a request to one of the
+``writes`` routes, ``(method, path template)``, answered below 400) gets an
+``X-Read-Primary-Until`` header and a cookie of the same value, ``window``
+seconds from now. Routes are listed rather than inferred from the method
+because some POSTs only read (batch lookups), and pinning their callers
+would keep them off the replicas and the response cache. A GET or HEAD that
+sends either back before then is pinned: it reads from the primary and
+skips the response cache. Any other GET or HEAD may read from a replica. Everything else keeps the default, the primary.
+"""
+from __future__ import annotations
+
+import math
+import time
+from typing import Iterable
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import cookie_parser
+
+from services import replicas
+
+HEADER = "x-read-primary-until"
+COOKIE = "read_primary_until"
+READ_METHODS = ("GET", "HEAD")
+
+
+def pinned_to_primary(headers: Headers, now: float) -> bool:
+    for value in (headers.get(HEADER), cookie_parser(headers.get("cookie", "")).get(COOKIE)):
+        try:
+            if value is not None and float(value) > now:
+                return True
+        except ValueError:
+            pass
+    return False
+
+
+class ReadRoutingMiddleware:
+    def __init__(self, app, window: float = 10.0, writes: Iterable[tuple] = ()):
+        self.app = app
+        self.window = window
+        self.writes = frozenset(writes)
+
+    def is_write(self, scope) -> bool:
+        # The router has matched (and set scope["route"]) by the time the response starts.
+        return (scope["method"], getattr(scope.get("route"), "path", None)) in self.writes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        if method in READ_METHODS:
+            pinned = pinned_to_primary(Headers(scope=scope), time.time())
+            token = replicas.set_route("pinned" if pinned else "replica")
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                replicas.reset_route(token)
+            return
+
+        async def send_stamped(message):
+            if message["type"] == "http.response.start" and message["status"] < 400 and self.is_write(scope):
+                until = f"{time.time() + self.window:.3f}"
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Read-Primary-Until", until)
+                headers.append(
+                    "Set-Cookie",
+                    f"{COOKIE}={until}; Max-Age={math.ceil(self.window)}; Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_stamped)
@@ -0,0 +1,103 @@
+"""Per-request timing for :mod:`utils.metrics`.
+
+:class:`TimingMiddleware` is plain ASGI rather than ``BaseHTTPMiddleware``
+so it adds no extra task per request and doesn't buffer streamed responses.
+It records latency by route template (``/ratings/{spotId}``, not the raw
+path, so the label set stays bounded), status and response size, and adds
+the ``Server-Timing`` header when enabled.
+
+:class:`TimedRoute` is installed as the app's ``route_class`` and times the
+endpoint function separately from the FastAPI work around it (body parsing,
+response-model validation, JSON encoding).
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import time
+
+from fastapi.routing import APIRoute
+
+from utils import metrics
+
+
+class TimingMiddleware:
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings, token = metrics.start_request()
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_timed(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    header = timings.server_timing(time.perf_counter() - start)
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode())]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            metrics.observe_request(scope["method"], template, status, time.perf_counter() - start, size, timings)
+            metrics.end_request(token)
+
+
+def _timed_endpoint(endpoint):
+    """Wrap ``endpoint`` to record its duration, keeping it sync or async as it was."""
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _record_endpoint(time.perf_counter() - start)
+    else:
+        @functools.wraps(endpoint)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _record_endpoint(time.perf_counter() - start)
+    return timed
+
+
+def _record_endpoint(seconds: float) -> None:
+    timings = metrics.current()
+    if timings is not None:
+        timings.endpoint = seconds
+
+
+class TimedRoute(APIRoute):
+    def get_route_handler(self):
+        # Wrap the dependant's call rather than the endpoint passed in, so
+        # FastAPI still reads parameters and annotations off the original.
+        if self.dependant.call is self.endpoint:
+            self.dependant.call = _timed_endpoint(self.endpoint)
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            start = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                timings = metrics.current()
+                if timings is not None:
+                    timings.route = time.perf_counter() - start
+
+        return timed_handler
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from typing import Any, List, Optional
+from uuid import UUID
+from pydantic import BaseModel, Field
+
+
+class BulkRequest(BaseModel):
+    items: List[Any] = Field(
+        ...,
+        description="Items to create; each is validated on its own so one bad item doesn't reject the batch",
+        min_length=1,
+    )
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "items": [
+                        {
+                            "spot_id": "99999999-9999-4999-8999-999999999999",
+                            "user_id": "user-1",
+                            "rating": 4,
+                            "postDate": "2025-01-15T10:20:30Z"
+                        }
+                    ]
+                }
+            ]
+        }
+    }
+
+
+class BulkItemResult(BaseModel):
+    index: int = Field(..., description="Position of the item in the request")
+    id: Optional[UUID] = Field(default=None, description="ID of the stored item (for a rating, the user's rating of the spot)")
+    status: int = Field(
+        ...,
+        description="201 created, 200 replaced the user's rating of the spot or superseded by a later item "
+        "for the same spot and user, 409 duplicate, 422 invalid, 500 failed",
+    )
+    error: Optional[str] = Field(default=None, description="Why the item was not created")
+
+
+class BulkResponse(BaseModel):
+    data: List[BulkItemResult]
+    created: int = Field(..., description="Number of items created")
+    failed: int = Field(..., description="Number of items that failed")
+    links: list
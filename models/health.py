@@ -21,4 +21,101 @@ class Health(BaseModel):
                 "path_echo": "Hello from path"
             }
         }
-    }
\ No newline at end of file
+    }
+
+class PoolStats(BaseModel):
+    size: int = Field(description="Connections the pool keeps open")
+    max_overflow: int = Field(description="Extra connections allowed above size under burst")
+    in_use: int = Field(description="Connections currently checked out")
+    idle: int = Field(description="Open connections waiting in the pool")
+    waiting: Optional[int] = Field(default=None, description="Requests currently waiting for a connection (sync mode only)")
+    created: Optional[int] = Field(default=None, description="Connections opened since startup (sync mode only)")
+    recycled: Optional[int] = Field(default=None, description="Connections replaced for age, idleness or a failed ping (sync mode only)")
+    closed: Optional[int] = Field(default=None, description="Connections closed since startup (sync mode only)")
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "size": 5,
+                "max_overflow": 10,
+                "in_use": 2,
+                "idle": 3,
+                "waiting": 0,
+                "created": 5,
+                "recycled": 0,
+                "closed": 0
+            }
+        }
+    }
+
+
+class ReplicaStats(BaseModel):
+    host: str = Field(description="Replica address (host:port)")
+    in_rotation: bool = Field(description="Whether GET reads are being sent to it")
+    lag: Optional[float] = Field(default=None, description="Seconds behind the primary at the last check; null if unknown or replication is stopped")
+    error: Optional[str] = Field(default=None, description="Why the last check or read failed, if it did")
+    in_use: int = Field(description="Connections currently checked out")
+    reads: int = Field(description="Requests' reads sent to it since startup")
+    failures: int = Field(description="Reads that failed and were retried on the primary")
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "host": "10.0.0.12:3306",
+                "in_rotation": True,
+                "lag": 0.0,
+                "error": None,
+                "in_use": 1,
+                "reads": 5400,
+                "failures": 0
+            }
+        }
+    }
+
+
+class CacheStats(BaseModel):
+    backend: str = Field(description="Cache backend in use (memory or redis)")
+    hits: int = Field(description="Lookups served from the cache")
+    misses: int = Field(description="Lookups that went to the database")
+    loads: int = Field(description="Entries computed by this instance")
+    coalesced: int = Field(description="Misses that reused another request's in-flight load")
+    invalidations: int = Field(description="Entries dropped by writes")
+    entries: Optional[int] = Field(default=None, description="Entries currently cached (memory backend)")
+    bytes: Optional[int] = Field(default=None, description="Approximate bytes held by cached entries (memory backend)")
+    max_entries: Optional[int] = Field(default=None, description="Entry limit before LRU eviction (memory backend)")
+    max_bytes: Optional[int] = Field(default=None, description="Byte limit before LRU eviction (memory backend)")
+    evictions: Optional[int] = Field(default=None, description="Entries evicted to stay under the limits (memory backend)")
+    expirations: Optional[int] = Field(default=None, description="Entries dropped because their TTL passed (memory backend)")
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "backend": "memory",
+                "hits": 5400,
+                "misses": 320,
+                "loads": 300,
+                "coalesced": 20,
+                "invalidations": 12,
+                "entries": 120,
+                "bytes": 481230,
+                "max_entries": 10000,
+                "max_bytes": 67108864,
+                "evictions": 0,
+                "expirations": 200
+            }
+        }
+    }
+
+
+class WriteBehindStats(BaseModel):
+    running: bool = Field(description="Whether write-behind mode is on and its flush task is running")
+    depth: int = Field(description="Ratings waiting to be written")
+    max_size: int = Field(description="Queue capacity; submissions beyond it get a 503")
+    accepted: int = Field(description="Ratings accepted into the queue")
+    rejected: int = Field(description="Ratings turned away because the queue was full")
+    flushed: int = Field(description="Ratings written to the database")
+    failed: int = Field(description="Ratings that could not be written")
+    flushes: int = Field(description="Batches flushed")
+    last_flush_ms: float = Field(description="Duration of the latest flush")
+    max_flush_ms: float = Field(description="Longest flush so far")
+    avg_flush_ms: float = Field(description="Mean flush duration")
@@ -1,8 +1,8 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import Dict, List, Literal, Optional
 from uuid import UUID, uuid4
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from pydantic import BaseModel, Field
 import math
 
@@ -55,6 +55,12 @@ class RatingCreate(RatingBase):
     }
 
 
+class RatingBulkItem(RatingCreate):
+    """One item of a bulk upload; spot and user come with each item instead of the path."""
+    spot_id: str = Field(..., description="The spot being rated")
+    user_id: str = Field(..., description="The user who rated")
+
+
 class RatingUpdate(BaseModel):
     """Partial update; rating ID is taken from the path, not the body."""
 
@@ -120,6 +126,11 @@ class RatingAggregation(BaseModel):
         json_schema_extra={"example": 2,},
         ge=0
     )
+    histogram: Optional[Dict[str, int]] = Field(
+        default=None,
+        description="Number of ratings per star value, keyed \"1\" to \"5\"",
+        json_schema_extra={"example": {"1": 0, "2": 0, "3": 1, "4": 0, "5": 1}},
+    )
 
     model_config = {
         "json_schema_extra": {
@@ -127,12 +138,75 @@ class RatingAggregation(BaseModel):
                 {
                     "spotId": "99999999-9999-4999-8999-999999999999",
                     "average_rating": 4.0,
-                    "rating_count": 2
+                    "rating_count": 2,
+                    "histogram": {"1": 0, "2": 0, "3": 1, "4": 0, "5": 1}
                 }
             ]
         }
     }
 
+class RatingAggregationBatchRequest(BaseModel):
+    spotIds: List[str] = Field(
+        ...,
+        description="Spot ids to fetch averages for",
+        min_length=1,
+        json_schema_extra={"example": ["99999999-9999-4999-8999-999999999999"]},
+    )
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "spotIds": [
+                        "99999999-9999-4999-8999-999999999999",
+                        "88888888-8888-4888-8888-888888888888"
+                    ]
+                }
+            ]
+        }
+    }
+
+class RatingListItem(BaseModel):
+    """A rating in a list response; only the fields selected with ``fields=`` are present."""
+    id: Optional[UUID] = Field(default=None, description="Rating ID.")
+    spot_id: Optional[str] = Field(default=None, description="The spot rated (user lists only)")
+    user_id: Optional[str] = Field(default=None, description="The user who rated")
+    rating: Optional[int] = Field(default=None, description="The rating")
+    postDate: Optional[datetime] = Field(default=None, description="Date/time the rating was posted.")
+    created_at: Optional[datetime] = Field(default=None, description="Creation timestamp (UTC).")
+    updated_at: Optional[datetime] = Field(default=None, description="Last update timestamp (UTC).")
+
+class RatingListItemResponse(BaseModel):
+    data: RatingListItem
+    links: list
+
+class RatingPage(BaseModel):
+    data: List[RatingListItemResponse]
+    links: list = Field(
+        default_factory=list,
+        description="Contains a \"next\" link while there are more ratings to fetch",
+    )
+
+class UserRatingLookupRequest(BaseModel):
+    spotIds: List[str] = Field(
+        ...,
+        description="Spot ids to look up the user's ratings for",
+        min_length=1,
+        json_schema_extra={"example": ["99999999-9999-4999-8999-999999999999"]},
+    )
+
+class UserSpotRating(BaseModel):
+    """The user's rating of one spot; ``rating`` and the rest are null if they haven't rated it."""
+    spotId: str = Field(..., description="spot id")
+    id: Optional[UUID] = Field(default=None, description="Rating ID.")
+    rating: Optional[int] = Field(default=None, description="The user's rating")
+    created_at: Optional[datetime] = Field(default=None, description="Creation timestamp (UTC).")
+    updated_at: Optional[datetime] = Field(default=None, description="Last update timestamp (UTC).")
+
+class UserSpotRatingResponse(BaseModel):
+    data: UserSpotRating
+    links: list
+
 class RatingResponse(BaseModel):
     data: RatingRead
     links: list
@@ -140,3 +214,42 @@ class RatingResponse(BaseModel):
 class RatingAggregationResponse(BaseModel):
     data: RatingAggregation
     links: list
+
+class LeaderboardEntry(BaseModel):
+    rank: int = Field(..., description="1 for the best spot", json_schema_extra={"example": 1})
+    spotId: str = Field(..., description="spot id", json_schema_extra={"example": "99999999-9999-4999-8999-999999999999"})
+    score: float = Field(
+        ...,
+        description="Bayesian average the ranking is by: the average after adding a fixed number of neutral ratings",
+        json_schema_extra={"example": 4.74},
+    )
+    average_rating: float = Field(..., description="The plain average rating", json_schema_extra={"example": 4.8})
+    rating_count: int = Field(..., description="The rating count", json_schema_extra={"example": 300}, ge=0)
+
+class LeaderboardResponse(BaseModel):
+    data: List[LeaderboardEntry]
+    links: list
+
+class RatingTrendBucket(BaseModel):
+    start: date = Field(..., description="First day of the bucket", json_schema_extra={"example": "2025-01-13"})
+    average_rating: float = Field(..., description="Average of the bucket's ratings, 0 if none", json_schema_extra={"example": 4.2})
+    rating_count: int = Field(..., description="Ratings in the bucket", json_schema_extra={"example": 12}, ge=0)
+    histogram: Dict[str, int] = Field(
+        ...,
+        description="Number of ratings per star value, keyed \"1\" to \"5\"",
+        json_schema_extra={"example": {"1": 0, "2": 1, "3": 1, "4": 4, "5": 6}},
+    )
+
+class RatingTrend(BaseModel):
+    spotId: str = Field(..., description="spot id", json_schema_extra={"example": "99999999-9999-4999-8999-999999999999"})
+    period: Literal["day", "week"] = Field(..., description="Bucket size; weeks start on Monday")
+    start: date = Field(..., description="First day of the window")
+    end: date = Field(..., description="Last day of the window (today, or the end of this week)")
+    average_rating: float = Field(..., description="Average over the whole window, 0 if no ratings", json_schema_extra={"example": 4.3})
+    rating_count: int = Field(..., description="Ratings in the window", json_schema_extra={"example": 48}, ge=0)
+    histogram: Dict[str, int] = Field(..., description="Number of ratings per star value in the window")
+    buckets: List[RatingTrendBucket] = Field(..., description="One entry per day or week, oldest first, empty ones included")
+
+class RatingTrendResponse(BaseModel):
+    data: RatingTrend
+    links: list
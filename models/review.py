@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID, uuid4
 from datetime import datetime, timezone
 from pydantic import BaseModel, Field
@@ -51,6 +51,12 @@ class ReviewCreate(ReviewBase):
     }
 
 
+class ReviewBulkItem(ReviewCreate):
+    """One item of a bulk upload; spot and user come with each item instead of the path."""
+    spot_id: str = Field(..., description="The spot being reviewed")
+    user_id: str = Field(..., description="The user who wrote the review")
+
+
 class ReviewUpdate(BaseModel):
     """Partial update; review ID is taken from the path, not the body."""
 
@@ -96,6 +102,48 @@ class ReviewRead(ReviewBase):
         }
     }
 
+class ReviewListItem(BaseModel):
+    """A review in a list response; only the fields selected with ``fields=`` are present."""
+    id: Optional[UUID] = Field(default=None, description="Review ID.")
+    spot_id: Optional[str] = Field(default=None, description="The spot the review is about (user lists only)")
+    user_id: Optional[str] = Field(default=None, description="The user who wrote the review")
+    review: Optional[str] = Field(default=None, description="The review")
+    postDate: Optional[datetime] = Field(default=None, description="Date/time the review was posted.")
+    created_at: Optional[datetime] = Field(default=None, description="Creation timestamp (UTC).")
+    updated_at: Optional[datetime] = Field(default=None, description="Last update timestamp (UTC).")
+
+class ReviewListItemResponse(BaseModel):
+    data: ReviewListItem
+    links: list
+
+class ReviewPage(BaseModel):
+    data: List[ReviewListItemResponse]
+    links: list = Field(
+        default_factory=list,
+        description="Contains a \"next\" link while there are more reviews to fetch",
+    )
+
+class ReviewSearchItem(BaseModel):
+    id: UUID = Field(..., description="Review ID.")
+    spot_id: str = Field(..., description="The spot the review is about")
+    user_id: str = Field(..., description="The user who wrote the review")
+    review: str = Field(..., description="The review")
+    postDate: datetime = Field(..., description="Date/time the review was posted.")
+    created_at: datetime = Field(..., description="Creation timestamp (UTC).")
+    updated_at: Optional[datetime] = Field(default=None, description="Last update timestamp (UTC).")
+    score: float = Field(..., description="Relevance to the query; higher is better. Only comparable within one search.")
+
+class ReviewSearchItemResponse(BaseModel):
+    data: ReviewSearchItem
+    links: list
+
+class ReviewSearchPage(BaseModel):
+    data: List[ReviewSearchItemResponse]
+    links: list = Field(
+        default_factory=list,
+        description="Contains a \"next\" link while there are more matches to fetch",
+    )
+
 class ReviewResponse(BaseModel):
     data: ReviewRead
     links: list
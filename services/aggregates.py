@@ -0,0 +1,214 @@
+"""Per-spot rating aggregates.
+
+``rating_aggregates`` keeps one row per spot with the running sum, count and
+a 1-5 star histogram. The rating write handlers add the statements built here
+to the same ``execute_query`` batch as their INSERT/UPDATE/DELETE, so the
+aggregate row changes in the same transaction as the rating itself, and
+``/ratings/{spotId}/average`` becomes a primary-key read.
+
+If the table ever drifts (manual edits, a restore, rows written before the
+table existed) it can be checked and rebuilt from ``ratings``::
+
+    python -m services.aggregates check
+    python -m services.aggregates rebuild [--spot SPOT_ID]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import Optional
+
+from models.rating import RatingAggregation
+
+STARS = (1, 2, 3, 4, 5)
+_HIST_COLUMNS = ", ".join(f"count_{star}" for star in STARS)
+
+CREATE_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS rating_aggregates (
+    spot_id VARCHAR(64) NOT NULL PRIMARY KEY,
+    rating_sum BIGINT NOT NULL DEFAULT 0,
+    rating_count BIGINT NOT NULL DEFAULT 0,
+    {", ".join(f"count_{star} BIGINT NOT NULL DEFAULT 0" for star in STARS)},
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+)
+"""
+
+
+def add_rating_query(spot_id: str, rating: int) -> tuple:
+    """Count a newly inserted rating for ``spot_id``."""
+    return add_ratings_query([(spot_id, rating)])
+
+
+def add_ratings_query(ratings: list) -> tuple:
+    """Count newly inserted ``(spot_id, rating)`` pairs, one aggregate row per spot."""
+    deltas: dict = {}
+    for spot_id, rating in ratings:
+        delta = deltas.setdefault(spot_id, [0, 0] + [0] * len(STARS))
+        delta[0] += rating
+        delta[1] += 1
+        delta[1 + rating] += 1
+    row = f"(%s, %s, %s, {', '.join(['%s'] * len(STARS))})"
+    updates = ", ".join(f"count_{star} = count_{star} + VALUES(count_{star})" for star in STARS)
+    return (
+        f"INSERT INTO rating_aggregates (spot_id, rating_sum, rating_count, {_HIST_COLUMNS}) "
+        f"VALUES {', '.join([row] * len(deltas))} "
+        f"ON DUPLICATE KEY UPDATE rating_sum = rating_sum + VALUES(rating_sum), "
+        f"rating_count = rating_count + VALUES(rating_count), {updates};",
+        tuple(value for spot_id, delta in deltas.items() for value in (spot_id, *delta)),
+    )
+
+
+def uncount_existing_query(pairs: list) -> tuple:
+    """Uncount the current ratings of ``(spot_id, user_id)`` pairs an upsert is about to overwrite.
+
+    Must run before the upsert into ``ratings``; pairs without a rating yet
+    match nothing. Grouping by spot first matters because a multi-table
+    UPDATE changes each aggregate row at most once.
+    """
+    pairs = list(dict.fromkeys(pairs))
+    hist = ", ".join(f"SUM(rating = {star}) AS count_{star}" for star in STARS)
+    updates = ", ".join(f"a.count_{star} = a.count_{star} - o.count_{star}" for star in STARS)
+    return (
+        "UPDATE rating_aggregates a JOIN ("
+        f"SELECT spot_id, SUM(rating) AS rating_sum, COUNT(*) AS rating_count, {hist} FROM ratings "
+        f"WHERE (spot_id, user_id) IN ({', '.join(['(%s, %s)'] * len(pairs))}) GROUP BY spot_id"
+        ") o ON o.spot_id = a.spot_id "
+        "SET a.rating_sum = a.rating_sum - o.rating_sum, a.rating_count = a.rating_count - o.rating_count, "
+        f"{updates};",
+        tuple(value for pair in pairs for value in pair),
+    )
+
+
+def change_rating_query(rating_id: str, new_rating: int) -> tuple:
+    """Apply the old -> new delta of a rating. Must run before the UPDATE of ``ratings``."""
+    updates = ", ".join(
+        f"a.count_{star} = a.count_{star} - (r.rating = {star}) + %s" for star in STARS
+    )
+    return (
+        "UPDATE rating_aggregates a JOIN ratings r ON r.spot_id = a.spot_id "
+        f"SET a.rating_sum = a.rating_sum - r.rating + %s, {updates} "
+        "WHERE r.id = %s;",
+        (new_rating, *[1 if new_rating == star else 0 for star in STARS], rating_id),
+    )
+
+
+def remove_rating_query(rating_id: str) -> tuple:
+    """Uncount a rating. Must run before the DELETE from ``ratings``."""
+    updates = ", ".join(f"a.count_{star} = a.count_{star} - (r.rating = {star})" for star in STARS)
+    return (
+        "UPDATE rating_aggregates a JOIN ratings r ON r.spot_id = a.spot_id "
+        f"SET a.rating_sum = a.rating_sum - r.rating, a.rating_count = a.rating_count - 1, {updates} "
+        "WHERE r.id = %s;",
+        (rating_id,),
+    )
+
+
+def read_aggregate_query(spot_id: str) -> tuple:
+    return (
+        f"SELECT spot_id, rating_sum, rating_count, {_HIST_COLUMNS} FROM rating_aggregates WHERE spot_id = %s;",
+        (spot_id,),
+    )
+
+
+def read_aggregates_query(spot_ids: list) -> tuple:
+    placeholders = ", ".join(["%s"] * len(spot_ids))
+    return (
+        f"SELECT spot_id, rating_sum, rating_count, {_HIST_COLUMNS} FROM rating_aggregates "
+        f"WHERE spot_id IN ({placeholders});",
+        tuple(spot_ids),
+    )
+
+
+def to_aggregation(spot_id: str, row: Optional[dict]) -> RatingAggregation:
+    """Build the API model from an aggregate row; a missing row means no ratings yet."""
+    if not row or not row["rating_count"]:
+        return RatingAggregation(
+            spotId=spot_id,
+            average_rating=0.0,
+            rating_count=0,
+            histogram={str(star): 0 for star in STARS},
+        )
+    count = int(row["rating_count"])
+    return RatingAggregation(
+        spotId=spot_id,
+        average_rating=round(float(row["rating_sum"]) / count, 1),
+        rating_count=count,
+        histogram={str(star): int(row[f"count_{star}"]) for star in STARS},
+    )
+
+
+# -----------------------------------------------------------------------------
+# Rebuild / reconcile
+# -----------------------------------------------------------------------------
+def _computed_select(where: str = "") -> str:
+    hist = ", ".join(f"SUM(rating = {star})" for star in STARS)
+    return (
+        f"SELECT spot_id, SUM(rating), COUNT(*), {hist} FROM ratings {where} GROUP BY spot_id"
+    )
+
+
+def rebuild_queries(spot_id: Optional[str] = None) -> list:
+    """Statements that recompute aggregates from ``ratings`` in one transaction."""
+    if spot_id is None:
+        return [
+            ("DELETE FROM rating_aggregates;", ()),
+            (
+                f"INSERT INTO rating_aggregates (spot_id, rating_sum, rating_count, {_HIST_COLUMNS}) "
+                f"{_computed_select()};",
+                (),
+            ),
+        ]
+    return [
+        ("DELETE FROM rating_aggregates WHERE spot_id = %s;", (spot_id,)),
+        (
+            f"INSERT INTO rating_aggregates (spot_id, rating_sum, rating_count, {_HIST_COLUMNS}) "
+            f"{_computed_select('WHERE spot_id = %s')};",
+            (spot_id,),
+        ),
+    ]
+
+
+def drift_query() -> tuple:
+    """Spots whose stored aggregate doesn't match what ``ratings`` says."""
+    return (
+        "SELECT c.spot_id, c.rating_sum AS expected_sum, c.rating_count AS expected_count, "
+        "a.rating_sum AS stored_sum, a.rating_count AS stored_count "
+        "FROM (SELECT spot_id, SUM(rating) AS rating_sum, COUNT(*) AS rating_count "
+        "FROM ratings GROUP BY spot_id) c "
+        "LEFT JOIN rating_aggregates a ON a.spot_id = c.spot_id "
+        "WHERE a.spot_id IS NULL OR a.rating_sum <> c.rating_sum OR a.rating_count <> c.rating_count "
+        "UNION ALL "
+        "SELECT a.spot_id, 0, 0, a.rating_sum, a.rating_count FROM rating_aggregates a "
+        "WHERE a.rating_count <> 0 AND NOT EXISTS (SELECT 1 FROM ratings r WHERE r.spot_id = a.spot_id);",
+        (),
+    )
+
+
+def main(argv: Optional[list] = None) -> int:
+    from services.database import execute_query
+
+    parser = argparse.ArgumentParser(prog="python -m services.aggregates", description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild = sub.add_parser("rebuild", help="recompute aggregates from the ratings table")
+    rebuild.add_argument("--spot", help="only rebuild this spot")
+    sub.add_parser("check", help="list spots whose aggregate has drifted")
+    args = parser.parse_args(argv)
+
+    execute_query([(CREATE_TABLE_SQL, ())])
+    if args.command == "rebuild":
+        execute_query(rebuild_queries(args.spot))
+        print(f"Rebuilt rating aggregates for {args.spot or 'all spots'}.")
+        return 0
+
+    drifted = execute_query([drift_query()])
+    for row in drifted:
+        print(
+            f"{row['spot_id']}: stored sum={row['stored_sum']} count={row['stored_count']}, "
+            f"expected sum={row['expected_sum']} count={row['expected_count']}"
+        )
+    print(f"{len(drifted)} spot(s) out of sync.")
+    return 1 if drifted else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""Async MySQL access (``DB_MODE=async``).
+
+Same contract as :func:`services.database.execute_query`, but backed by an
+aiomysql pool so a slow query waits on the event loop instead of pinning one
+of Starlette's worker threads. Pool settings reuse the ``DB_POOL_*``
+variables; ``DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW`` is the pool's max size.
+
+aiomysql only recycles connections by time since last use, so here a free
+connection is closed once it has been idle for the shorter of
+``DB_POOL_IDLE_TIMEOUT`` and ``DB_POOL_RECYCLE``; a busy connection is not
+replaced for age. ``DB_POOL_PRE_PING`` pings (and reconnects) each
+connection as it is checked out, like the sync pool. ``DB_POOL_TIMEOUT`` is
+not supported: aiomysql waits for a free connection indefinitely.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from typing import Optional
+
+from services.database import returns_rows
+from utils import metrics, slow_queries
+from utils.config import env_bool, env_float, env_int
+
+_pool = None
+_pool_lock: Optional[asyncio.Lock] = None
+
+
+def _connect_kwargs(host: Optional[str] = None, port: Optional[int] = None) -> dict:
+    from pymysql.constants import CLIENT
+
+    if os.environ.get("ENV") == "local" and host is None:
+        return dict(
+            host="127.0.0.1",
+            user="root",
+            password=os.environ.get("DB_PASSWORD", ""),
+            db=os.environ.get("DB_NAME", "mydb"),
+            port=3306,
+            client_flag=CLIENT.FOUND_ROWS,
+        )
+    return dict(
+        host=host or os.environ["DB_HOST"],
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASSWORD"],
+        db=os.environ["DB_NAME"],
+        port=port or int(os.environ.get("DB_PORT", 3306)),
+        client_flag=CLIENT.FOUND_ROWS,
+    )
+
+
+def _recycle_seconds() -> int:
+    """aiomysql's ``pool_recycle``: idle seconds before a free connection is closed, -1 for never."""
+    limits = [t for t in (env_float("DB_POOL_IDLE_TIMEOUT", 300.0), env_float("DB_POOL_RECYCLE", 1800.0)) if t > 0]
+    return int(min(limits)) if limits else -1
+
+
+async def _checked_out(conn) -> None:
+    """Ping a connection coming out of the pool, reconnecting if the server hung up on it."""
+    import pymysql
+
+    if env_bool("DB_POOL_PRE_PING", True):
+        try:
+            await conn.ping(reconnect=True)
+        except pymysql.err.MySQLError as err:
+            raise Exception(f"DB Error: {err}")
+
+
+async def new_async_pool(host: Optional[str] = None, port: Optional[int] = None):
+    """An aiomysql pool configured from the ``DB_POOL_*`` variables, to the primary or to ``host``."""
+    import aiomysql
+
+    size = env_int("DB_POOL_SIZE", 5)
+    return await aiomysql.create_pool(
+        minsize=size,
+        maxsize=size + env_int("DB_POOL_MAX_OVERFLOW", 10),
+        pool_recycle=_recycle_seconds(),
+        autocommit=False,
+        **_connect_kwargs(host, port),
+    )
+
+
+async def get_async_pool():
+    global _pool, _pool_lock
+    if _pool is not None:
+        return _pool
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await new_async_pool()
+    return _pool
+
+
+async def close_async_pool() -> None:
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        pool.close()
+        await pool.wait_closed()
+
+
+def async_pool_stats() -> Optional[dict]:
+    if _pool is None:
+        return None
+    return {
+        "size": _pool.minsize,
+        "max_overflow": _pool.maxsize - _pool.minsize,
+        "in_use": _pool.size - _pool.freesize,
+        "idle": _pool.freesize,
+    }
+
+
+async def execute_query_async(queries: list, only_one=False, pool=None):
+    import aiomysql
+    import pymysql
+
+    pool = pool if pool is not None else await get_async_pool()
+    result = None
+    started = time.perf_counter()
+    connect = fetch = 0.0
+    rows = 0
+    ok = False
+    try:
+        async with pool.acquire() as conn:
+            await _checked_out(conn)
+            connect = time.perf_counter() - started
+            try:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    for i, (query, params) in enumerate(queries):
+                        statement_started = time.perf_counter()
+                        await cursor.execute(query, params)
+                        if i == len(queries) - 1:
+                            if returns_rows(query):
+                                fetch_started = time.perf_counter()
+                                if only_one:
+                                    result = await cursor.fetchone()
+                                    rows = int(result is not None)
+                                else:
+                                    result = await cursor.fetchall()
+                                    rows = len(result)
+                                fetch = time.perf_counter() - fetch_started
+                            else:
+                                result = cursor.rowcount
+                        if slow_queries.ENABLED:
+                            last = i == len(queries) - 1 and returns_rows(query)
+                            slow_queries.observe(query, params, time.perf_counter() - statement_started, rows if last else cursor.rowcount)
+                await conn.commit()
+                ok = True
+            except pymysql.err.MySQLError as err:
+                await conn.rollback()
+                raise Exception(f"DB Error: {err}")
+            except BaseException:
+                # Not a database error (or a cancellation): the transaction is
+                # still open. If the rollback can't finish, close the connection.
+                try:
+                    await conn.rollback()
+                except BaseException:
+                    conn.close()
+                raise
+    finally:
+        if metrics.ENABLED:
+            metrics.observe_db(connect, time.perf_counter() - started - connect - fetch, fetch, rows, ok)
+
+    return result
+
+
+async def stream_query_async(query: str, params: tuple, chunk_size: int = 1000, pool=None):
+    """Async counterpart of :func:`services.database.stream_query` (server-side cursor)."""
+    import aiomysql
+    import pymysql
+
+    pool = pool if pool is not None else await get_async_pool()
+    conn = await pool.acquire()
+    finished = False
+    try:
+        await _checked_out(conn)
+        cursor = await conn.cursor(aiomysql.SSDictCursor)
+        await cursor.execute(query, params)
+        while True:
+            rows = await cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+        await cursor.close()
+        await conn.rollback()
+        finished = True
+    except pymysql.err.MySQLError as err:
+        raise Exception(f"DB Error: {err}")
+    finally:
+        if not finished:
+            conn.close()
+        pool.release(conn)
@@ -0,0 +1,153 @@
+"""Bulk ingest of ratings and reviews.
+
+Items are validated one by one so a bad item only fails itself, then valid
+items are written in chunks of ``BULK_CHUNK_SIZE``: one transaction per
+chunk with a multi-row INSERT, one aggregate update per spot and one version
+bump per spot. Ratings are upserted on (spot, user) like single ratings, see
+:mod:`services.ratings`. If a chunk's transaction fails (a duplicate id,
+say), its items are retried one at a time so the error lands on the item
+that caused it and the rest still go in. A rating that replaced the user's
+existing one is reported as 200 with that rating's id, and one followed in
+the same chunk by another for the same spot and user as superseded (200)
+with the id of the rating that was written.
+"""
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Iterator, Optional, Sequence
+
+from pydantic import BaseModel, ValidationError
+
+from services import ratings, versions
+from services.database import db_timestamp
+
+RunQuery = Callable[..., Awaitable]
+
+
+def chunked(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def validate_items(raw_items: list, model: type[BaseModel]) -> tuple:
+    """``(valid, failures)``: valid is ``[(index, item)]``, failures are result dicts."""
+    valid, failures = [], []
+    for index, raw in enumerate(raw_items):
+        try:
+            valid.append((index, model.model_validate(raw)))
+        except ValidationError as e:
+            errors = "; ".join(
+                f"{'.'.join(str(p) for p in err['loc']) or 'item'}: {err['msg']}" for err in e.errors()
+            )
+            failures.append({"index": index, "id": None, "status": 422, "error": errors})
+    return valid, failures
+
+
+def _insert_rows_query(table: str, value_column: str, rows: list) -> tuple:
+    return (
+        f"INSERT INTO {table} (id, spot_id, user_id, {value_column}, created_at) VALUES "
+        f"{', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))};",
+        tuple(value for row in rows for value in row),
+    )
+
+
+def rating_queries(items: list) -> list:
+    # Upserts like POST /rating, so re-uploading a user's rating replaces it;
+    # the read-back in the same transaction tells rating_outcomes which.
+    return [*ratings.upsert_queries(items), ratings.read_pairs_query([ratings.spot_user(i) for i in items])]
+
+
+def review_queries(items: list) -> list:
+    rows = [(str(i.id), i.spot_id, i.user_id, i.review, db_timestamp(i.postDate)) for i in items]
+    return [
+        versions.bump_many_query([i.spot_id for i in items], "reviews"),
+        _insert_rows_query("reviews", "review", rows),
+    ]
+
+
+def _failure_status(error: Exception) -> int:
+    message = str(error)
+    return 409 if "Duplicate entry" in message or ratings.ID_TAKEN in message else 500
+
+
+def _created(chunk: Sequence, rows) -> list:
+    return [{"index": index, "id": item.id, "status": 201, "error": None} for index, item in chunk]
+
+
+def rating_outcomes(chunk: Sequence, rows: list) -> list:
+    """Results for a chunk of ratings from the rows :func:`rating_queries` reads back.
+
+    The upsert keeps the id of a rating the user already had, so an item
+    whose id isn't the stored one replaced that rating (200). Of several
+    items for one spot and user only the last is written; the others are
+    superseded (200, with an error saying by which item). Either way the
+    id reported is the stored one.
+    """
+    stored = {(row["spot_id"], row["user_id"]): str(row["id"]) for row in rows or ()}
+    winners = {ratings.spot_user(item): (index, item) for index, item in chunk}
+    results = []
+    for index, item in chunk:
+        winner_index, winner = winners[ratings.spot_user(item)]
+        stored_id = stored.get(ratings.spot_user(item))
+        if stored_id is None:
+            results.append({"index": index, "id": item.id, "status": 500, "error": "Rating missing after the upsert."})
+        elif winner_index != index:
+            results.append({
+                "index": index, "id": stored_id, "status": 200,
+                "error": f"Superseded by item {winner_index} for the same spot and user.",
+            })
+        else:
+            status = 201 if stored_id == str(winner.id) else 200
+            results.append({"index": index, "id": stored_id, "status": status, "error": None})
+    return results
+
+
+async def insert_valid(
+    valid: list,
+    build_queries: Callable[[list], list],
+    run_query: RunQuery,
+    chunk_size: int,
+    outcomes: Optional[Callable[[Sequence, Any], list]] = None,
+) -> list:
+    """Insert already validated ``[(index, item)]`` in chunks; one result dict per item.
+
+    ``outcomes(chunk, rows)`` turns what the last query of a written chunk
+    returned into its results (:func:`rating_outcomes`); by default every
+    item was created with its own id.
+    """
+    outcomes = outcomes or _created
+    results = []
+    for chunk in chunked(valid, chunk_size):
+        items = [item for _, item in chunk]
+        try:
+            rows = await run_query(build_queries(items))
+        except Exception as e:
+            if len(chunk) == 1:
+                index, item = chunk[0]
+                results.append({"index": index, "id": item.id, "status": _failure_status(e), "error": str(e)})
+                continue
+        else:
+            results.extend(outcomes(chunk, rows))
+            continue
+
+        for index, item in chunk:
+            try:
+                rows = await run_query(build_queries([item]))
+            except Exception as e:
+                results.append({"index": index, "id": item.id, "status": _failure_status(e), "error": str(e)})
+            else:
+                results.extend(outcomes([(index, item)], rows))
+    return results
+
+
+async def ingest(
+    raw_items: list,
+    model: type[BaseModel],
+    build_queries: Callable[[list], list],
+    run_query: RunQuery,
+    chunk_size: int,
+    outcomes: Optional[Callable[[Sequence, Any], list]] = None,
+) -> list:
+    """Validate and insert ``raw_items``; returns one result dict per item, in order."""
+    valid, results = validate_items(raw_items, model)
+    results.extend(await insert_valid(valid, build_queries, run_query, chunk_size, outcomes))
+    return sorted(results, key=lambda r: r["index"])
@@ -0,0 +1,395 @@
+"""Read-through cache for review/rating lookups, spot lists and averages.
+
+Two backends share one async interface (:class:`CacheBackend`):
+
+- ``memory``: a bounded LRU with a per-entry TTL, limited by entry count and
+  by an estimate of the bytes held. Each Cloud Run instance has its own.
+- ``redis``: any Redis-protocol server, shared by every instance.
+
+Entries carry tags so a write can drop every cached response that could have
+changed: each entry is tagged with its own key, list responses are also
+tagged with the spot (``reviews:{spotId}``) and with every item they contain
+(``review:{id}``), and a spot's average is tagged ``ratings:{spotId}``.
+
+:meth:`CacheBackend.get_or_load` is single-flight: concurrent misses on one
+key share one load, and with Redis a short lock key keeps other instances
+from recomputing the same entry at the same time.
+
+Settings (read once, when the cache is first used):
+
+- ``CACHE_ENABLED``      turn caching off entirely (default true)
+- ``CACHE_BACKEND``      ``memory`` (default) or ``redis``
+- ``REDIS_URL``          server for the redis backend (default redis://localhost:6379/0)
+- ``CACHE_TTL``          seconds an entry stays valid (default 60)
+- ``CACHE_MAX_ENTRIES``  memory backend: entries kept before evicting (default 10000)
+- ``CACHE_MAX_BYTES``    memory backend: approximate bytes kept (default 64 MiB)
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Iterable, Optional, Union
+
+from services import replicas
+from utils.config import env_bool, env_float, env_int, env_str
+
+CACHE_BACKENDS = ("memory", "redis")
+
+Tags = Union[Iterable[str], Callable[[Any], Iterable[str]]]
+
+
+def estimate_size(value: Any) -> int:
+    """Rough size in bytes of a JSON-like value (dicts, lists, scalars)."""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "size", "tags")
+
+    def __init__(self, value: Any, expires_at: float, size: int, tags: frozenset):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.tags = tags
+
+
+class LRUCache:
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._tags: dict[str, set] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry.value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = (), size: Optional[int] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        entry = _Entry(value, time.monotonic() + (self.ttl if ttl is None else ttl), size, frozenset((key, *tags)))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += size
+            for tag in entry.tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self._invalidations += 1
+
+    def invalidate(self, *tags: str) -> None:
+        """Drop every entry carrying any of ``tags`` (an entry's key is one of its tags)."""
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    self._invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
+
+    def _remove(self, key: str) -> None:
+        # Called with the lock held.
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class CacheBackend:
+    """Async cache interface plus single-flight loading shared by the backends."""
+
+    name = "base"
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._invalidation_seq = 0
+        self._loads = 0
+        self._coalesced = 0
+
+    async def get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()) -> None:
+        raise NotImplementedError
+
+    async def invalidate(self, *tags: str) -> None:
+        self._invalidation_seq += 1
+        await self._invalidate(tags)
+
+    async def _invalidate(self, tags: Iterable[str]) -> None:
+        raise NotImplementedError
+
+    async def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "loads": self._loads, "coalesced": self._coalesced}
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        tags: Tags = (),
+    ) -> Any:
+        """Cached value of ``key``, calling ``loader`` on a miss.
+
+        ``tags`` may be a callable that gets the loaded value, for entries
+        whose tags depend on what was loaded. Exceptions from ``loader`` (a
+        404, say) propagate to every caller waiting on the same key and
+        nothing is cached. A request pinned to the primary after its client's
+        write (see :mod:`services.replicas`) skips the cache and refreshes
+        the entry.
+        """
+        if replicas.pinned():
+            return await self._fill(key, loader, ttl, tags)
+        value = await self.get(key)
+        if value is not None:
+            return value
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._coalesced += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting when the load fails; don't warn about it.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            value = await self._load(key, loader, ttl, tags)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    async def _load(self, key: str, loader, ttl: Optional[float], tags: Tags) -> Any:
+        return await self._fill(key, loader, ttl, tags)
+
+    async def _fill(self, key: str, loader, ttl: Optional[float], tags: Tags) -> Any:
+        seq = self._invalidation_seq
+        self._loads += 1
+        value = await loader()
+        # Invalidation can't account for a replica that hasn't seen a write yet.
+        ttl = replicas.cache_ttl(self.ttl if ttl is None else ttl)
+        # A write landed while we were loading; what we have may be stale.
+        if value is not None and ttl > 0 and seq == self._invalidation_seq:
+            await self.set(key, value, ttl, tags(value) if callable(tags) else tags)
+        return value
+
+
+class MemoryCache(CacheBackend):
+    name = "memory"
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024, ttl: float = 60.0):
+        super().__init__(ttl)
+        self.lru = LRUCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+
+    async def get(self, key: str) -> Any:
+        return self.lru.get(key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()) -> None:
+        self.lru.set(key, value, ttl=ttl, tags=tags)
+
+    async def _invalidate(self, tags: Iterable[str]) -> None:
+        self.lru.invalidate(*tags)
+
+    async def clear(self) -> None:
+        self.lru.clear()
+
+    def stats(self) -> dict:
+        return {**self.lru.stats(), **super().stats()}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Can't cache value of type {type(value).__name__}")
+
+
+class RedisCache(CacheBackend):
+    """Redis-protocol backend. Values are stored as JSON, so datetimes come back as ISO strings.
+
+    A tag is a Redis set of the keys carrying it; invalidating the tag
+    deletes those keys and the set.
+    """
+
+    name = "redis"
+
+    def __init__(self, client, ttl: float = 60.0, prefix: str = "rr:", lock_timeout: float = 5.0, poll_interval: float = 0.05):
+        super().__init__(ttl)
+        self.client = client
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisCache":
+        import redis.asyncio
+
+        return cls(redis.asyncio.from_url(url), **kwargs)
+
+    async def get(self, key: str) -> Any:
+        raw = await self.client.get(self.prefix + key)
+        if raw is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()) -> None:
+        ttl_ms = int((self.ttl if ttl is None else ttl) * 1000)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(self.prefix + key, json.dumps(value, default=_json_default), px=ttl_ms)
+        for tag in {key, *tags}:
+            tag_key = f"{self.prefix}tag:{tag}"
+            pipe.sadd(tag_key, key)
+            # Tag sets live a little longer than the entries they point to.
+            pipe.pexpire(tag_key, ttl_ms * 2)
+        await pipe.execute()
+
+    async def _invalidate(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            tag_key = f"{self.prefix}tag:{tag}"
+            keys = await self.client.smembers(tag_key)
+            names = [self.prefix + (k.decode() if isinstance(k, bytes) else k) for k in keys]
+            await self.client.delete(tag_key, self.prefix + tag, *names)
+            self._invalidations += len(names)
+
+    async def clear(self) -> None:
+        async for name in self.client.scan_iter(match=self.prefix + "*"):
+            await self.client.delete(name)
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "hits": self._hits,
+            "misses": self._misses,
+            "invalidations": self._invalidations,
+        }
+
+    async def _load(self, key: str, loader, ttl: Optional[float], tags: Tags) -> Any:
+        # Only one instance recomputes an expired entry; the rest poll for
+        # its result and fall back to loading themselves if it never shows up.
+        lock_key = f"{self.prefix}lock:{key}"
+        token = uuid.uuid4().hex
+        if await self.client.set(lock_key, token, nx=True, px=int(self.lock_timeout * 1000)):
+            try:
+                return await super()._load(key, loader, ttl, tags)
+            finally:
+                if await self.client.get(lock_key) in (token, token.encode()):
+                    await self.client.delete(lock_key)
+
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            raw = await self.client.get(self.prefix + key)
+            if raw is not None:
+                self._coalesced += 1
+                return json.loads(raw)
+            if not await self.client.exists(lock_key):
+                break
+        return await super()._load(key, loader, ttl, tags)
+
+
+_cache: Optional[CacheBackend] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> CacheBackend:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                enabled = env_bool("CACHE_ENABLED", True)
+                backend = env_str("CACHE_BACKEND", "memory").lower()
+                ttl = env_float("CACHE_TTL", 60.0)
+                if backend not in CACHE_BACKENDS:
+                    raise ValueError(f"CACHE_BACKEND must be one of {CACHE_BACKENDS}, got {backend!r}")
+                if enabled and backend == "redis":
+                    _cache = RedisCache.from_url(env_str("REDIS_URL", "redis://localhost:6379/0"), ttl=ttl)
+                else:
+                    _cache = MemoryCache(
+                        max_entries=env_int("CACHE_MAX_ENTRIES", 10000) if enabled else 0,
+                        max_bytes=env_int("CACHE_MAX_BYTES", 64 * 1024 * 1024),
+                        ttl=ttl,
+                    )
+    return _cache
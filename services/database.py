@@ -0,0 +1,301 @@
+"""MySQL access for the reviews/ratings service.
+
+Connections come from a process-wide :class:`~services.pool.ConnectionPool`
+instead of a fresh ``mysql.connector.connect`` per query. Pool settings are
+read from the environment when the pool is first used:
+
+- ``DB_POOL_SIZE``          connections kept open (default 5)
+- ``DB_POOL_MAX_OVERFLOW``  extra connections allowed under burst (default 10)
+- ``DB_POOL_TIMEOUT``       seconds to wait for a free connection (default 30)
+- ``DB_POOL_IDLE_TIMEOUT``  close connections idle longer than this (default 300)
+- ``DB_POOL_RECYCLE``       close connections older than this (default 1800)
+- ``DB_POOL_PRE_PING``      ping a connection before handing it out (default true)
+
+``DB_REPLICA_HOSTS`` adds read replicas for GET requests; see
+:mod:`services.replicas`.
+
+``DB_MODE`` picks how route handlers reach the database: ``sync`` (default)
+runs :func:`execute_query` on Starlette's threadpool, whose size is set by
+``DB_THREADPOOL_SIZE``; ``async`` uses the aiomysql pool in
+:mod:`services.async_database`; ``sqlite`` runs the same queries against a
+local SQLite database (:mod:`services.sqlite_database`), for development and
+tests without a MySQL server.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterator, Optional
+
+import mysql.connector
+from mysql.connector.constants import ClientFlag
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from services.pool import ConnectionPool
+from utils import metrics, slow_queries
+from utils.config import env_bool, env_float, env_int, env_str
+
+DB_MODES = ("sync", "async", "sqlite")
+
+
+def db_mode() -> str:
+    mode = env_str("DB_MODE", "sync").lower()
+    if mode not in DB_MODES:
+        raise ValueError(f"DB_MODE must be one of {DB_MODES}, got {mode!r}")
+    return mode
+
+
+def db_timestamp(value: Optional[datetime] = None) -> datetime:
+    """``value`` (default: now) as a DATETIME column stores it: naive UTC, whole seconds.
+
+    Handlers that build their response from what they wrote use this so the
+    response matches what a later read returns.
+    """
+    value = value or datetime.now(timezone.utc)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.replace(microsecond=0)
+
+
+def returns_rows(query: str) -> bool:
+    """Whether the result of ``query`` is rows to fetch rather than a rowcount."""
+    return query.lstrip().split(None, 1)[0].upper() in ("SELECT", "EXPLAIN", "SHOW", "DESCRIBE", "ANALYZE")
+
+
+def get_connection(host: Optional[str] = None, port: Optional[int] = None):
+    """A new connection to the primary, or to ``host``/``port`` (a read replica) with the same credentials.
+
+    ``FOUND_ROWS`` makes an UPDATE report the rows it matched, not only the
+    ones it changed, so rewriting a row with its current values isn't
+    mistaken for a missing row.
+    """
+    if os.environ.get("ENV") == "local" and host is None:
+        return mysql.connector.connect(
+            host="127.0.0.1",
+            user="root",
+            password=os.environ.get("DB_PASSWORD", ""),
+            database=os.environ.get("DB_NAME", "mydb"),
+            port=3306,
+            client_flags=[ClientFlag.FOUND_ROWS]
+        )
+    else:
+        return mysql.connector.connect(
+            host=host or os.environ["DB_HOST"],
+            user=os.environ["DB_USER"],
+            password=os.environ["DB_PASSWORD"],
+            database=os.environ["DB_NAME"],
+            port=port or int(os.environ.get("DB_PORT", 3306)),
+            client_flags=[ClientFlag.FOUND_ROWS]
+        )
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def new_pool(connect=get_connection) -> ConnectionPool:
+    """A pool configured from the ``DB_POOL_*`` variables."""
+    return ConnectionPool(
+        connect,
+        size=env_int("DB_POOL_SIZE", 5),
+        max_overflow=env_int("DB_POOL_MAX_OVERFLOW", 10),
+        timeout=env_float("DB_POOL_TIMEOUT", 30.0),
+        idle_timeout=env_float("DB_POOL_IDLE_TIMEOUT", 300.0),
+        recycle=env_float("DB_POOL_RECYCLE", 1800.0),
+        pre_ping=env_bool("DB_POOL_PRE_PING", True),
+    )
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = new_pool()
+    return _pool
+
+
+def set_pool(pool: Optional[ConnectionPool]) -> None:
+    """Replace the process-wide pool (used by tests and on shutdown)."""
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, pool
+    if old is not None and old is not pool:
+        old.dispose()
+
+
+def execute_query(queries: list, only_one=False, pool: Optional[ConnectionPool] = None):
+    pool = pool if pool is not None else get_pool()
+    conn, cursor = None, None
+    result = None
+    broken = False
+    started = time.perf_counter()
+    connect = fetch = 0.0
+    rows = 0
+    ok = False
+    try:
+        conn = pool.acquire()
+        connect = time.perf_counter() - started
+        cursor = conn.cursor(dictionary=True)
+
+        for i, (query, params) in enumerate(queries):
+            statement_started = time.perf_counter()
+            cursor.execute(query, params)
+            if i == len(queries) - 1:
+                if returns_rows(query):
+                    fetch_started = time.perf_counter()
+                    if only_one:
+                        result = cursor.fetchone()
+                        # Drain anything left so the pooled connection
+                        # doesn't go back with an unread result set.
+                        cursor.fetchall()
+                        rows = int(result is not None)
+                    else:
+                        result = cursor.fetchall()
+                        rows = len(result)
+                    fetch = time.perf_counter() - fetch_started
+                else:
+                    result = cursor.rowcount
+            if slow_queries.ENABLED:
+                last = i == len(queries) - 1 and returns_rows(query)
+                slow_queries.observe(query, params, time.perf_counter() - statement_started, rows if last else cursor.rowcount)
+
+        conn.commit()
+        ok = True
+    except mysql.connector.Error as err:
+        if conn:
+            try:
+                conn.rollback()
+            except mysql.connector.Error:
+                broken = True
+        raise Exception(f"DB Error: {err}")
+    except BaseException:
+        # Not a database error, but the transaction is still open; don't pool it that way.
+        if conn:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+        raise
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            pool.release(conn, discard=broken)
+        if metrics.ENABLED:
+            metrics.observe_db(connect, time.perf_counter() - started - connect - fetch, fetch, rows, ok)
+
+    return result
+
+
+async def run_query(queries: list, only_one=False):
+    """Run ``queries`` through whichever data path ``DB_MODE`` selects.
+
+    Reads of a GET request go to a read replica when there are any in
+    rotation (see :mod:`services.replicas`); if the replica fails, the
+    primary answers instead.
+    """
+    mode = db_mode()
+    if mode != "sqlite":
+        from services import replicas
+
+        replica = replicas.for_reads(queries)
+        if replica is not None:
+            try:
+                return await replica.run(mode, queries, only_one)
+            except Exception as e:
+                replicas.get_replicas().failed(replica, e)
+    if mode == "async":
+        from services.async_database import execute_query_async
+
+        return await execute_query_async(queries, only_one=only_one)
+    if mode == "sqlite":
+        from services.sqlite_database import execute_query_sqlite
+
+        return await run_in_threadpool(execute_query_sqlite, queries, only_one)
+    return await run_in_threadpool(execute_query, queries, only_one)
+
+
+STRICT_MODES = ("STRICT_TRANS_TABLES", "STRICT_ALL_TABLES")
+
+
+async def check_sql_mode() -> None:
+    """Refuse to start unless the MySQL session is in strict mode.
+
+    Some upserts rely on a NULL written to a NOT NULL column failing the
+    statement (:func:`services.ratings.upsert_query`,
+    :func:`services.idempotency.claim_query`); without strict mode MySQL
+    stores a zero value with a warning instead.
+    """
+    row = await run_query([("SELECT @@SESSION.sql_mode AS sql_mode;", ())], only_one=True)
+    modes = (row or {}).get("sql_mode") or ""
+    if isinstance(modes, bytes):
+        modes = modes.decode()
+    if not set(modes.upper().split(",")) & set(STRICT_MODES):
+        raise RuntimeError(
+            f"MySQL sql_mode {modes!r} is not strict; add STRICT_TRANS_TABLES to the server's sql_mode"
+        )
+
+
+def stream_query(query: str, params: tuple, chunk_size: int = 1000, pool: Optional[ConnectionPool] = None) -> Iterator[list]:
+    """Yield the rows of ``query`` in chunks from an unbuffered cursor.
+
+    Rows are read off the wire as the caller consumes them, so memory stays
+    at one chunk however big the result is. The pooled connection is held
+    until the generator is exhausted or closed; if it is closed early the
+    connection still has unread rows on it and is discarded, not reused.
+    """
+    pool = pool if pool is not None else get_pool()
+    conn = pool.acquire()
+    cursor = None
+    finished = False
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+        cursor.close()
+        # End the read transaction so the connection doesn't keep an old snapshot.
+        conn.rollback()
+        finished = True
+    except mysql.connector.Error as err:
+        raise Exception(f"DB Error: {err}")
+    finally:
+        pool.release(conn, discard=not finished)
+
+
+async def stream_rows(query: str, params: tuple, chunk_size: int = 1000) -> AsyncIterator[list]:
+    """Async iterator over row chunks of ``query`` for whichever ``DB_MODE`` is active.
+
+    A GET's export streams from a read replica when there is one in rotation.
+    """
+    mode = db_mode()
+    replica = None
+    if mode != "sqlite":
+        from services import replicas
+
+        replica = replicas.for_reads([(query, params)])
+    if mode == "async":
+        from services.async_database import stream_query_async
+
+        pool = await replica.async_pool() if replica else None
+        async for rows in stream_query_async(query, params, chunk_size, pool=pool):
+            yield rows
+        return
+
+    if mode == "sqlite":
+        from services.sqlite_database import stream_query_sqlite
+
+        chunks = stream_query_sqlite(query, params, chunk_size)
+    else:
+        chunks = stream_query(query, params, chunk_size, pool=replica.pool() if replica else None)
+    try:
+        async for rows in iterate_in_threadpool(chunks):
+            yield rows
+    finally:
+        await run_in_threadpool(chunks.close)
@@ -0,0 +1,113 @@
+"""``Idempotency-Key`` support for the POST handlers.
+
+A client that retries a POST (a flaky mobile connection, say) sends the same
+``Idempotency-Key`` header each time. The first request claims the key in
+the same transaction as its write and then stores its response; a retry
+finds the key with one primary-key read and gets the stored response back
+without writing anything.
+
+A key is bound to the request it was first used with (method, path and raw
+body): reusing it for a different request is a client error. Keys are kept
+for ``IDEMPOTENCY_TTL`` seconds (default one day); expired ones are ignored
+and can be purged::
+
+    python -m services.idempotency purge
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import sys
+from typing import Optional
+
+from utils.config import env_int
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    idem_key VARCHAR(255) NOT NULL PRIMARY KEY,
+    fingerprint CHAR(64) NOT NULL,
+    status_code SMALLINT NULL,
+    response MEDIUMTEXT NULL,
+    created_at DATETIME NOT NULL,
+    INDEX idx_idempotency_created (created_at)
+)
+"""
+
+
+def ttl() -> int:
+    return env_int("IDEMPOTENCY_TTL", 86400)
+
+
+def fingerprint(method: str, path: str, body: bytes) -> str:
+    digest = hashlib.sha256(f"{method} {path}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def lookup_query(key: str) -> tuple:
+    return (
+        "SELECT fingerprint, status_code, response FROM idempotency_keys "
+        "WHERE idem_key = %s AND created_at > UTC_TIMESTAMP() - INTERVAL %s SECOND;",
+        (key, ttl()),
+    )
+
+
+def claim_query(key: str, request_fingerprint: str) -> tuple:
+    """Claim ``key``; put it first in the write's transaction so a concurrent retry fails it.
+
+    A live claim makes the statement fail (``fingerprint`` is NOT NULL), which
+    rolls the write back in strict sql_mode (required at startup, see
+    :func:`services.database.check_sql_mode`); an expired one is taken over.
+    """
+    return (
+        "INSERT INTO idempotency_keys (idem_key, fingerprint, status_code, response, created_at) "
+        "VALUES (%s, %s, NULL, NULL, UTC_TIMESTAMP()) "
+        "ON DUPLICATE KEY UPDATE "
+        "fingerprint = IF(created_at > UTC_TIMESTAMP() - INTERVAL %s SECOND, NULL, VALUES(fingerprint)), "
+        "status_code = NULL, response = NULL, created_at = VALUES(created_at);",
+        (key, request_fingerprint, ttl()),
+    )
+
+
+def complete_query(key: str, status_code: int, response: str) -> tuple:
+    return (
+        "UPDATE idempotency_keys SET status_code = %s, response = %s WHERE idem_key = %s;",
+        (status_code, response, key),
+    )
+
+
+def release_query(key: str) -> tuple:
+    """Drop a claim whose response couldn't be stored, so retries aren't told it's still in progress."""
+    return (
+        "DELETE FROM idempotency_keys WHERE idem_key = %s AND status_code IS NULL;",
+        (key,),
+    )
+
+
+def purge_query(older_than: Optional[int] = None) -> tuple:
+    return (
+        "DELETE FROM idempotency_keys WHERE created_at < UTC_TIMESTAMP() - INTERVAL %s SECOND;",
+        (ttl() if older_than is None else older_than,),
+    )
+
+
+def main(argv: Optional[list] = None) -> int:
+    from services.database import execute_query
+
+    parser = argparse.ArgumentParser(prog="python -m services.idempotency", description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    purge = sub.add_parser("purge", help="delete keys older than IDEMPOTENCY_TTL")
+    purge.add_argument("--older-than", type=int, help="seconds; defaults to IDEMPOTENCY_TTL")
+    args = parser.parse_args(argv)
+
+    execute_query([(CREATE_TABLE_SQL, ())])
+    deleted = execute_query([purge_query(args.older_than)])
+    print(f"Purged {deleted} idempotency key(s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
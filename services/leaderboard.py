@@ -0,0 +1,54 @@
+"""Top-rated spots, ranked by a Bayesian average.
+
+A plain average ranks a spot with one 5-star rating above one with three
+hundred 4.8s. The score here is the average after adding ``PRIOR_COUNT``
+imaginary ratings of ``PRIOR_MEAN``::
+
+    score = (rating_sum + PRIOR_COUNT * PRIOR_MEAN) / (rating_count + PRIOR_COUNT)
+
+so a spot needs many ratings before its score approaches its own average
+(one 5-star rating scores 3.18; 300 ratings averaging 4.8 score 4.74).
+
+``bayes_score`` is a stored generated column of ``rating_aggregates``, which
+the rating writes already update in their own transaction, and is indexed,
+so the database keeps the ranking current on every write and GET
+/leaderboard reads the first rows of the index instead of grouping
+``ratings``. The prior is fixed rather than the global mean so a write
+changes one spot's score, not all of them. Changing it means a migration
+that redefines the column.
+"""
+from __future__ import annotations
+
+PRIOR_COUNT = 10
+PRIOR_MEAN = 3.0
+
+SCORE_SQL = f"(rating_sum + {PRIOR_COUNT * PRIOR_MEAN}) / (rating_count + {PRIOR_COUNT})"
+SCORE_INDEX = "idx_aggregates_score"
+
+ADD_SCORE_COLUMN_SQL = (
+    f"ALTER TABLE rating_aggregates ADD COLUMN bayes_score DOUBLE AS ({SCORE_SQL}) STORED NOT NULL"
+)
+ADD_SCORE_INDEX_SQL = (
+    f"ALTER TABLE rating_aggregates ADD INDEX {SCORE_INDEX} (bayes_score, rating_count, spot_id)"
+)
+
+
+def top_query(limit: int, min_count: int = 0) -> tuple:
+    """The ``limit`` best spots with at least ``min_count`` ratings (and at least one)."""
+    return (
+        "SELECT spot_id, rating_sum, rating_count, bayes_score FROM rating_aggregates "
+        "WHERE rating_count >= %s "
+        "ORDER BY bayes_score DESC, rating_count DESC, spot_id DESC LIMIT %s;",
+        (max(min_count, 1), limit),
+    )
+
+
+def to_entry(rank: int, row: dict) -> dict:
+    count = int(row["rating_count"])
+    return {
+        "rank": rank,
+        "spotId": row["spot_id"],
+        "score": round(float(row["bayes_score"]), 3),
+        "average_rating": round(float(row["rating_sum"]) / count, 1),
+        "rating_count": count,
+    }
@@ -0,0 +1,234 @@
+"""Versioned schema migrations.
+
+``MIGRATIONS`` is the whole schema history: each entry is ``(version, name,
+statements)`` and is applied once, in order, with its version recorded in
+``schema_migrations``. Add a new entry to change the schema; never edit one
+that has shipped. Apply them from the deploy step, or at startup with
+``DB_MIGRATE_ON_STARTUP=true``; otherwise the app refuses to start while any
+are pending (:func:`require_current`), since handlers write to tables that
+only the migrations create (``rating_aggregates``, say)::
+
+    python -m services.migrations upgrade
+    python -m services.migrations status
+    python -m services.migrations explain
+
+MySQL commits DDL implicitly, so a migration is not atomic. Each statement
+is written so re-running it is harmless (``IF NOT EXISTS`` tables, and index
+additions whose "already exists" error is ignored). A migration that failed
+halfway can be fixed and re-run, and two instances migrating at the same
+time end up with the same schema.
+
+``explain`` runs EXPLAIN on the queries the API issues most (:func:`hot_queries`)
+and fails if any of them scans a whole table or index instead of seeking
+into one.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import datetime
+from typing import Callable, Optional
+
+from services import aggregates, idempotency, leaderboard, ratings, rollups, search, versions
+from utils import pagination
+
+Execute = Callable[..., object]
+
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT NOT NULL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at DATETIME NOT NULL
+)
+"""
+
+MIGRATIONS = [
+    (1, "create reviews and ratings", [
+        """
+        CREATE TABLE IF NOT EXISTS reviews (
+            id VARCHAR(36) NOT NULL PRIMARY KEY,
+            spot_id VARCHAR(64) NOT NULL,
+            user_id VARCHAR(64) NOT NULL,
+            review TEXT NOT NULL,
+            created_at DATETIME NOT NULL,
+            updated_at DATETIME NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ratings (
+            id VARCHAR(36) NOT NULL PRIMARY KEY,
+            spot_id VARCHAR(64) NOT NULL,
+            user_id VARCHAR(64) NOT NULL,
+            rating TINYINT NOT NULL,
+            created_at DATETIME NOT NULL,
+            updated_at DATETIME NULL
+        )
+        """,
+    ]),
+    # Per-spot lists and exports seek on spot_id and walk (created_at, id)
+    # in either direction; the keyset cursor continues from the same index.
+    (2, "index reviews for per-spot pages", [
+        "ALTER TABLE reviews ADD INDEX idx_reviews_spot_created (spot_id, created_at, id)",
+    ]),
+    (3, "index ratings for per-spot pages and one rating per user", [
+        "ALTER TABLE ratings ADD INDEX idx_ratings_spot_created (spot_id, created_at, id)",
+        "ALTER TABLE ratings ADD INDEX idx_ratings_spot_rating (spot_id, rating, created_at, id)",
+        ratings.DEDUPE_SQL,
+        ratings.ADD_UNIQUE_KEY_SQL,
+    ]),
+    (4, "aggregates, versions and idempotency keys", [
+        aggregates.CREATE_TABLE_SQL,
+        *[sql for sql, _ in aggregates.rebuild_queries()],
+        versions.CREATE_TABLE_SQL,
+        idempotency.CREATE_TABLE_SQL,
+    ]),
+    (5, "bayesian score for the leaderboard", [
+        leaderboard.ADD_SCORE_COLUMN_SQL,
+        leaderboard.ADD_SCORE_INDEX_SQL,
+    ]),
+    (6, "daily and weekly rating rollups", [
+        rollups.CREATE_TABLE_SQL,
+        *[sql for sql, _ in rollups.rebuild_queries()],
+    ]),
+    (7, "full-text index on review text", [
+        search.ADD_FULLTEXT_INDEX_SQL,
+    ]),
+    # A user's history pages, like the per-spot ones, seek on user_id and
+    # walk (created_at, id).
+    (8, "index reviews and ratings for per-user pages", [
+        "ALTER TABLE reviews ADD INDEX idx_reviews_user_created (user_id, created_at, id)",
+        "ALTER TABLE ratings ADD INDEX idx_ratings_user_created (user_id, created_at, id)",
+    ]),
+]
+
+# MySQL errors meaning a statement's effect is already in place.
+_ALREADY_APPLIED = ("Duplicate key name", "Duplicate column name")
+
+
+def applied_versions(execute: Execute) -> set:
+    execute([(CREATE_TABLE_SQL, ())])
+    return {row["version"] for row in execute([("SELECT version FROM schema_migrations;", ())])}
+
+
+def pending(applied: set, target: Optional[int] = None) -> list:
+    return [m for m in MIGRATIONS if m[0] not in applied and (target is None or m[0] <= target)]
+
+
+def _run_statement(execute: Execute, sql: str) -> None:
+    try:
+        execute([(sql, ())])
+    except Exception as e:
+        if not any(marker in str(e) for marker in _ALREADY_APPLIED):
+            raise
+
+
+def upgrade(execute: Execute, target: Optional[int] = None) -> list:
+    """Apply pending migrations up to ``target`` (default: all); returns the versions applied."""
+    done = []
+    for version, name, statements in pending(applied_versions(execute), target):
+        for sql in statements:
+            _run_statement(execute, sql)
+        execute([(
+            "INSERT INTO schema_migrations (version, name, applied_at) VALUES (%s, %s, UTC_TIMESTAMP()) "
+            "ON DUPLICATE KEY UPDATE version = version;",
+            (version, name),
+        )])
+        done.append(version)
+    return done
+
+
+def require_current(execute: Execute) -> None:
+    """Raise if any migration is still pending."""
+    missing = pending(applied_versions(execute))
+    if missing:
+        names = ", ".join(f"{version} ({name})" for version, name, _ in missing)
+        raise RuntimeError(
+            f"schema migrations pending: {names}; run `python -m services.migrations upgrade` "
+            "or set DB_MIGRATE_ON_STARTUP=true"
+        )
+
+
+# -----------------------------------------------------------------------------
+# Index usage of the hot queries
+# -----------------------------------------------------------------------------
+def hot_queries() -> list:
+    """``(label, (sql, params))`` for the queries main.py runs most, with sample parameters."""
+    spot, user, row_id = "spot-1", "user-1", "00000000-0000-4000-8000-000000000001"
+    # The sort orders of main.RATING_ORDERS / REVIEW_ORDERS.
+    newest = (("created_at", True), ("id", True))
+    oldest = (("created_at", False), ("id", False))
+    highest = (("rating", True),) + newest
+    newest_cursor = pagination.encode_cursor("newest", [datetime(2025, 1, 15), row_id])
+    oldest_cursor = pagination.encode_cursor("oldest", [datetime(2025, 1, 15), row_id])
+    highest_cursor = pagination.encode_cursor("highest", [4, datetime(2025, 1, 15), row_id])
+    rating_columns = ["id", "user_id", "rating", "created_at", "updated_at"]
+    review_columns = ["id", "user_id", "review", "created_at", "updated_at"]
+    return [
+        ("rating by id", ("SELECT * FROM ratings WHERE id = %s;", (row_id,))),
+        ("review by id", ("SELECT * FROM reviews WHERE id = %s;", (row_id,))),
+        ("rating by spot and user", ratings.read_query(spot, user)),
+        ("ratings first page", pagination.page_query("ratings", "spot_id", spot, rating_columns, newest, "newest", None, 50)),
+        ("ratings next page", pagination.page_query("ratings", "spot_id", spot, rating_columns, newest, "newest", newest_cursor, 50)),
+        ("ratings oldest next page", pagination.page_query("ratings", "spot_id", spot, rating_columns, oldest, "oldest", oldest_cursor, 50)),
+        ("ratings highest next page", pagination.page_query("ratings", "spot_id", spot, rating_columns, highest, "highest", highest_cursor, 50)),
+        ("reviews first page", pagination.page_query("reviews", "spot_id", spot, review_columns, newest, "newest", None, 50)),
+        ("reviews next page", pagination.page_query("reviews", "spot_id", spot, review_columns, newest, "newest", newest_cursor, 50)),
+        ("user ratings next page", pagination.page_query("ratings", "user_id", user, ["spot_id", *rating_columns], newest, "newest", newest_cursor, 50)),
+        ("user reviews next page", pagination.page_query("reviews", "user_id", user, ["spot_id", *review_columns], newest, "newest", newest_cursor, 50)),
+        ("user ratings for spots", ratings.user_ratings_query(user, [spot, "spot-2"])),
+        ("ratings export", ("SELECT spot_id, id, user_id, rating, created_at, updated_at FROM ratings WHERE spot_id = %s ORDER BY created_at, id;", (spot,))),
+        ("average", aggregates.read_aggregate_query(spot)),
+        ("review search", search.search_query(["quiet", "wifi"], spot, 20)),
+        ("trend", rollups.read_query(spot, "day", datetime(2025, 1, 15).date())),
+        ("spot version", versions.read_query(spot, "ratings")),
+        ("idempotency key", idempotency.lookup_query("key-1")),
+    ]
+
+
+def full_scans(plan: list) -> list:
+    """EXPLAIN rows that read a whole table (``ALL``) or a whole index (``index``)."""
+    return [
+        row for row in plan
+        if row.get("table") and not str(row["table"]).startswith("<") and row.get("type") in ("ALL", "index")
+    ]
+
+
+def explain(execute: Execute) -> dict:
+    """``{label: full_scan_rows}`` for every hot query; empty lists mean index seeks only."""
+    return {
+        label: full_scans(execute([(f"EXPLAIN {sql}", params)]))
+        for label, (sql, params) in hot_queries()
+    }
+
+
+def main(argv: Optional[list] = None) -> int:
+    from services.database import execute_query
+
+    parser = argparse.ArgumentParser(prog="python -m services.migrations", description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    up = sub.add_parser("upgrade", help="apply pending migrations")
+    up.add_argument("--to", type=int, help="stop after this version")
+    sub.add_parser("status", help="list migrations and whether they are applied")
+    sub.add_parser("explain", help="check that the hot queries use indexes")
+    args = parser.parse_args(argv)
+
+    if args.command == "upgrade":
+        done = upgrade(execute_query, args.to)
+        print(f"Applied {len(done)} migration(s){': ' + ', '.join(map(str, done)) if done else ''}.")
+        return 0
+
+    if args.command == "status":
+        applied = applied_versions(execute_query)
+        for version, name, _ in MIGRATIONS:
+            print(f"{version:>4}  {'applied' if version in applied else 'pending'}  {name}")
+        return 0
+
+    scans = explain(execute_query)
+    for label, rows in scans.items():
+        detail = ", ".join(f"{row['table']} ({row['type']})" for row in rows)
+        print(f"{label}: {'FULL SCAN ' + detail if rows else 'ok'}")
+    return 1 if any(scans.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""A small thread-safe connection pool.
+
+mysql-connector ships its own pool, but it has no overflow, no idle/recycle
+handling and no way to see how busy it is, which is what we need to size the
+pool per Cloud Run instance. This pool is driver agnostic: it is given a
+``connect`` callable and (optionally) a ``ping`` callable.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became available within the pool timeout."""
+
+
+class _Entry:
+    __slots__ = ("conn", "created_at", "last_used", "generation")
+
+    def __init__(self, conn: Any, now: float, generation: int = 0):
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+        self.generation = generation
+
+
+def _default_ping(conn: Any) -> bool:
+    return conn.is_connected()
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        size: int = 5,
+        max_overflow: int = 10,
+        timeout: float = 30.0,
+        idle_timeout: float = 300.0,
+        recycle: float = 1800.0,
+        pre_ping: bool = True,
+        ping: Callable[[Any], bool] = _default_ping,
+    ):
+        if size < 1:
+            raise ValueError("pool size must be at least 1")
+        if max_overflow < 0:
+            raise ValueError("max_overflow can't be negative")
+        self._connect = connect
+        self._ping = ping
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+
+        self._lock = threading.Condition()
+        self._idle: deque[_Entry] = deque()
+        self._checked_out: dict[int, _Entry] = {}
+        self._total = 0
+        self._waiting = 0
+        self._created = 0
+        self._recycled = 0
+        self._closed = 0
+        # Bumped by dispose(); connections from an older generation are closed on release.
+        self._generation = 0
+
+    # -------------------------------------------------------------------------
+    # Checkout / checkin
+    # -------------------------------------------------------------------------
+    def acquire(self) -> Any:
+        deadline = time.monotonic() + self.timeout
+        stale: list[_Entry] = []
+        with self._lock:
+            self._waiting += 1
+            try:
+                while True:
+                    entry = self._take_idle(stale)
+                    if entry is not None:
+                        break
+                    if self._total < self.size + self.max_overflow:
+                        self._total += 1
+                        entry = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(
+                            f"No database connection available after {self.timeout}s "
+                            f"(size={self.size}, overflow={self.max_overflow})"
+                        )
+                    self._lock.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+        for old in stale:
+            self._close(old.conn)
+        if entry is None:
+            entry = self._open()
+        elif self.pre_ping and not self._is_alive(entry.conn):
+            self._close(entry.conn)
+            with self._lock:
+                self._recycled += 1
+            entry = self._open()
+
+        with self._lock:
+            self._checked_out[id(entry.conn)] = entry
+        return entry.conn
+
+    def release(self, conn: Any, discard: bool = False) -> None:
+        with self._lock:
+            entry = self._checked_out.pop(id(conn), None)
+            if entry is None:
+                return
+            keep = not discard and entry.generation == self._generation and len(self._idle) < self.size
+            if keep:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+            else:
+                self._total -= 1
+            self._lock.notify()
+        if not keep:
+            self._close(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except BaseException:
+            discard = self.pre_ping and not self._is_alive(conn)
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def dispose(self) -> None:
+        """Close every idle connection; checked-out ones are closed on release."""
+        with self._lock:
+            self._generation += 1
+            idle = list(self._idle)
+            self._idle.clear()
+            self._total -= len(idle)
+            self._lock.notify_all()
+        for entry in idle:
+            self._close(entry.conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "in_use": len(self._checked_out),
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "created": self._created,
+                "recycled": self._recycled,
+                "closed": self._closed,
+            }
+
+    # -------------------------------------------------------------------------
+    # Internals
+    # -------------------------------------------------------------------------
+    def _take_idle(self, stale: list) -> Optional[_Entry]:
+        # Called with the lock held. Stale connections are handed back in
+        # ``stale`` so they get closed outside the lock, and a caller never
+        # gets one that Cloud SQL has already hung up on.
+        now = time.monotonic()
+        while self._idle:
+            entry = self._idle.pop()
+            too_old = self.recycle > 0 and now - entry.created_at > self.recycle
+            too_idle = self.idle_timeout > 0 and now - entry.last_used > self.idle_timeout
+            if too_old or too_idle:
+                self._total -= 1
+                self._recycled += 1
+                stale.append(entry)
+                continue
+            return entry
+        return None
+
+    def _open(self) -> _Entry:
+        try:
+            conn = self._connect()
+        except BaseException:
+            with self._lock:
+                self._total -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self._created += 1
+            generation = self._generation
+        return _Entry(conn, time.monotonic(), generation)
+
+    def _is_alive(self, conn: Any) -> bool:
+        try:
+            return bool(self._ping(conn))
+        except Exception:
+            return False
+
+    def _close(self, conn: Any) -> None:
+        with self._lock:
+            self._closed += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
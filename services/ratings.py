@@ -0,0 +1,98 @@
+"""One rating per (spot, user).
+
+``ratings`` has a unique key on ``(spot_id, user_id)`` and new ratings are
+written with ``INSERT ... ON DUPLICATE KEY UPDATE``: rating the same spot
+again changes the user's existing rating (same id and ``created_at``, new
+``updated_at``) instead of adding a row, so double taps and client retries
+neither skew the average nor grow the table.
+
+Tables created before the key existed may hold duplicates, which would make
+adding it fail; migration 3 in :mod:`services.migrations` deletes all but
+each user's newest rating per spot before adding the key, and migration 4
+rebuilds the aggregates.
+"""
+from __future__ import annotations
+
+from services import aggregates, rollups, versions
+from services.database import db_timestamp
+
+UNIQUE_KEY = "uq_ratings_spot_user"
+
+ADD_UNIQUE_KEY_SQL = f"ALTER TABLE ratings ADD UNIQUE KEY {UNIQUE_KEY} (spot_id, user_id)"
+
+DEDUPE_SQL = (
+    "DELETE r FROM ratings r JOIN ratings newer "
+    "ON newer.spot_id = r.spot_id AND newer.user_id = r.user_id "
+    "AND (newer.created_at > r.created_at OR (newer.created_at = r.created_at AND newer.id > r.id));"
+)
+
+
+# How the database reports an upsert whose id is another rating's (see upsert_query).
+ID_TAKEN = "Column 'id' cannot be null"
+
+
+def spot_user(item) -> tuple:
+    return (item.spot_id, item.user_id)
+
+
+def latest_per_user(items: list) -> list:
+    """Drop all but the last item for each (spot_id, user_id); one upsert can't set a row twice."""
+    return list({spot_user(i): i for i in items}.values())
+
+
+def upsert_query(rows: list) -> tuple:
+    """Multi-row upsert of ``(id, spot_id, user_id, rating, created_at)`` rows."""
+    return (
+        "INSERT INTO ratings (id, spot_id, user_id, rating, created_at) VALUES "
+        f"{', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))} "
+        # ON DUPLICATE KEY UPDATE fires for the primary key too; a client-chosen
+        # id that belongs to another spot/user's rating must not overwrite it,
+        # so that case sets id to NULL and the statement fails (ID_TAKEN) in
+        # strict sql_mode, which services.database.check_sql_mode requires.
+        "ON DUPLICATE KEY UPDATE "
+        "id = IF(spot_id = VALUES(spot_id) AND user_id = VALUES(user_id), id, NULL), "
+        "rating = VALUES(rating), updated_at = VALUES(created_at);",
+        tuple(value for row in rows for value in row),
+    )
+
+
+def upsert_queries(items: list) -> list:
+    """Upsert ``items`` (shaped like ``RatingBulkItem``) keeping aggregates in step.
+
+    Existing ratings of the same users are uncounted before the new values
+    are counted, so the aggregates and rollups move by the difference.
+    """
+    items = latest_per_user(items)
+    rows = [(str(i.id), i.spot_id, i.user_id, i.rating, db_timestamp(i.postDate)) for i in items]
+    pairs = [(i.spot_id, i.user_id) for i in items]
+    return [
+        versions.bump_many_query([i.spot_id for i in items], "ratings"),
+        aggregates.uncount_existing_query(pairs),
+        aggregates.add_ratings_query([(i.spot_id, i.rating) for i in items]),
+        rollups.uncount_pairs_query(pairs),
+        upsert_query(rows),
+        # After the upsert: a rating that already existed keeps its created_at, so its bucket.
+        rollups.count_pairs_query(pairs),
+    ]
+
+
+def read_query(spot_id: str, user_id: str) -> tuple:
+    return ("SELECT * FROM ratings WHERE spot_id = %s AND user_id = %s;", (spot_id, user_id))
+
+
+def read_pairs_query(pairs: list) -> tuple:
+    """Stored ids of the ratings for ``[(spot_id, user_id)]``, a seek per pair on the unique key."""
+    return (
+        "SELECT id, spot_id, user_id FROM ratings WHERE "
+        f"{' OR '.join(['(spot_id = %s AND user_id = %s)'] * len(pairs))};",
+        tuple(value for pair in pairs for value in pair),
+    )
+
+
+def user_ratings_query(user_id: str, spot_ids: list) -> tuple:
+    """The user's ratings of ``spot_ids``, a seek per spot on the unique key."""
+    return (
+        "SELECT id, spot_id, rating, created_at, updated_at FROM ratings "
+        f"WHERE user_id = %s AND spot_id IN ({', '.join(['%s'] * len(spot_ids))});",
+        (user_id, *spot_ids),
+    )
@@ -0,0 +1,304 @@
+"""Read replicas for GET requests, taken out of rotation when they lag.
+
+``DB_REPLICA_HOSTS`` lists the replicas as ``host[:port]``, comma separated
+(port defaults to ``DB_PORT``). They are reached with the primary's user,
+password and database name, and each gets its own connection pool sized by
+the ``DB_POOL_*`` variables. With none listed (the default) every query goes
+to the primary.
+
+Routing: :class:`middleware.read_routing.ReadRoutingMiddleware` marks GET
+and HEAD requests as replica reads, and :func:`services.database.run_query`
+sends their queries to the replica in rotation with the fewest connections
+in use (round-robin among equals) when every statement is a SELECT. The
+primary gets everything else: writes and background work (the write-behind
+flush, migrations). A replica whose query fails leaves rotation and the
+primary answers instead.
+
+The response cache is only invalidated by writes, so an entry filled from a
+replica that hadn't seen the latest write would stay stale until it expired;
+:func:`cache_ttl` keeps such entries for at most ``DB_REPLICA_MAX_LAG``
+seconds.
+
+Read-your-writes: a replica may not have a client's write yet. Write
+responses carry ``X-Read-Primary-Until`` (a Unix time) and a cookie of the
+same value, and a GET that sends either one back before that time is
+"pinned": it reads from the primary and loads fresh instead of reading the
+response cache. The window is ``DB_REPLICA_MAX_LAG + DB_REPLICA_CHECK_INTERVAL``
+seconds, the most a replica in rotation can be behind.
+
+Lag: a task started by the app lifespan reads ``SHOW REPLICA STATUS``
+(``SHOW SLAVE STATUS`` before MySQL 8.0.22) on every replica each
+``DB_REPLICA_CHECK_INTERVAL`` seconds (default 5). A replica is in rotation
+while it is at most ``DB_REPLICA_MAX_LAG`` seconds behind (default 5), and
+out while it is further behind, when replication is stopped (no lag
+reported), or when the check fails. Replicas start out of rotation until
+their first check. GET /health/db/replicas shows each one's state.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from services.database import execute_query, get_connection, new_pool, returns_rows
+from utils.config import env_float, env_int, env_str
+
+logger = logging.getLogger(__name__)
+
+# (statement, lag column), newest spelling first.
+LAG_QUERIES = (
+    ("SHOW REPLICA STATUS", "Seconds_Behind_Source"),
+    ("SHOW SLAVE STATUS", "Seconds_Behind_Master"),
+)
+
+# Where the current request's reads may go: "primary", "replica", or
+# "pinned" (the primary, bypassing the response cache, for a client that
+# has just written).
+_route: contextvars.ContextVar[str] = contextvars.ContextVar("db_route", default="primary")
+
+
+def parse_hosts(value: str, default_port: int = 3306) -> list:
+    """``[(host, port)]`` from ``"host[:port], ..."``."""
+    hosts = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.partition(":")
+        hosts.append((host, int(port) if port else default_port))
+    return hosts
+
+
+HOSTS = parse_hosts(env_str("DB_REPLICA_HOSTS", ""), env_int("DB_PORT", 3306))
+ENABLED = bool(HOSTS)
+
+
+def set_route(route: str) -> contextvars.Token:
+    return _route.set(route)
+
+
+def reset_route(token: contextvars.Token) -> None:
+    _route.reset(token)
+
+
+def pinned() -> bool:
+    """Whether the current request must see its client's latest writes."""
+    return _route.get() == "pinned"
+
+
+@contextmanager
+def primary():
+    """Read from the primary inside the block, whatever the request is."""
+    token = _route.set("primary")
+    try:
+        yield
+    finally:
+        _route.reset(token)
+
+
+class Replica:
+    def __init__(self, host: str, port: int = 3306):
+        self.host = host
+        self.port = port
+        self.in_rotation = False
+        self.lag: Optional[float] = None
+        self.error: Optional[str] = None
+        self.reads = 0
+        self.failures = 0
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._async_pool = None
+        self._async_pool_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    def pool(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = new_pool(lambda: get_connection(self.host, self.port))
+        return self._pool
+
+    async def async_pool(self):
+        if self._async_pool is not None:
+            return self._async_pool
+        if self._async_pool_lock is None:
+            self._async_pool_lock = asyncio.Lock()
+        async with self._async_pool_lock:
+            if self._async_pool is None:
+                from services.async_database import new_async_pool
+
+                self._async_pool = await new_async_pool(self.host, self.port)
+        return self._async_pool
+
+    def in_use(self) -> int:
+        if self._async_pool is not None:
+            return self._async_pool.size - self._async_pool.freesize
+        return self._pool.stats()["in_use"] if self._pool is not None else 0
+
+    async def execute(self, mode: str, queries: list, only_one=False):
+        if mode == "async":
+            from services.async_database import execute_query_async
+
+            return await execute_query_async(queries, only_one, pool=await self.async_pool())
+        return await run_in_threadpool(execute_query, queries, only_one, self.pool())
+
+    async def run(self, mode: str, queries: list, only_one=False):
+        """Run a request's reads here (same contract as :func:`services.database.run_query`)."""
+        self.reads += 1
+        return await self.execute(mode, queries, only_one)
+
+    async def read_lag(self, mode: str) -> Optional[float]:
+        """Seconds behind the primary; None when replication isn't running."""
+        error = None
+        for sql, column in LAG_QUERIES:
+            try:
+                status = await self.execute(mode, [(sql, ())], only_one=True)
+            except Exception as e:
+                error = e
+                continue
+            if status is None or status.get(column) is None:
+                return None
+            return float(status[column])
+        raise error
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.dispose()
+        if self._async_pool is not None:
+            pool, self._async_pool = self._async_pool, None
+            pool.close()
+            await pool.wait_closed()
+
+    def stats(self) -> dict:
+        return {
+            "host": self.name,
+            "in_rotation": self.in_rotation,
+            "lag": self.lag,
+            "error": self.error,
+            "in_use": self.in_use(),
+            "reads": self.reads,
+            "failures": self.failures,
+        }
+
+
+class ReplicaSet:
+    def __init__(self, replicas: list, max_lag: float = 5.0, check_interval: float = 5.0):
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._turn = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def read_your_writes_window(self) -> float:
+        return self.max_lag + self.check_interval
+
+    def pick(self) -> Optional[Replica]:
+        """The replica in rotation with the fewest connections in use; None if there is none."""
+        candidates = [replica for replica in self.replicas if replica.in_rotation]
+        if not candidates:
+            return None
+        self._turn = (self._turn + 1) % len(candidates)
+        # min() keeps the first of equals, so rotating the list round-robins the ties.
+        return min(candidates[self._turn:] + candidates[:self._turn], key=lambda replica: replica.in_use())
+
+    def update(self, replica: Replica, lag: Optional[float], error: Optional[str] = None) -> None:
+        replica.lag = lag
+        replica.error = error
+        healthy = error is None and lag is not None and lag <= self.max_lag
+        if healthy and not replica.in_rotation:
+            logger.info("replica %s in rotation (%.0fs behind)", replica.name, lag)
+        elif not healthy and replica.in_rotation:
+            reason = error or ("replication stopped" if lag is None else f"{lag:.0f}s behind")
+            logger.warning("replica %s out of rotation: %s", replica.name, reason)
+        replica.in_rotation = healthy
+
+    def failed(self, replica: Replica, error: Exception) -> None:
+        """A read on ``replica`` failed; keep it out until a lag check passes again."""
+        replica.failures += 1
+        self.update(replica, replica.lag, str(error))
+
+    async def check(self, mode: str) -> None:
+        async def check_one(replica: Replica) -> None:
+            try:
+                self.update(replica, await replica.read_lag(mode))
+            except Exception as e:
+                self.update(replica, None, str(e))
+
+        await asyncio.gather(*(check_one(replica) for replica in self.replicas))
+
+    def start(self, mode: str) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(mode))
+
+    async def _run(self, mode: str) -> None:
+        while True:
+            await self.check(mode)
+            await asyncio.sleep(self.check_interval)
+
+    async def stop(self) -> None:
+        """Stop the lag checks and close the replicas' pools."""
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        for replica in self.replicas:
+            await replica.close()
+
+    def stats(self) -> list:
+        return [replica.stats() for replica in self.replicas]
+
+
+_replicas: Optional[ReplicaSet] = None
+_replicas_lock = threading.Lock()
+
+
+def get_replicas() -> Optional[ReplicaSet]:
+    """The process-wide replica set; None when ``DB_REPLICA_HOSTS`` is empty."""
+    global _replicas
+    if _replicas is None and ENABLED:
+        with _replicas_lock:
+            if _replicas is None:
+                _replicas = ReplicaSet(
+                    [Replica(host, port) for host, port in HOSTS],
+                    max_lag=env_float("DB_REPLICA_MAX_LAG", 5.0),
+                    check_interval=env_float("DB_REPLICA_CHECK_INTERVAL", 5.0),
+                )
+    return _replicas
+
+
+def set_replicas(replica_set: Optional[ReplicaSet]) -> None:
+    """Replace the process-wide replica set (used by tests)."""
+    global _replicas
+    with _replicas_lock:
+        _replicas = replica_set
+
+
+def cache_ttl(ttl: float) -> float:
+    """TTL for a cache entry the current request loads: at most ``DB_REPLICA_MAX_LAG`` if it may come from a replica."""
+    replica_set = get_replicas()
+    if _route.get() != "replica" or replica_set is None:
+        return ttl
+    return min(ttl, replica_set.max_lag)
+
+
+def for_reads(queries: list) -> Optional[Replica]:
+    """The replica to run ``queries`` on, or None for the primary."""
+    if _route.get() != "replica":
+        return None
+    replica_set = get_replicas()
+    if replica_set is None or not all(returns_rows(sql) for sql, _ in queries):
+        return None
+    return replica_set.pick()
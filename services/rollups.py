@@ -0,0 +1,238 @@
+"""Per-spot rating rollups by day and by week, for windowed averages and trends.
+
+``rating_rollups`` has one row per spot, period (``day`` or ``week``, weeks
+starting on Monday) and bucket, with the same sum, count and star histogram
+as ``rating_aggregates``. A rating counts in the buckets of its
+``created_at`` with its current value. The rating writes add the statements
+built here to their transaction the same way they do for the aggregates,
+so GET /ratings/{spotId}/trend reads one row per bucket however many
+ratings the spot has.
+
+Day buckets are only needed for recent windows. ``compact`` deletes the
+ones older than ``ROLLUP_DAY_RETENTION`` days (default 400); week buckets
+are kept. ``rebuild`` recomputes everything from ``ratings``::
+
+    python -m services.rollups compact [--keep-days N]
+    python -m services.rollups rebuild [--spot SPOT_ID]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from services.aggregates import STARS
+from utils.config import env_int
+
+PERIODS = ("day", "week")
+_HIST_COLUMNS = ", ".join(f"count_{star}" for star in STARS)
+_COLUMNS = f"spot_id, period, bucket, rating_sum, rating_count, {_HIST_COLUMNS}"
+
+CREATE_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS rating_rollups (
+    spot_id VARCHAR(64) NOT NULL,
+    period VARCHAR(4) NOT NULL,
+    bucket DATE NOT NULL,
+    rating_sum BIGINT NOT NULL DEFAULT 0,
+    rating_count BIGINT NOT NULL DEFAULT 0,
+    {", ".join(f"count_{star} BIGINT NOT NULL DEFAULT 0" for star in STARS)},
+    PRIMARY KEY (spot_id, period, bucket),
+    INDEX idx_rollups_period_bucket (period, bucket)
+)
+"""
+
+# Bucket of a ratings row (alias r) for each period. SUBDATE and WEEKDAY
+# are MySQL functions; the SQLite path registers equivalents.
+BUCKET_SQL = {
+    "day": "DATE(r.created_at)",
+    "week": "SUBDATE(DATE(r.created_at), WEEKDAY(r.created_at))",
+}
+
+
+def day_retention() -> int:
+    return env_int("ROLLUP_DAY_RETENTION", 400)
+
+
+def bucket_start(period: str, day: date) -> date:
+    return day if period == "day" else day - timedelta(days=day.weekday())
+
+
+def _bucketed(where: str) -> str:
+    """Every ratings row matching ``where`` once per period, as (spot_id, period, bucket, rating)."""
+    return " UNION ALL ".join(
+        f"SELECT r.spot_id, '{period}' AS period, {BUCKET_SQL[period]} AS bucket, r.rating FROM ratings r WHERE {where}"
+        for period in PERIODS
+    )
+
+
+def _grouped(where: str) -> str:
+    hist = ", ".join(f"SUM(rating = {star}) AS count_{star}" for star in STARS)
+    return (
+        f"SELECT spot_id, period, bucket, SUM(rating) AS rating_sum, COUNT(*) AS rating_count, {hist} "
+        f"FROM ({_bucketed(where)}) b GROUP BY spot_id, period, bucket"
+    )
+
+
+def _pairs_where(pairs: list) -> str:
+    return f"(r.spot_id, r.user_id) IN ({', '.join(['(%s, %s)'] * len(pairs))})"
+
+
+def count_pairs_query(pairs: list) -> tuple:
+    """Count the current ratings of ``(spot_id, user_id)`` pairs. Runs after they are written."""
+    pairs = list(dict.fromkeys(pairs))
+    # Qualified, so they can't be read as the SELECT's columns of the same name.
+    updates = ", ".join(
+        f"{column} = rating_rollups.{column} + VALUES({column})"
+        for column in ("rating_sum", "rating_count", *(f"count_{star}" for star in STARS))
+    )
+    params = tuple(value for pair in pairs for value in pair)
+    return (
+        f"INSERT INTO rating_rollups ({_COLUMNS}) {_grouped(_pairs_where(pairs))} "
+        f"ON DUPLICATE KEY UPDATE {updates};",
+        params * len(PERIODS),
+    )
+
+
+def uncount_pairs_query(pairs: list) -> tuple:
+    """Uncount the ratings of ``(spot_id, user_id)`` pairs an upsert is about to overwrite."""
+    pairs = list(dict.fromkeys(pairs))
+    updates = ", ".join(f"o.count_{star} = o.count_{star} - g.count_{star}" for star in STARS)
+    params = tuple(value for pair in pairs for value in pair)
+    return (
+        f"UPDATE rating_rollups o JOIN ({_grouped(_pairs_where(pairs))}) g "
+        "ON g.spot_id = o.spot_id AND g.period = o.period AND g.bucket = o.bucket "
+        "SET o.rating_sum = o.rating_sum - g.rating_sum, o.rating_count = o.rating_count - g.rating_count, "
+        f"{updates};",
+        params * len(PERIODS),
+    )
+
+
+def _row_buckets() -> str:
+    return " OR ".join(f"(o.period = '{period}' AND o.bucket = {BUCKET_SQL[period]})" for period in PERIODS)
+
+
+def change_rating_query(rating_id: str, new_rating: int) -> tuple:
+    """Apply the old -> new delta of a rating. Must run before the UPDATE of ``ratings``."""
+    updates = ", ".join(f"o.count_{star} = o.count_{star} - (r.rating = {star}) + %s" for star in STARS)
+    return (
+        f"UPDATE rating_rollups o JOIN ratings r ON r.spot_id = o.spot_id AND ({_row_buckets()}) "
+        f"SET o.rating_sum = o.rating_sum - r.rating + %s, {updates} "
+        "WHERE r.id = %s;",
+        (new_rating, *[1 if new_rating == star else 0 for star in STARS], rating_id),
+    )
+
+
+def remove_rating_query(rating_id: str) -> tuple:
+    """Uncount a rating. Must run before the DELETE from ``ratings``."""
+    updates = ", ".join(f"o.count_{star} = o.count_{star} - (r.rating = {star})" for star in STARS)
+    return (
+        f"UPDATE rating_rollups o JOIN ratings r ON r.spot_id = o.spot_id AND ({_row_buckets()}) "
+        f"SET o.rating_sum = o.rating_sum - r.rating, o.rating_count = o.rating_count - 1, {updates} "
+        "WHERE r.id = %s;",
+        (rating_id,),
+    )
+
+
+def read_query(spot_id: str, period: str, since: date) -> tuple:
+    return (
+        f"SELECT bucket, rating_sum, rating_count, {_HIST_COLUMNS} FROM rating_rollups "
+        "WHERE spot_id = %s AND period = %s AND bucket >= %s ORDER BY bucket;",
+        (spot_id, period, since),
+    )
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _summary(rating_sum: int, count: int, histogram: dict) -> dict:
+    return {
+        "average_rating": round(rating_sum / count, 1) if count else 0.0,
+        "rating_count": count,
+        "histogram": {str(star): histogram[star] for star in STARS},
+    }
+
+
+def to_trend(spot_id: str, period: str, last: int, today: date, rows: list) -> dict:
+    """The window's totals and one entry per bucket (empty ones included), oldest first."""
+    current = bucket_start(period, today)
+    step = timedelta(days=1 if period == "day" else 7)
+    starts = [current - step * n for n in range(last - 1, -1, -1)]
+    by_bucket = {_as_date(row["bucket"]): row for row in rows}
+    total_sum, total_count, total_hist = 0, 0, {star: 0 for star in STARS}
+    buckets = []
+    for start in starts:
+        row = by_bucket.get(start)
+        rating_sum = int(row["rating_sum"]) if row else 0
+        count = int(row["rating_count"]) if row else 0
+        histogram = {star: int(row[f"count_{star}"]) if row else 0 for star in STARS}
+        total_sum += rating_sum
+        total_count += count
+        for star in STARS:
+            total_hist[star] += histogram[star]
+        buckets.append({"start": start, **_summary(rating_sum, count, histogram)})
+    return {
+        "spotId": spot_id,
+        "period": period,
+        "start": starts[0],
+        "end": current + step - timedelta(days=1),
+        **_summary(total_sum, total_count, total_hist),
+        "buckets": buckets,
+    }
+
+
+# -----------------------------------------------------------------------------
+# Compaction / rebuild
+# -----------------------------------------------------------------------------
+def compact_query(keep_days: Optional[int] = None, today: Optional[date] = None) -> tuple:
+    """Delete day buckets older than the retention; week buckets keep the history."""
+    today = today or datetime.utcnow().date()
+    keep_days = day_retention() if keep_days is None else keep_days
+    return (
+        "DELETE FROM rating_rollups WHERE period = 'day' AND bucket < %s;",
+        (today - timedelta(days=keep_days),),
+    )
+
+
+def rebuild_queries(spot_id: Optional[str] = None) -> list:
+    """Statements that recompute rollups from ``ratings`` in one transaction."""
+    if spot_id is None:
+        return [
+            ("DELETE FROM rating_rollups;", ()),
+            (f"INSERT INTO rating_rollups ({_COLUMNS}) {_grouped('1 = 1')};", ()),
+        ]
+    return [
+        ("DELETE FROM rating_rollups WHERE spot_id = %s;", (spot_id,)),
+        (f"INSERT INTO rating_rollups ({_COLUMNS}) {_grouped('r.spot_id = %s')};", (spot_id,) * len(PERIODS)),
+    ]
+
+
+def main(argv: Optional[list] = None) -> int:
+    from services.database import execute_query
+
+    parser = argparse.ArgumentParser(prog="python -m services.rollups", description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    compact = sub.add_parser("compact", help="delete day buckets older than ROLLUP_DAY_RETENTION days")
+    compact.add_argument("--keep-days", type=int, help="defaults to ROLLUP_DAY_RETENTION")
+    rebuild = sub.add_parser("rebuild", help="recompute rollups from the ratings table")
+    rebuild.add_argument("--spot", help="only rebuild this spot")
+    args = parser.parse_args(argv)
+
+    execute_query([(CREATE_TABLE_SQL, ())])
+    if args.command == "rebuild":
+        execute_query(rebuild_queries(args.spot))
+        print(f"Rebuilt rating rollups for {args.spot or 'all spots'}.")
+        return 0
+
+    deleted = execute_query([compact_query(args.keep_days)])
+    print(f"Deleted {deleted} day bucket(s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""Ranked full-text search over review text.
+
+Both backends search an inverted index maintained by the database in the
+same transaction as the review write, so POST, PATCH and DELETE /review
+(and the bulk upload) keep it current without extra statements:
+
+- MySQL: a ``FULLTEXT`` index on ``reviews.review`` (migration 7), queried
+  with ``MATCH ... AGAINST`` in natural language mode and ranked by its
+  relevance. InnoDB skips words shorter than ``innodb_ft_min_token_size``
+  (3) and its stopwords.
+- SQLite: an FTS5 table, ``reviews_fts``, with the porter tokenizer
+  ("outlets" finds "outlet"), filled by triggers on ``reviews`` and ranked
+  by bm25.
+
+The text is split into words here for both, so punctuation in a query can't
+be read as search syntax. Results are ordered by relevance, then id; pages
+continue by offset because relevance is computed per query, not stored.
+"""
+from __future__ import annotations
+
+import re
+
+from utils import pagination
+from utils.config import env_int
+
+FULLTEXT_INDEX = "ft_reviews_review"
+ADD_FULLTEXT_INDEX_SQL = f"ALTER TABLE reviews ADD FULLTEXT INDEX {FULLTEXT_INDEX} (review)"
+
+ORDER = "relevance"
+MAX_TERMS = 20
+_WORD = re.compile(r"\w+")
+
+
+def max_results() -> int:
+    """Deepest result reachable by paging; later pages would re-rank every match for little use."""
+    return env_int("SEARCH_MAX_RESULTS", 1000)
+
+
+def terms(text: str) -> list:
+    """Distinct lowercase words of a query, at most ``MAX_TERMS``."""
+    return list(dict.fromkeys(word.lower() for word in _WORD.findall(text)))[:MAX_TERMS]
+
+
+def decode_offset(cursor: str) -> int:
+    """The offset in a cursor from :func:`split_page`; never at or past :func:`max_results`."""
+    (offset,) = pagination.decode_cursor(cursor, ORDER, ["offset"])
+    if not isinstance(offset, int) or not 0 <= offset < max_results():
+        raise pagination.PaginationError("Invalid cursor.")
+    return offset
+
+
+def search_query(words: list, spot_id, limit: int, offset: int = 0, sqlite: bool = False) -> tuple:
+    """SELECT for one page of matches, ``limit + 1`` rows to know if there is a next page."""
+    columns = "r.id, r.spot_id, r.user_id, r.review, r.created_at, r.updated_at"
+    if sqlite:
+        match = " OR ".join(f'"{word}"' for word in words)
+        sql = (
+            f"SELECT {columns}, -bm25(reviews_fts) AS score "
+            "FROM reviews_fts JOIN reviews r ON r.id = reviews_fts.id WHERE reviews_fts MATCH %s"
+        )
+        params: tuple = (match,)
+    else:
+        match = " ".join(words)
+        sql = (
+            f"SELECT {columns}, MATCH(r.review) AGAINST (%s IN NATURAL LANGUAGE MODE) AS score "
+            "FROM reviews r WHERE MATCH(r.review) AGAINST (%s IN NATURAL LANGUAGE MODE)"
+        )
+        params = (match, match)
+    if spot_id is not None:
+        sql += " AND r.spot_id = %s"
+        params += (spot_id,)
+    return f"{sql} ORDER BY score DESC, r.id LIMIT %s OFFSET %s;", params + (limit + 1, offset)
+
+
+def split_page(rows: list, limit: int, offset: int) -> tuple:
+    """``(rows, next_cursor)`` with scores rounded; ``next_cursor`` is None on the last page."""
+    rows = [{**row, "score": round(float(row["score"]), 4)} for row in rows]
+    if len(rows) <= limit or offset + limit >= max_results():
+        return rows[:limit], None
+    return rows[:limit], pagination.encode_cursor(ORDER, [offset + limit])
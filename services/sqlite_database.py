@@ -0,0 +1,256 @@
+"""SQLite data path (``DB_MODE=sqlite``) for running the API without MySQL.
+
+Meant for laptops, tests and load tests: ``SQLITE_PATH`` is a database file,
+or ``:memory:`` (the default) for a throwaway database that lives as long as
+the process. The schema below is created on first use.
+
+Handlers keep building MySQL statements; :func:`translate` rewrites the few
+MySQL-only constructs they use into SQLite (``ON DUPLICATE KEY UPDATE``,
+``UPDATE ... JOIN``, ``UTC_TIMESTAMP()``, ``INTERVAL``, row-value ``IN``
+lists and ``%s`` placeholders), and the MySQL functions they call (``IF``,
+``SUBDATE``, ``WEEKDAY``) are registered on the connection, so both paths
+run the same queries. Review search is the exception: it reads the FTS5
+table ``reviews_fts``, which triggers keep in step with ``reviews`` (see
+:mod:`services.search`). Errors
+are reported the way MySQL words them where callers look at the message
+(``Duplicate entry``, ``Column '...' cannot be null``).
+
+There is one connection, used by one thread at a time. That is plenty for
+development and keeps ``:memory:`` databases shared, but it is not a
+production configuration.
+"""
+from __future__ import annotations
+
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from services import leaderboard
+from services.aggregates import STARS
+from services.database import returns_rows
+from utils import metrics, slow_queries
+from utils.config import env_str
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS reviews (
+    id TEXT NOT NULL PRIMARY KEY,
+    spot_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    review TEXT NOT NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reviews_spot_created ON reviews (spot_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_reviews_user_created ON reviews (user_id, created_at, id);
+CREATE TABLE IF NOT EXISTS ratings (
+    id TEXT NOT NULL PRIMARY KEY,
+    spot_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    rating INTEGER NOT NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ratings_spot_created ON ratings (spot_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_ratings_spot_rating ON ratings (spot_id, rating, created_at, id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_ratings_spot_user ON ratings (spot_id, user_id);
+CREATE INDEX IF NOT EXISTS idx_ratings_user_created ON ratings (user_id, created_at, id);
+CREATE TABLE IF NOT EXISTS rating_aggregates (
+    spot_id TEXT NOT NULL PRIMARY KEY,
+    rating_sum INTEGER NOT NULL DEFAULT 0,
+    rating_count INTEGER NOT NULL DEFAULT 0,
+    {", ".join(f"count_{star} INTEGER NOT NULL DEFAULT 0" for star in STARS)},
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    bayes_score REAL GENERATED ALWAYS AS ({leaderboard.SCORE_SQL}) STORED
+);
+CREATE INDEX IF NOT EXISTS {leaderboard.SCORE_INDEX} ON rating_aggregates (bayes_score, rating_count, spot_id);
+CREATE TABLE IF NOT EXISTS rating_rollups (
+    spot_id TEXT NOT NULL,
+    period TEXT NOT NULL,
+    bucket DATE NOT NULL,
+    rating_sum INTEGER NOT NULL DEFAULT 0,
+    rating_count INTEGER NOT NULL DEFAULT 0,
+    {", ".join(f"count_{star} INTEGER NOT NULL DEFAULT 0" for star in STARS)},
+    PRIMARY KEY (spot_id, period, bucket)
+);
+CREATE INDEX IF NOT EXISTS idx_rollups_period_bucket ON rating_rollups (period, bucket);
+CREATE TABLE IF NOT EXISTS spot_versions (
+    spot_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL,
+    PRIMARY KEY (spot_id, kind)
+);
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    idem_key TEXT NOT NULL PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    status_code INTEGER NULL,
+    response TEXT NULL,
+    created_at DATETIME NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_created ON idempotency_keys (created_at);
+-- Keyed by the reviews rowid so the triggers seek instead of scanning; VACUUM
+-- can renumber rowids, so rebuild reviews_fts after one.
+CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5(review, id UNINDEXED, tokenize = 'porter unicode61');
+CREATE TRIGGER IF NOT EXISTS reviews_fts_insert AFTER INSERT ON reviews BEGIN
+    INSERT INTO reviews_fts (rowid, review, id) VALUES (new.rowid, new.review, new.id);
+END;
+CREATE TRIGGER IF NOT EXISTS reviews_fts_update AFTER UPDATE OF review ON reviews BEGIN
+    UPDATE reviews_fts SET review = new.review WHERE rowid = old.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS reviews_fts_delete AFTER DELETE ON reviews BEGIN
+    DELETE FROM reviews_fts WHERE rowid = old.rowid;
+END;
+INSERT INTO reviews_fts (rowid, review, id)
+    SELECT rowid, review, id FROM reviews WHERE NOT EXISTS (SELECT 1 FROM reviews_fts);
+"""
+
+_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+sqlite3.register_adapter(datetime, lambda value: value.strftime(_DATETIME_FORMAT))
+sqlite3.register_converter("DATETIME", lambda raw: datetime.fromisoformat(raw.decode()))
+
+_UPDATE_JOIN = re.compile(
+    r"^UPDATE (\w+) (\w+) JOIN (.+?) ON (.+?) SET (.+?)(?: WHERE (.+?))?;?$", re.DOTALL
+)
+_INTERVAL = re.compile(r"(\w+\(\)) - INTERVAL %s SECOND")
+_ROW_IN_LIST = re.compile(r"IN \(\((%s(?:, %s)*)\)")
+_VALUES_COLUMN = re.compile(r"VALUES\((\w+)\)")
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.RLock()
+
+
+@lru_cache(maxsize=1024)
+def translate(sql: str) -> tuple:
+    """``(sqlite_sql, param_order)`` for a MySQL statement.
+
+    ``param_order`` is None when the parameters keep their order, otherwise
+    the indexes to pick them in (``UPDATE ... JOIN`` moves the SET clause,
+    and its parameters, in front of the joined table).
+    """
+    order = None
+    match = _UPDATE_JOIN.match(sql.strip())
+    if match:
+        table, alias, source, on, assignments, where = match.groups()
+        assignments = re.sub(rf"(^|, ){alias}\.(\w+) = ", r"\1\2 = ", assignments)
+        parts = [source, on, assignments, where or ""]
+        starts = [sum(p.count("%s") for p in parts[:i]) for i in range(len(parts))]
+        spans = [range(start, start + part.count("%s")) for start, part in zip(starts, parts)]
+        order = tuple(i for span in (spans[2], spans[0], spans[1], spans[3]) for i in span)
+        sql = f"UPDATE {table} AS {alias} SET {assignments} FROM {source} WHERE {on}"
+        if where:
+            sql += f" AND ({where})"
+    sql = sql.replace("ON DUPLICATE KEY UPDATE", "ON CONFLICT DO UPDATE SET")
+    sql = _VALUES_COLUMN.sub(r"excluded.\1", sql)
+    sql = _INTERVAL.sub(r"datetime(\1, '-' || %s || ' seconds')", sql)
+    sql = _ROW_IN_LIST.sub(r"IN (VALUES (\1)", sql)
+    return sql.replace("%s", "?"), order
+
+
+def _error(err: sqlite3.Error) -> Exception:
+    message = str(err)
+    if isinstance(err, sqlite3.IntegrityError) and "UNIQUE constraint failed" in message:
+        message = f"Duplicate entry ({message})"
+    not_null = re.match(r"NOT NULL constraint failed: \w+\.(\w+)", message)
+    if not_null:
+        message = f"Column '{not_null.group(1)}' cannot be null"
+    return Exception(f"DB Error: {message}")
+
+
+def _subdate(day: str, days: int) -> str:
+    return (date.fromisoformat(day) - timedelta(days=days)).isoformat()
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        env_str("SQLITE_PATH", ":memory:"),
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        check_same_thread=False,
+        isolation_level=None,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.create_function("UTC_TIMESTAMP", 0, lambda: datetime.utcnow().strftime(_DATETIME_FORMAT))
+    conn.create_function("IF", 3, lambda condition, then, otherwise: then if condition else otherwise)
+    conn.create_function("WEEKDAY", 1, lambda value: datetime.fromisoformat(value).weekday(), deterministic=True)
+    conn.create_function("SUBDATE", 2, _subdate, deterministic=True)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def get_sqlite() -> sqlite3.Connection:
+    global _conn
+    with _lock:
+        if _conn is None:
+            _conn = _connect()
+        return _conn
+
+
+def close_sqlite() -> None:
+    """Close the connection; an in-memory database starts empty on next use."""
+    global _conn
+    with _lock:
+        if _conn is not None:
+            conn, _conn = _conn, None
+            conn.close()
+
+
+def _execute(cursor: sqlite3.Cursor, query: str, params: tuple) -> None:
+    sql, order = translate(query)
+    if order is not None:
+        params = tuple(params[i] for i in order)
+    cursor.execute(sql, params)
+
+
+def execute_query_sqlite(queries: list, only_one=False):
+    """Same contract as :func:`services.database.execute_query`; "connect" time is the lock wait."""
+    started = time.perf_counter()
+    connect = fetch = 0.0
+    count = 0
+    ok = False
+    with _lock:
+        connect = time.perf_counter() - started
+        conn = get_sqlite()
+        cursor = conn.cursor()
+        result = None
+        try:
+            cursor.execute("BEGIN")
+            for i, (query, params) in enumerate(queries):
+                statement_started = time.perf_counter()
+                _execute(cursor, query, params)
+                if i == len(queries) - 1:
+                    if returns_rows(query):
+                        fetch_started = time.perf_counter()
+                        rows = cursor.fetchall()
+                        count = len(rows[:1]) if only_one else len(rows)
+                        if only_one:
+                            result = dict(rows[0]) if rows else None
+                        else:
+                            result = [dict(row) for row in rows]
+                        fetch = time.perf_counter() - fetch_started
+                    else:
+                        result = cursor.rowcount
+                if slow_queries.ENABLED:
+                    last = i == len(queries) - 1 and returns_rows(query)
+                    slow_queries.observe(query, params, time.perf_counter() - statement_started, count if last else cursor.rowcount)
+            cursor.execute("COMMIT")
+            ok = True
+        except sqlite3.Error as err:
+            if conn.in_transaction:
+                cursor.execute("ROLLBACK")
+            raise _error(err)
+        finally:
+            cursor.close()
+            if metrics.ENABLED:
+                metrics.observe_db(connect, time.perf_counter() - started - connect - fetch, fetch, count, ok)
+    return result
+
+
+def stream_query_sqlite(query: str, params: tuple, chunk_size: int = 1000) -> Iterator[list]:
+    """Rows of ``query`` in chunks; read up front so the connection isn't held while streaming."""
+    rows = execute_query_sqlite([(query, params)])
+    for start in range(0, len(rows), chunk_size):
+        yield rows[start:start + chunk_size]
@@ -0,0 +1,68 @@
+"""Per-spot change counters for conditional GETs.
+
+``spot_versions`` has one row per (spot, kind) where kind is ``reviews`` or
+``ratings``. Every write handler bumps the row in the same transaction as the
+write, so the version changes exactly when the spot's list/average could
+have. The list and average endpoints build their ETag and Last-Modified from
+it with a primary-key read instead of looking at the rows themselves.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+KINDS = ("reviews", "ratings")
+
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS spot_versions (
+    spot_id VARCHAR(64) NOT NULL,
+    kind VARCHAR(16) NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL,
+    PRIMARY KEY (spot_id, kind)
+)
+"""
+
+
+def bump_query(spot_id: str, kind: str) -> tuple:
+    """Bump the version of ``spot_id`` for a write whose spot is known."""
+    return bump_many_query([spot_id], kind)
+
+
+def bump_many_query(spot_ids: list, kind: str) -> tuple:
+    """Bump each of ``spot_ids`` once, e.g. for a bulk insert touching many spots."""
+    spot_ids = list(dict.fromkeys(spot_ids))
+    return (
+        "INSERT INTO spot_versions (spot_id, kind, version, updated_at) "
+        f"VALUES {', '.join(['(%s, %s, 1, UTC_TIMESTAMP())'] * len(spot_ids))} "
+        "ON DUPLICATE KEY UPDATE version = version + 1, updated_at = UTC_TIMESTAMP();",
+        tuple(value for spot_id in spot_ids for value in (spot_id, kind)),
+    )
+
+
+def bump_for_row_query(kind: str, row_id: str) -> tuple:
+    """Bump the version of the spot that row ``row_id`` of ``kind`` belongs to.
+
+    Must run before a DELETE of that row, since it looks the spot up from it.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {KINDS}")
+    return (
+        f"INSERT INTO spot_versions (spot_id, kind, version, updated_at) "
+        f"SELECT spot_id, %s, 1, UTC_TIMESTAMP() FROM {kind} WHERE id = %s "
+        f"ON DUPLICATE KEY UPDATE version = version + 1, updated_at = UTC_TIMESTAMP();",
+        (kind, row_id),
+    )
+
+
+def read_query(spot_id: str, kind: str) -> tuple:
+    return (
+        "SELECT version, updated_at FROM spot_versions WHERE spot_id = %s AND kind = %s;",
+        (spot_id, kind),
+    )
+
+
+def to_version(row: Optional[dict]) -> dict:
+    """Spots that were never written through the API are at version 0."""
+    if not row:
+        return {"version": 0, "updated_at": None}
+    return {"version": int(row["version"]), "updated_at": row["updated_at"]}
@@ -0,0 +1,152 @@
+"""Write-behind buffering for rating submissions (``RATING_WRITE_BEHIND=true``).
+
+``POST /rating/...`` puts the validated rating on a bounded in-process queue
+and answers 202 with the id the rating will have (its user's existing
+rating's, if there is one). Finding that id costs the handler one read on
+the unique key; the write itself is left to the queue. A background task started by the app
+lifespan drains the queue in batches, flushing when ``batch_size`` items are
+waiting or ``flush_interval`` seconds after the first one arrived, whichever
+comes first. A full queue rejects new items (the handler answers 503) rather
+than letting memory grow. On shutdown the queue is drained before the task
+exits.
+
+Ratings accepted here are lost if the instance dies before they are flushed,
+and they are not visible to reads until then; that is the trade-off for
+turning a burst of single-row transactions into a few multi-row ones.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+_NOTHING = object()
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        flush: Callable[[list], Awaitable[Any]],
+        max_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+    ):
+        self._flush = flush
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing: Optional[asyncio.Event] = None
+        self._accepted = 0
+        self._rejected = 0
+        self._flushed = 0
+        self._failed = 0
+        self._flushes = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._closing = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything still queued, then stop the background task."""
+        if self._task is None:
+            return
+        # Don't sit out the flush interval for a partial batch.
+        self._closing.set()
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def offer(self, item: Any) -> bool:
+        """Queue ``item``; False (and nothing queued) when the queue is full or not running."""
+        if not self.running:
+            self._rejected += 1
+            return False
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self._rejected += 1
+            return False
+        self._accepted += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_size": self.max_size,
+            "accepted": self._accepted,
+            "rejected": self._rejected,
+            "flushed": self._flushed,
+            "failed": self._failed,
+            "flushes": self._flushes,
+            "last_flush_ms": round(self._last_flush_ms, 3),
+            "max_flush_ms": round(self._max_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self._flushes, 3) if self._flushes else 0.0,
+        }
+
+    async def _run(self) -> None:
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._closing.is_set():
+                    break
+                item = await self._next(queue, remaining)
+                if item is _NOTHING:
+                    break
+                batch.append(item)
+            try:
+                await self._flush_batch(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _next(self, queue: asyncio.Queue, timeout: float):
+        """Next queued item, or ``_NOTHING`` on timeout or when ``stop()`` is called."""
+        getter = asyncio.ensure_future(queue.get())
+        closing = asyncio.ensure_future(self._closing.wait())
+        await asyncio.wait({getter, closing}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        closing.cancel()
+        if getter.done():
+            return getter.result()
+        getter.cancel()
+        return _NOTHING
+
+    async def _flush_batch(self, batch: list) -> None:
+        start = time.perf_counter()
+        try:
+            failed = await self._flush(batch) or 0
+        except Exception:
+            logger.exception("write-behind flush of %d item(s) failed", len(batch))
+            failed = len(batch)
+        elapsed = (time.perf_counter() - start) * 1000
+        self._flushes += 1
+        self._flushed += len(batch) - failed
+        self._failed += failed
+        self._last_flush_ms = elapsed
+        self._max_flush_ms = max(self._max_flush_ms, elapsed)
+        self._total_flush_ms += elapsed
@@ -0,0 +1,20 @@
+import asyncio
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import pytest
+
+from services.cache import get_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Responses cached by one test must not leak into the next."""
+    asyncio.run(get_cache().clear())
+    yield
+    asyncio.run(get_cache().clear())
@@ -0,0 +1,45 @@
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from services import aggregates
+
+
+def test_missing_aggregate_is_zero():
+    """Spots without an aggregate row report zeros like the old AVG query did."""
+    result = aggregates.to_aggregation("spot-1", None)
+    assert result.average_rating == 0.0
+    assert result.rating_count == 0
+    assert result.histogram == {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}
+
+
+def test_average_from_sum_and_count():
+    row = {"spot_id": "spot-1", "rating_sum": 13, "rating_count": 3,
+           "count_1": 0, "count_2": 0, "count_3": 0, "count_4": 2, "count_5": 1}
+    result = aggregates.to_aggregation("spot-1", row)
+    assert result.average_rating == 4.3
+    assert result.rating_count == 3
+    assert result.histogram["4"] == 2
+
+
+def test_add_rating_query_sets_one_histogram_bucket():
+    sql, params = aggregates.add_rating_query("spot-1", 4)
+    assert sql.startswith("INSERT INTO rating_aggregates")
+    assert params == ("spot-1", 4, 1, 0, 0, 0, 1, 0)
+
+
+def test_add_ratings_query_groups_by_spot():
+    sql, params = aggregates.add_ratings_query([("a", 5), ("b", 1), ("a", 3)])
+    assert sql.count("(%s, %s, %s, %s, %s, %s, %s, %s)") == 2
+    assert params == ("a", 8, 2, 0, 0, 1, 0, 1, "b", 1, 1, 1, 0, 0, 0, 0)
+
+
+def test_uncount_existing_query_dedupes_pairs():
+    sql, params = aggregates.uncount_existing_query([("a", "u1"), ("b", "u2"), ("a", "u1")])
+    assert sql.startswith("UPDATE rating_aggregates a JOIN (")
+    assert "GROUP BY spot_id" in sql
+    assert params == ("a", "u1", "b", "u2")
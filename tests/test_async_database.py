@@ -0,0 +1,109 @@
+import asyncio
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import pymysql
+import pytest
+
+from services import async_database
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+        self.rows = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, params):
+        if "boom" in query:
+            raise ValueError("not a database error")
+        if "missing_table" in query:
+            raise pymysql.err.ProgrammingError(1146, "Table 'missing_table' doesn't exist")
+        self.conn.executed.append(query)
+        self.rows = [{"id": "abc"}]
+        self.rowcount = 1
+
+    async def fetchone(self):
+        return self.rows[0]
+
+    async def fetchall(self):
+        return list(self.rows)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.executed = []
+        self.pings = self.commits = self.rollbacks = 0
+
+    async def ping(self, reconnect=True):
+        self.pings += 1
+
+    def cursor(self, cursor_class=None):
+        return FakeCursor(self)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+class FakePool:
+    def __init__(self):
+        self.conn = FakeConnection()
+
+    def acquire(self):
+        pool = self
+
+        class Acquired:
+            async def __aenter__(self):
+                return pool.conn
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Acquired()
+
+
+def test_execute_query_async_pings_then_commits():
+    pool = FakePool()
+    queries = [("UPDATE t SET x = 1;", ()), ("SELECT * FROM t;", ())]
+    assert asyncio.run(async_database.execute_query_async(queries, only_one=True, pool=pool)) == {"id": "abc"}
+    assert pool.conn.executed == [sql for sql, _ in queries]
+    assert (pool.conn.pings, pool.conn.commits) == (1, 1)
+
+
+def test_execute_query_async_rolls_back_on_error(monkeypatch):
+    monkeypatch.setenv("DB_POOL_PRE_PING", "false")
+    pool = FakePool()
+    with pytest.raises(Exception, match="DB Error: .*missing_table"):
+        asyncio.run(async_database.execute_query_async([("SELECT * FROM missing_table;", ())], pool=pool))
+    assert (pool.conn.pings, pool.conn.commits, pool.conn.rollbacks) == (0, 0, 1)
+
+
+def test_execute_query_async_rolls_back_on_any_error():
+    pool = FakePool()
+    with pytest.raises(ValueError):
+        asyncio.run(async_database.execute_query_async([("UPDATE t SET x = 1;", ()), ("SELECT boom;", ())], pool=pool))
+    assert (pool.conn.commits, pool.conn.rollbacks) == (0, 1)
+
+
+def test_recycle_uses_the_shorter_of_idle_timeout_and_recycle(monkeypatch):
+    monkeypatch.setenv("DB_POOL_IDLE_TIMEOUT", "120")
+    monkeypatch.setenv("DB_POOL_RECYCLE", "1800")
+    assert async_database._recycle_seconds() == 120
+    monkeypatch.setenv("DB_POOL_IDLE_TIMEOUT", "0")
+    assert async_database._recycle_seconds() == 1800
+    monkeypatch.setenv("DB_POOL_RECYCLE", "0")
+    assert async_database._recycle_seconds() == -1
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import pytest
+
+from services.cache import LRUCache, MemoryCache, RedisCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_byte_limit_and_ttl():
+    cache = LRUCache(max_entries=100, max_bytes=1000, ttl=0.01)
+    cache.set("small", "x", size=400)
+    cache.set("other", "y", size=400)
+    cache.set("third", "z", size=400)
+    assert cache.get("small") is None
+    assert cache.stats()["bytes"] == 800
+    time.sleep(0.02)
+    assert cache.get("other") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidate_by_tag():
+    """A write to one review drops its own entry and every list that contained it."""
+    cache = LRUCache()
+    cache.set("review:1", {"id": "1"})
+    cache.set("reviews:spot:newest", [{"id": "1"}], tags=["reviews:spot", "review:1"])
+    cache.set("reviews:other:newest", [{"id": "2"}], tags=["reviews:other", "review:2"])
+    cache.invalidate("review:1")
+    assert cache.get("review:1") is None
+    assert cache.get("reviews:spot:newest") is None
+    assert cache.get("reviews:other:newest") == [{"id": "2"}]
+
+
+def test_single_flight_coalesces_concurrent_misses():
+    """Concurrent misses on one key run the loader once."""
+    cache = MemoryCache()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"average_rating": 4.5}
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_load("average:s1", loader) for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(r == {"average_rating": 4.5} for r in results)
+    assert cache.stats()["coalesced"] == 9
+
+
+def test_load_racing_an_invalidation_is_not_cached():
+    cache = MemoryCache()
+
+    async def run():
+        async def loader():
+            await cache.invalidate("ratings:s1")
+            return {"average_rating": 1.0}
+
+        await cache.get_or_load("average:s1", loader, tags=["ratings:s1"])
+        return await cache.get("average:s1")
+
+    assert asyncio.run(run()) is None
+
+
+def test_redis_backend_round_trip_and_tags():
+    fakeredis = pytest.importorskip("fakeredis")
+
+    async def run():
+        cache = RedisCache(fakeredis.FakeAsyncRedis())
+        page = {"data": [{"id": "1", "created_at": datetime(2025, 1, 15)}]}
+        loaded = await cache.get_or_load("reviews:s1:newest", lambda: _value(page), tags=["reviews:s1", "review:1"])
+        assert loaded == page
+        cached = await cache.get("reviews:s1:newest")
+        assert cached["data"][0]["created_at"] == "2025-01-15T00:00:00"
+        await cache.invalidate("review:1")
+        return await cache.get("reviews:s1:newest")
+
+    assert asyncio.run(run()) is None
+
+
+async def _value(value):
+    return value
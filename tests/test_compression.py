@@ -0,0 +1,92 @@
+import gzip
+import json
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.responses import PlainTextResponse, StreamingResponse
+
+import main
+from middleware.compression import CompressionMiddleware
+from utils.compression import negotiate
+
+client = TestClient(main.app)
+
+
+def test_negotiate_honours_q_values():
+    assert negotiate("gzip, deflate", ("br", "gzip")) == "gzip"
+    assert negotiate("br;q=0.5, gzip", ("br", "gzip")) == "gzip"
+    assert negotiate("gzip, br", ("br", "gzip")) == "br"
+    assert negotiate("*", ("gzip",)) == "gzip"
+    assert negotiate("gzip;q=0", ("gzip",)) is None
+    assert negotiate("identity", ("gzip",)) is None
+    assert negotiate(None, ("gzip",)) is None
+
+
+def compressing_app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/big")
+    def big():
+        return {"items": ["review text " * 5] * 50}
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/plain")
+    def plain():
+        return PlainTextResponse("x" * 1000, media_type="image/svg")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f'{{"n": {n}}}\n'.encode() * 20 for n in range(5)), media_type="application/x-ndjson")
+
+    return TestClient(app)
+
+
+def test_large_json_is_gzipped_small_is_not():
+    app = compressing_app()
+    response = app.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert response.json()["items"][0].startswith("review text")
+
+    response = app.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"ok": True}
+
+    assert "content-encoding" not in app.get("/big", headers={"Accept-Encoding": "identity"}).headers
+    assert "content-encoding" not in app.get("/plain", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_streamed_response_is_compressed_incrementally():
+    response = compressing_app().get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    lines = response.text.splitlines()
+    assert len(lines) == 100 and json.loads(lines[-1]) == {"n": 4}
+
+
+def test_openapi_is_served_precompressed():
+    response = client.get("/openapi.json", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == main.app.openapi()
+    payload = main.static_payloads.get("openapi")
+    assert gzip.decompress(payload.variants["gzip"]) == payload.body
+
+    again = client.get("/openapi.json", headers={"If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304
+
+    assert "Swagger UI" in client.get("/docs").text
+    assert client.get("/oas.yaml").text.startswith("openapi:")
+    assert client.get("/").json()["message"].startswith("Welcome")
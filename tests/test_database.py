@@ -0,0 +1,136 @@
+import asyncio
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import pytest
+
+from services import database
+from services.pool import ConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.rowcount = len(rows)
+        self.executed = []
+
+    def execute(self, query, params):
+        self.executed.append((query, params))
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def fetchmany(self, size):
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        return chunk
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self.rows)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_pool():
+    pool = ConnectionPool(lambda: FakeConnection([{"id": "abc"}]), size=1, max_overflow=0)
+    database.set_pool(pool)
+    yield pool
+    database.set_pool(None)
+
+
+def test_execute_query_uses_pool(fake_pool):
+    """Two queries in a row share one pooled connection."""
+    assert database.execute_query([("SELECT * FROM reviews;", ())]) == [{"id": "abc"}]
+    assert database.execute_query([("SELECT * FROM reviews;", ())], only_one=True) == {"id": "abc"}
+    stats = fake_pool.stats()
+    assert stats["created"] == 1
+    assert stats["in_use"] == 0
+
+
+def test_execute_query_rolls_back_on_any_error():
+    """A non-database error mid-transaction still rolls back before the connection is pooled again."""
+    conn = FakeConnection([])
+
+    class FailingCursor(FakeCursor):
+        def execute(self, query, params):
+            if params:
+                raise ValueError("bad parameter")
+
+    conn.cursor = lambda dictionary=False: FailingCursor([])
+    pool = ConnectionPool(lambda: conn, size=1, max_overflow=0)
+    with pytest.raises(ValueError):
+        database.execute_query([("UPDATE t SET x = 1;", ()), ("UPDATE t SET y = %s;", (object(),))], pool=pool)
+    assert (conn.commits, conn.rollbacks) == (0, 1)
+    assert pool.stats()["in_use"] == 0
+
+
+def test_run_query_sync_mode(fake_pool, monkeypatch):
+    monkeypatch.setenv("DB_MODE", "sync")
+    result = asyncio.run(database.run_query([("SELECT * FROM ratings;", ())], only_one=True))
+    assert result == {"id": "abc"}
+
+
+def test_invalid_db_mode(monkeypatch):
+    monkeypatch.setenv("DB_MODE", "threads")
+    with pytest.raises(ValueError):
+        database.db_mode()
+
+
+def test_check_sql_mode_requires_strict_mode(monkeypatch):
+    modes = {}
+
+    async def fake_run_query(queries, only_one=False):
+        assert queries == [("SELECT @@SESSION.sql_mode AS sql_mode;", ())]
+        return {"sql_mode": modes["value"]}
+
+    monkeypatch.setattr(database, "run_query", fake_run_query)
+    modes["value"] = "ONLY_FULL_GROUP_BY,STRICT_TRANS_TABLES,NO_ENGINE_SUBSTITUTION"
+    asyncio.run(database.check_sql_mode())
+    modes["value"] = "NO_ENGINE_SUBSTITUTION"
+    with pytest.raises(RuntimeError, match="STRICT_TRANS_TABLES"):
+        asyncio.run(database.check_sql_mode())
+
+
+def test_stream_query_chunks_and_discards_on_early_close():
+    pool = ConnectionPool(lambda: FakeConnection([{"id": i} for i in range(5)]), size=1, max_overflow=0)
+    database.set_pool(pool)
+    try:
+        chunks = list(database.stream_query("SELECT * FROM reviews;", (), chunk_size=2))
+        assert [len(c) for c in chunks] == [2, 2, 1]
+        assert pool.stats()["idle"] == 1
+
+        partial = database.stream_query("SELECT * FROM reviews;", (), chunk_size=2)
+        next(partial)
+        partial.close()
+        assert pool.stats()["idle"] == 0
+        assert pool.stats()["in_use"] == 0
+    finally:
+        database.set_pool(None)
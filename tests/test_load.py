@@ -0,0 +1,79 @@
+import asyncio
+import os
+import random
+import sys
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import httpx
+
+import main
+from benchmarks import load, seed
+from services.sqlite_database import close_sqlite
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert load.percentile(values, 50) == 50
+    assert load.percentile(values, 99) == 99
+    assert load.percentile([7.0], 95) == 7.0
+    assert load.percentile([], 50) == 0.0
+
+
+def test_short_run_against_seeded_sqlite(monkeypatch):
+    """The harness end to end: seed a tiny dataset, drive every scenario, no server errors."""
+    monkeypatch.setenv("DB_MODE", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", ":memory:")
+    close_sqlite()
+    try:
+        sample = seed.seed(spots=20, ratings=300, reviews=60)
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                return await load.drive(client, sample, rps=400, duration=0.5, max_in_flight=32, rng=random.Random(1))
+
+        report = asyncio.run(scenario())
+    finally:
+        close_sqlite()
+    assert sum(r["requests"] for r in report.values()) == 200
+    assert all(r["errors"] == 0 for r in report.values()), report
+
+
+def test_every_scenario_is_a_working_request(monkeypatch):
+    monkeypatch.setenv("DB_MODE", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", ":memory:")
+    close_sqlite()
+    try:
+        sample = seed.seed(spots=5, ratings=50, reviews=20)
+        rng = random.Random(1)
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                statuses = {}
+                for name, _, build in load.SCENARIOS:
+                    method, path, body = build(sample, rng)
+                    statuses[name] = (await client.request(method, path, json=body)).status_code
+                return statuses
+
+        statuses = asyncio.run(scenario())
+    finally:
+        close_sqlite()
+    assert all(status < 400 for status in statuses.values()), statuses
+
+
+def test_scenarios_cover_every_api_route():
+    """Diagnostics aside (/health/..., /), a new route needs a scenario too."""
+    names = {name for name, _, _ in load.SCENARIOS}
+    missing = [
+        f"{method} {route.path}"
+        for route in main.app.routes
+        if getattr(route, "include_in_schema", False) and route.path != "/" and not route.path.startswith("/health/")
+        for method in route.methods - {"HEAD"}
+        if f"{method} {route.path}" not in names
+    ]
+    assert missing == []
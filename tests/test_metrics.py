@@ -0,0 +1,88 @@
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import main
+from middleware.timing import TimedRoute, TimingMiddleware
+from services.sqlite_database import close_sqlite
+from utils import metrics
+
+client = TestClient(main.app)
+
+
+@pytest.fixture
+def sqlite_db(monkeypatch):
+    monkeypatch.setenv("DB_MODE", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", ":memory:")
+    close_sqlite()
+    yield
+    close_sqlite()
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("t_seconds", "Test.", (0.1, 1.0), ("route",))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5.0, "/a")
+
+    lines = histogram.render()
+    assert lines[:2] == ["# HELP t_seconds Test.", "# TYPE t_seconds histogram"]
+    assert 't_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 't_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 't_seconds_sum{route="/a"} 5.550000' in lines
+    assert 't_seconds_count{route="/a"} 3' in lines
+
+
+def test_metrics_label_requests_by_route_template(sqlite_db):
+    spot = "metrics-spot"
+    assert client.post(f"/rating/{spot}/user/u1", json={"rating": 4}).status_code == 201
+    assert client.get(f"/ratings/{spot}").status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/ratings/{spotId}",status="200"}' in body
+    assert 'http_endpoint_duration_seconds_count{method="GET",route="/ratings/{spotId}"}' in body
+    assert spot not in body
+    assert 'db_phase_duration_seconds_count{phase="query"}' in body
+    assert "db_rows_returned_bucket" in body
+    assert 'db_batches_total{outcome="ok"}' in body
+
+
+def test_server_timing_header(monkeypatch):
+    async def fake_run_query(queries, only_one=False):
+        metrics.observe_db(0.001, 0.002, 0.0005, 3)
+        return []
+
+    monkeypatch.setattr(main, "run_query", fake_run_query)
+    app = FastAPI()
+    app.router.route_class = TimedRoute
+    app.add_middleware(TimingMiddleware, server_timing=True)
+
+    @app.get("/things/{thingId}")
+    async def things(thingId: str):
+        await main.run_query([("SELECT 1", ())])
+        return {"id": thingId}
+
+    response = TestClient(app).get("/things/x")
+    assert response.status_code == 200
+    header = response.headers["server-timing"]
+    assert 'db;dur=3.50;desc="1 batch(es), 3 row(s)"' in header
+    assert "db-connect;dur=1.00" in header
+    assert "endpoint;dur=" in header
+    assert "serialize;dur=" in header
+    assert "total;dur=" in header
+
+
+def test_no_server_timing_header_by_default():
+    assert "server-timing" not in client.get("/health").headers
@@ -0,0 +1,104 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import pytest
+
+from services import migrations
+
+
+class FakeExecute:
+    def __init__(self, applied=()):
+        self.applied = set(applied)
+        self.statements = []
+
+    def __call__(self, queries, only_one=False):
+        sql, params = queries[-1]
+        if sql.startswith("SELECT version"):
+            return [{"version": v} for v in self.applied]
+        if sql.startswith("INSERT INTO schema_migrations"):
+            self.applied.add(params[0])
+            return 1
+        self.statements.append(sql)
+        if "ADD INDEX idx_reviews_spot_created" in sql:
+            raise Exception("DB Error: 1061 (42000): Duplicate key name 'idx_reviews_spot_created'")
+        return 0
+
+
+def test_upgrade_applies_only_pending_in_order():
+    execute = FakeExecute(applied={1})
+    done = migrations.upgrade(execute)
+    assert done == [m[0] for m in migrations.MIGRATIONS[1:]]
+    assert execute.applied == {m[0] for m in migrations.MIGRATIONS}
+    assert not any("CREATE TABLE IF NOT EXISTS reviews" in sql for sql in execute.statements)
+    assert migrations.upgrade(execute) == []
+
+
+def test_upgrade_stops_at_target_and_raises_real_errors():
+    execute = FakeExecute()
+    assert migrations.upgrade(execute, target=2) == [1, 2]
+
+    def broken(queries, only_one=False):
+        if queries[-1][0].lstrip().startswith("ALTER TABLE ratings"):
+            raise Exception("DB Error: 1146 (42S02): Table 'mydb.ratings' doesn't exist")
+        return execute(queries, only_one)
+
+    with pytest.raises(Exception, match="doesn't exist"):
+        migrations.upgrade(broken)
+    assert 3 not in execute.applied
+
+
+def test_require_current_names_pending_migrations():
+    execute = FakeExecute(applied={m[0] for m in migrations.MIGRATIONS[:3]})
+    with pytest.raises(RuntimeError, match=r"pending: 4 \(") as error:
+        migrations.require_current(execute)
+    assert "python -m services.migrations upgrade" in str(error.value)
+    migrations.upgrade(execute)
+    migrations.require_current(execute)
+
+
+def test_full_scans_flags_table_and_index_scans():
+    plan = [
+        {"table": "ratings", "type": "range", "key": "idx_ratings_spot_created"},
+        {"table": "reviews", "type": "ALL", "key": None},
+        {"table": "ratings", "type": "index", "key": "PRIMARY"},
+        {"table": "<derived2>", "type": "ALL", "key": None},
+        {"table": None, "type": None, "key": None},
+    ]
+    assert [row["table"] for row in migrations.full_scans(plan)] == ["reviews", "ratings"]
+
+
+@pytest.mark.skipif(
+    os.environ.get("DB_INTEGRATION_TESTS") != "1",
+    reason="needs a disposable MySQL database (DB_INTEGRATION_TESTS=1 plus the usual DB_* settings)",
+)
+def test_hot_queries_use_index_seeks():
+    from services.database import execute_query
+
+    migrations.upgrade(execute_query)
+    # Enough rows spread over enough spots that the optimizer prefers the
+    # indexes for real instead of because every table is tiny.
+    start = datetime(2025, 1, 1)
+    ratings, reviews = [], []
+    for i in range(400):
+        row_id = f"ffffffff-0000-4000-8000-{i:012d}"
+        spot, user, created_at = f"explain-spot-{i % 40}", f"explain-user-{i}", start + timedelta(minutes=i)
+        ratings.append((row_id, spot, user, 1 + i % 5, created_at))
+        reviews.append((row_id, spot, user, f"review {i}", created_at))
+    execute_query([
+        ("INSERT IGNORE INTO ratings (id, spot_id, user_id, rating, created_at) VALUES "
+         + ", ".join(["(%s, %s, %s, %s, %s)"] * len(ratings)) + ";",
+         tuple(v for row in ratings for v in row)),
+        ("INSERT IGNORE INTO reviews (id, spot_id, user_id, review, created_at) VALUES "
+         + ", ".join(["(%s, %s, %s, %s, %s)"] * len(reviews)) + ";",
+         tuple(v for row in reviews for v in row)),
+    ])
+    execute_query([("ANALYZE TABLE ratings, reviews;", ())])
+
+    scans = migrations.explain(execute_query)
+    assert {label: rows for label, rows in scans.items() if rows} == {}
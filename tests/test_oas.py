@@ -0,0 +1,26 @@
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import pytest
+
+import main
+from utils import oas
+
+
+def test_checked_in_oas_yaml_matches_the_app():
+    pytest.importorskip("yaml")
+    with open(oas.OAS_YAML_PATH, encoding="utf-8") as f:
+        assert f.read() == oas.to_yaml(main.app.openapi()), "oas.yaml is stale; run python -m utils.oas"
+
+
+def test_oas_yaml_lists_every_api_route():
+    yaml = pytest.importorskip("yaml")
+    with open(oas.OAS_YAML_PATH, encoding="utf-8") as f:
+        paths = yaml.safe_load(f)["paths"]
+    routes = {route.path for route in main.app.routes if getattr(route, "include_in_schema", False)}
+    assert routes == set(paths)
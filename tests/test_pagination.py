@@ -0,0 +1,67 @@
+import os
+import sys
+from datetime import datetime
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import pytest
+
+from utils import pagination
+
+NEWEST = (("created_at", True), ("id", True))
+
+
+def test_cursor_round_trip():
+    cursor = pagination.encode_cursor("newest", [datetime(2025, 1, 15, 10, 20, 30), "abc"])
+    assert pagination.decode_cursor(cursor, "newest", ["created_at", "id"]) == [
+        datetime(2025, 1, 15, 10, 20, 30), "abc"
+    ]
+
+
+def test_cursor_for_other_order_is_rejected():
+    cursor = pagination.encode_cursor("oldest", [datetime(2025, 1, 15), "abc"])
+    with pytest.raises(pagination.PaginationError):
+        pagination.decode_cursor(cursor, "newest", ["created_at", "id"])
+    with pytest.raises(pagination.PaginationError):
+        pagination.decode_cursor("not-a-cursor", "newest", ["created_at", "id"])
+
+
+def test_page_query_after_cursor():
+    cursor = pagination.encode_cursor("newest", [datetime(2025, 1, 15), "abc"])
+    sql, params = pagination.page_query("ratings", "spot_id", "s1", ["id", "rating"], NEWEST, "newest", cursor, 10)
+    assert "WHERE spot_id = %s AND (created_at < %s OR (created_at = %s AND id < %s))" in sql
+    assert sql.endswith("ORDER BY created_at DESC, id DESC LIMIT %s;")
+    assert params == ("s1", datetime(2025, 1, 15), datetime(2025, 1, 15), "abc", 11)
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_fast_json_matches_response_model(monkeypatch, use_orjson):
+    import json
+
+    from starlette.requests import Request
+
+    import main
+    from models.rating import RatingPage
+    from utils import fast_json
+
+    if not use_orjson:
+        monkeypatch.setattr(fast_json, "orjson", None)
+    elif fast_json.orjson is None:
+        pytest.skip("orjson is not installed")
+    request = Request({
+        "type": "http", "method": "GET", "scheme": "http", "server": ("test", 80),
+        "path": "/ratings/spot-1", "query_string": b"limit=2", "headers": [],
+    })
+    rows = [
+        {"id": "00000000-0000-4000-8000-000000000001", "rating": 4,
+         "created_at": datetime(2025, 1, 15, 10, 20, 30, 120000), "updated_at": None},
+        {"id": "00000000-0000-4000-8000-000000000002", "rating": 5,
+         "created_at": datetime(2025, 1, 15, 10, 20, 29), "updated_at": datetime(2025, 1, 16)},
+    ]
+    page = main.list_page(request, rows, ["id", "rating", "postDate", "updated_at"], main.RATING_FIELDS, "/rating", "abc")
+
+    expected = RatingPage.model_validate(page).model_dump(mode="json", exclude_unset=True)
+    assert json.loads(fast_json.FastJSONResponse(page).body) == expected
@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import pytest
+
+from services.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+
+    def is_connected(self):
+        return self.alive
+
+    def close(self):
+        self.closed = True
+
+
+def test_connections_are_reused():
+    """A released connection is handed out again instead of opening a new one."""
+    pool = ConnectionPool(FakeConnection, size=2, max_overflow=0)
+    first = pool.acquire()
+    pool.release(first)
+    second = pool.acquire()
+    assert second is first
+    assert pool.stats()["created"] == 1
+    assert pool.stats()["in_use"] == 1
+
+
+def test_overflow_is_closed_on_release_and_timeout_when_exhausted():
+    pool = ConnectionPool(FakeConnection, size=1, max_overflow=1, timeout=0.05)
+    a = pool.acquire()
+    b = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    pool.release(a)
+    pool.release(b)
+    stats = pool.stats()
+    assert stats["idle"] == 1
+    assert stats["closed"] == 1
+    assert b.closed
+
+
+def test_dead_connection_is_recycled_by_pre_ping():
+    pool = ConnectionPool(FakeConnection, size=1, max_overflow=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.alive = False
+    fresh = pool.acquire()
+    assert fresh is not conn
+    assert conn.closed
+    assert pool.stats()["recycled"] == 1
+
+
+def test_old_connection_is_recycled():
+    pool = ConnectionPool(FakeConnection, size=1, max_overflow=0, recycle=0.001)
+    conn = pool.acquire()
+    pool.release(conn)
+    time.sleep(0.01)
+    assert pool.acquire() is not conn
+    assert pool.stats()["recycled"] == 1
+
+
+def test_dispose_closes_checked_out_connections_on_release():
+    pool = ConnectionPool(FakeConnection, size=2, max_overflow=0)
+    idle, busy = pool.acquire(), pool.acquire()
+    pool.release(idle)
+    pool.dispose()
+    assert idle.closed and not busy.closed
+    pool.release(busy)
+    assert busy.closed
+    assert pool.stats()["idle"] == 0
+    assert pool.acquire() not in (idle, busy)
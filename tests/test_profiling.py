@@ -0,0 +1,79 @@
+import logging
+import os
+import pstats
+import sys
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import main
+from middleware.profiling import ProfilingMiddleware
+from services.sqlite_database import close_sqlite
+from utils import slow_queries
+
+client = TestClient(main.app)
+
+
+def test_redact_folds_placeholder_lists_and_literals():
+    sql = "SELECT *\n  FROM ratings WHERE note = 'secret' AND spot_id IN (" + ", ".join(["%s"] * 20) + ")"
+    assert slow_queries.redact(sql) == "SELECT * FROM ratings WHERE note = '?' AND spot_id IN (?, ... x20)"
+
+    sql = "INSERT INTO t (a, b) VALUES " + ", ".join(["(%s, %s)"] * 6)
+    assert slow_queries.redact(sql) == "INSERT INTO t (a, b) VALUES (?, ?), ... x6"
+
+
+def test_slow_query_logged_with_route(monkeypatch, caplog):
+    monkeypatch.setenv("DB_MODE", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", ":memory:")
+    monkeypatch.setattr(slow_queries, "ENABLED", True)
+    monkeypatch.setattr(slow_queries, "_threshold", 0.0)
+    close_sqlite()
+    try:
+        with caplog.at_level(logging.WARNING, logger="slow_queries"):
+            response = client.get("/ratings/slow-spot")
+    finally:
+        close_sqlite()
+
+    assert response.status_code == 200
+    messages = [record.getMessage() for record in caplog.records if record.name == "slow_queries"]
+    assert messages
+    assert all("route=/ratings/{spotId}" in message for message in messages)
+    assert "slow-spot" not in "".join(messages)
+
+
+def test_profile_written_for_token_header(tmp_path):
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, token="s3cret", directory=str(tmp_path))
+
+    @app.get("/things/{thingId}")
+    def things(thingId: str):
+        return {"id": thingId}
+
+    profiled = TestClient(app)
+    assert profiled.get("/things/a").status_code == 200
+    assert profiled.get("/things/a", headers={"X-Debug-Profile": "wrong"}).status_code == 200
+    assert list(tmp_path.iterdir()) == []
+
+    assert profiled.get("/things/a", headers={"X-Debug-Profile": "s3cret"}).status_code == 200
+    (dump,) = tmp_path.iterdir()
+    assert dump.name.split("-")[2] == "things_thingId"
+    assert pstats.Stats(str(dump)).total_calls > 0
+
+
+def test_profile_every_nth_request(tmp_path):
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, every=3, directory=str(tmp_path))
+
+    @app.get("/ping")
+    def ping():
+        return {}
+
+    profiled = TestClient(app)
+    for _ in range(6):
+        profiled.get("/ping")
+    assert len(list(tmp_path.iterdir())) == 2
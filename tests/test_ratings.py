@@ -0,0 +1,303 @@
+import json
+import os
+import sys
+from datetime import datetime
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from fastapi.testclient import TestClient
+import main
+
+client = TestClient(main.app)
+
+
+def test_batch_averages_fill_unknown_spots(monkeypatch):
+    """Spots without aggregates come back as zeros, in the order requested."""
+    async def fake_run_query(queries, only_one=False):
+        return [{"spot_id": "b", "rating_sum": 9, "rating_count": 2,
+                 "count_1": 0, "count_2": 0, "count_3": 0, "count_4": 1, "count_5": 1}]
+
+    monkeypatch.setattr(main, "run_query", fake_run_query)
+    response = client.post("/ratings/averages", json={"spotIds": ["a", "b", "a"]})
+    assert response.status_code == 200
+    data = [item["data"] for item in response.json()]
+    assert [d["spotId"] for d in data] == ["a", "b"]
+    assert data[0]["rating_count"] == 0
+    assert data[1]["average_rating"] == 4.5
+
+
+def test_batch_averages_cap(monkeypatch):
+    monkeypatch.setattr(main, "MAX_AVERAGES_BATCH", 2)
+    response = client.post("/ratings/averages", json={"spotIds": ["a", "b", "c"]})
+    assert response.status_code == 400
+
+
+def test_ratings_page_has_next_link_and_projection(monkeypatch):
+    """limit+1 rows means another page; fields= trims the payload to what was asked for."""
+    seen = []
+
+    async def fake_run_query(queries, only_one=False):
+        if "spot_versions" in queries[0][0]:
+            return None
+        seen.extend(queries)
+        return [
+            {"id": f"00000000-0000-4000-8000-00000000000{i}", "rating": 5 - i,
+             "created_at": datetime(2025, 1, 10 - i)}
+            for i in range(3)
+        ]
+
+    monkeypatch.setattr(main, "run_query", fake_run_query)
+    response = client.get("/ratings/spot-1?limit=2&fields=rating")
+    assert response.status_code == 200
+    body = response.json()
+    # Still the bare array older clients read; the next page is in the Link header.
+    assert len(body) == 2
+    assert set(body[0]["data"]) == {"id", "rating"}
+    assert response.headers["link"].startswith("</ratings/spot-1?") and 'rel="next"' in response.headers["link"]
+    assert "cursor=" in response.headers["link"]
+    sql, params = seen[0]
+    assert "LIMIT %s" in sql and params[-1] == 3
+    assert "review" not in sql
+
+
+def test_ratings_without_limit_return_every_row(monkeypatch):
+    seen = []
+
+    async def fake_run_query(queries, only_one=False):
+        if "spot_versions" in queries[0][0]:
+            return None
+        seen.extend(queries)
+        return [{"id": f"00000000-0000-4000-8000-00000000000{i}", "rating": 3, "user_id": "u",
+                 "created_at": datetime(2025, 1, 1), "updated_at": None} for i in range(3)]
+
+    monkeypatch.setattr(main, "run_query", fake_run_query)
+    response = client.get("/ratings/spot-1")
+    assert len(response.json()) == 3
+    assert "link" not in response.headers
+    assert "LIMIT" not in seen[0][0]
+
+
+def test_ratings_rejects_unknown_field():
+    response = client.get("/ratings/spot-1?fields=rating,secret")
+    assert response.status_code == 400
+
+
+def test_export_streams_ndjson(monkeypatch):
+    async def fake_stream_rows(query, params, chunk_size):
+        yield [{"spot_id": "s1", "id": "r1", "user_id": "u1", "rating": 4,
+                "created_at": datetime(2025, 1, 15), "updated_at": None}]
+        yield [{"spot_id": "s1", "id": "r2", "user_id": "u2", "rating": 2,
+                "created_at": datetime(2025, 1, 16), "updated_at": None}]
+
+    monkeypatch.setattr(main, "stream_rows", fake_stream_rows)
+    response = client.get("/export/ratings?spotId=s1")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["id"] for line in lines] == ["r1", "r2"]
+    assert lines[0]["postDate"] == "2025-01-15T00:00:00"
+
+
+def test_average_conditional_get(monkeypatch):
+    """A matching If-None-Match gets a 304 without reading the aggregate."""
+    calls = []
+
+    async def fake_run_query(queries, only_one=False):
+        calls.append(queries[0][0])
+        if "spot_versions" in queries[0][0]:
+            return {"version": 7, "updated_at": datetime(2025, 1, 15, 10, 20, 30)}
+        return None
+
+    monkeypatch.setattr(main, "run_query", fake_run_query)
+    first = client.get("/ratings/spot-1/average")
+    assert first.status_code == 200
+    assert first.headers["last-modified"] == "Wed, 15 Jan 2025 10:20:30 GMT"
+    etag = first.headers["etag"]
+
+    calls.clear()
+    second = client.get("/ratings/spot-2/average", headers={"If-None-Match": etag})
+    assert second.status_code == 200
+
+    calls.clear()
+    third = client.get("/ratings/spot-1/average", headers={"If-None-Match": etag})
+    assert third.status_code == 304
+    assert third.headers["etag"] == etag
+    assert calls == []
+
+    fourth = client.get("/ratings/spot-1/average", headers={"If-Modified-Since": "Wed, 15 Jan 2025 10:20:30 GMT"})
+    assert fourth.status_code == 304
+
+
+def test_add_rating_upserts_per_user(monkeypatch):
+    """One transaction per rating; rating the spot again replaces the user's rating (200, same id)."""
+    batches = []
+    existing = {}
+
+    async def fake_run_query(queries, only_one=False):
+        batches.append([sql for sql, _ in queries])
+        upsert_params = next(params for sql, params in queries if sql.startswith("INSERT INTO ratings"))
+        row_id, spot_id, user_id, rating, created_at = upsert_params
+        row = existing.setdefault((spot_id, user_id), {"id": row_id, "created_at": created_at, "updated_at": None})
+        if row["id"] != row_id:
+            row["updated_at"] = created_at
+        row["rating"] = rating
+        return dict(row)
+
+    monkeypatch.setattr(main, "run_query", fake_run_query)
+    response = client.post("/rating/spot-1/user/user-1", json={"rating": 4, "postDate": "2025-01-15T10:20:30.5+02:00"})
+    assert response.status_code == 201
+    first = response.json()["data"]
+    assert first["rating"] == 4
+    assert first["created_at"] == "2025-01-15T08:20:30"
+    assert len(batches) == 1
+    assert any(sql.startswith("INSERT INTO ratings") and "ON DUPLICATE KEY UPDATE" in sql for sql in batches[0])
+
+    response = client.post("/rating/spot-1/user/user-1", json={"rating": 2})
+    assert response.status_code == 200
+    second = response.json()["data"]
+    assert second["id"] == first["id"]
+    assert second["rating"] == 2
+    assert second["updated_at"] is not None
+
+
+def test_idempotency_key_replays_first_response(monkeypatch):
+    """A retry with the same key gets the stored response from one lookup, without writing."""
+    keys = {}
+    writes = []
+
+    async def fake_run_query(queries, only_one=False):
+        sql, params = queries[0]
+        if "FROM idempotency_keys" in sql:
+            return keys.get(params[0])
+        if sql.startswith("INSERT INTO idempotency_keys"):
+            keys[params[0]] = {"fingerprint": params[1], "status_code": None, "response": None}
+        if sql.startswith("UPDATE idempotency_keys"):
+            status_code, stored, key = params
+            keys[key].update(status_code=status_code, response=stored)
+            return 1
+        writes.append(queries)
+        return 1
+
+    monkeypatch.setattr(main, "run_query", fake_run_query)
+    headers = {"Idempotency-Key": "retry-1"}
+    body = {"review": "Great view", "postDate": "2025-01-15T10:20:30Z"}
+    first = client.post("/review/spot-1/user/user-1", json=body, headers=headers)
+    retry = client.post("/review/spot-1/user/user-1", json=body, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert len(writes) == 1
+
+    other = client.post("/review/spot-1/user/user-1", json={"review": "Changed my mind"}, headers=headers)
+    assert other.status_code == 422
+
+
+def test_idempotency_key_released_when_response_not_stored(monkeypatch):
+    """If storing the response fails, the claim is dropped so a retry isn't answered 409."""
+    run = []
+
+    async def fake_run_query(queries, only_one=False):
+        sql = queries[0][0]
+        run.append(sql)
+        if "FROM idempotency_keys" in sql:
+            return None
+        if sql.startswith("UPDATE idempotency_keys"):
+            raise Exception("DB Error: Lost connection")
+        return 1
+
+    monkeypatch.setattr(main, "run_query", fake_run_query)
+    body = {"review": "Great view"}
+    response = client.post("/review/spot-1/user/user-1", json=body, headers={"Idempotency-Key": "lost-1"})
+    assert response.status_code == 201
+    assert run[-1] == "DELETE FROM idempotency_keys WHERE idem_key = %s AND status_code IS NULL;"
+
+
+def upserted(queries):
+    """What the bulk read-back finds when none of the pairs had a rating: the ids just upserted."""
+    params = next(params for sql, params in queries if sql.startswith("INSERT INTO ratings"))
+    return [{"id": params[i], "spot_id": params[i + 1], "user_id": params[i + 2]} for i in range(0, len(params), 5)]
+
+
+def test_bulk_ratings_partial_failure(monkeypatch):
+    """A bad item and a duplicate don't stop the rest of the batch."""
+    batches = []
+
+    async def fake_run_query(queries, only_one=False):
+        insert_params = next(params for sql, params in queries if sql.startswith("INSERT INTO ratings"))
+        if "00000000-0000-4000-8000-000000000002" in insert_params:
+            raise Exception("DB Error: 1062 (23000): Duplicate entry")
+        batches.append(queries)
+        return upserted(queries)
+
+    monkeypatch.setattr(main, "run_query", fake_run_query)
+    monkeypatch.setattr(main, "BULK_CHUNK_SIZE", 2)
+    items = [
+        {"spot_id": "a", "user_id": "u1", "rating": 5, "id": "00000000-0000-4000-8000-000000000001"},
+        {"spot_id": "a", "user_id": "u2", "rating": 4, "id": "00000000-0000-4000-8000-000000000002"},
+        {"spot_id": "b", "user_id": "u3", "rating": 9},
+        {"spot_id": "b", "user_id": "u4", "rating": 3},
+    ]
+    response = client.post("/ratings/bulk", json={"items": items})
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["status"] for r in body["data"]] == [201, 409, 422, 201]
+    assert body["created"] == 2 and body["failed"] == 2
+    # Chunk [0, 1] failed and was retried item by item; item 3 went in as its own chunk.
+    assert len(batches) == 2
+
+
+def test_bulk_ratings_report_superseded_items(monkeypatch):
+    """Two ratings by one user for one spot: only the last is written, the first points at it."""
+    async def fake_run_query(queries, only_one=False):
+        return upserted(queries)
+
+    monkeypatch.setattr(main, "run_query", fake_run_query)
+    items = [
+        {"spot_id": "a", "user_id": "u1", "rating": 2, "id": "00000000-0000-4000-8000-000000000001"},
+        {"spot_id": "a", "user_id": "u2", "rating": 4, "id": "00000000-0000-4000-8000-000000000002"},
+        {"spot_id": "a", "user_id": "u1", "rating": 5, "id": "00000000-0000-4000-8000-000000000003"},
+    ]
+    body = client.post("/ratings/bulk", json={"items": items}).json()
+    assert [(r["status"], r["id"][-1]) for r in body["data"]] == [(200, "3"), (201, "2"), (201, "3")]
+    assert "item 2" in body["data"][0]["error"]
+    assert body["created"] == 2 and body["failed"] == 0
+
+
+def test_unchanged_rating_update_is_not_a_404(monkeypatch):
+    """Re-sending a cached rating's value matches the row but changes nothing, which can report 0 rows."""
+    import asyncio
+
+    from services.cache import MemoryCache
+
+    rating_id = "00000000-0000-4000-8000-000000000001"
+    cache = MemoryCache()
+    asyncio.run(cache.set(f"rating:{rating_id}", {
+        "id": rating_id, "spot_id": "s1", "user_id": "u1", "rating": 4,
+        "created_at": datetime(2025, 1, 15), "updated_at": datetime(2025, 1, 16),
+    }))
+    seen = []
+
+    async def fake_run_query(queries, only_one=False):
+        seen.append(queries[-1][0])
+        if queries[-1][0].startswith("UPDATE"):
+            return 0
+        return {"id": rating_id} if "WHERE id = %s" in queries[-1][0] else None
+
+    monkeypatch.setattr(main, "WRITE_READ_BACK", False)
+    monkeypatch.setattr(main, "get_cache", lambda: cache)
+    monkeypatch.setattr(main, "run_query", fake_run_query)
+    response = client.patch(f"/rating/{rating_id}", json={"rating": 4})
+    assert response.status_code == 200
+    assert response.json()["data"]["rating"] == 4
+    assert seen[-1] == "SELECT id FROM ratings WHERE id = %s;"
+
+    async def gone(queries, only_one=False):
+        return 0 if queries[-1][0].startswith("UPDATE") else None
+
+    asyncio.run(cache.set(f"rating:{rating_id}", {"id": rating_id, "spot_id": "s1", "user_id": "u1",
+                                                  "rating": 4, "created_at": datetime(2025, 1, 15)}))
+    monkeypatch.setattr(main, "run_query", gone)
+    assert client.patch(f"/rating/{rating_id}", json={"rating": 4}).status_code == 404
@@ -0,0 +1,209 @@
+import asyncio
+import os
+import sys
+import time
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from middleware.read_routing import ReadRoutingMiddleware
+from services import database, replicas
+from services.cache import MemoryCache
+from services.pool import ConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, server):
+        self.server = server
+        self.rowcount = 1
+        self.rows = []
+
+    def execute(self, query, params):
+        if self.server.broken:
+            raise database.mysql.connector.Error("Lost connection")
+        self.server.executed.append(query)
+        self.rows = [self.server.status if query.startswith("SHOW") else {"server": self.server.name}]
+
+    def fetchone(self):
+        return self.rows[0] if self.rows and self.rows[0] is not None else None
+
+    def fetchall(self):
+        return [row for row in self.rows if row is not None]
+
+    def close(self):
+        pass
+
+
+class FakeServer:
+    def __init__(self, name, status=None):
+        self.name = name
+        self.status = status
+        self.broken = False
+        self.executed = []
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+
+def fake_replica(name, lag=0):
+    server = FakeServer(name, {"Seconds_Behind_Source": lag})
+    replica = replicas.Replica(name)
+    replica._pool = ConnectionPool(lambda: server, size=1, max_overflow=0)
+    return replica, server
+
+
+@pytest.fixture
+def servers(monkeypatch):
+    monkeypatch.setenv("DB_MODE", "sync")
+    primary = FakeServer("primary")
+    database.set_pool(ConnectionPool(lambda: primary, size=1, max_overflow=0))
+    replica, server = fake_replica("replica-1")
+    replica_set = replicas.ReplicaSet([replica], max_lag=5, check_interval=5)
+    asyncio.run(replica_set.check("sync"))
+    replicas.set_replicas(replica_set)
+    yield primary, server, replica_set
+    replicas.set_replicas(None)
+    database.set_pool(None)
+
+
+def routed_app():
+    app = FastAPI()
+    app.add_middleware(ReadRoutingMiddleware, window=10, writes={("POST", "/write")})
+
+    @app.get("/read")
+    async def read():
+        return await database.run_query([("SELECT 1;", ())], only_one=True)
+
+    @app.post("/write")
+    async def write():
+        return {"rows": await database.run_query([("UPDATE t SET x = 1;", ())])}
+
+    @app.post("/lookup")
+    async def lookup():
+        return await database.run_query([("SELECT 1;", ())], only_one=True)
+
+    return TestClient(app)
+
+
+def test_gets_read_from_replica_until_the_client_writes(servers):
+    primary, replica_server, _ = servers
+    client = routed_app()
+    assert client.get("/read").json() == {"server": "replica-1"}
+
+    response = client.post("/write")
+    assert primary.executed == ["UPDATE t SET x = 1;"]
+    assert float(response.headers["x-read-primary-until"]) > 0
+    # The cookie pins this client's reads to the primary; other clients still use the replica.
+    assert client.get("/read").json() == {"server": "primary"}
+    assert routed_app().get("/read").json() == {"server": "replica-1"}
+
+
+def test_read_only_posts_do_not_pin_the_client(servers):
+    client = routed_app()
+    response = client.post("/lookup")
+    assert "x-read-primary-until" not in response.headers
+    assert "set-cookie" not in response.headers
+    assert client.get("/read").json() == {"server": "replica-1"}
+
+
+def test_batch_averages_set_no_read_primary_cookie(monkeypatch):
+    import main
+
+    async def fake_run_query(queries, only_one=False):
+        return []
+
+    monkeypatch.setattr(main, "run_query", fake_run_query)
+    client = TestClient(ReadRoutingMiddleware(main.app, window=10, writes=main.WRITE_ROUTES))
+    response = client.post("/ratings/averages", json={"spotIds": ["a"]})
+    assert response.status_code == 200
+    assert "set-cookie" not in response.headers
+    routes = {(method, route.path) for route in main.app.routes for method in getattr(route, "methods", ())}
+    assert main.WRITE_ROUTES <= routes
+
+
+def test_lagging_or_failing_replica_leaves_rotation(servers):
+    _, replica_server, replica_set = servers
+    client = routed_app()
+
+    replica_server.status = {"Seconds_Behind_Source": 30}
+    asyncio.run(replica_set.check("sync"))
+    assert client.get("/read").json() == {"server": "primary"}
+    replica_server.status = {"Seconds_Behind_Source": None}
+    asyncio.run(replica_set.check("sync"))
+    assert replica_set.stats()[0]["in_rotation"] is False
+
+    replica_server.status = {"Seconds_Behind_Source": 1}
+    asyncio.run(replica_set.check("sync"))
+    assert client.get("/read").json() == {"server": "replica-1"}
+
+    replica_server.broken = True
+    assert client.get("/read").json() == {"server": "primary"}
+    stats = replica_set.stats()[0]
+    assert (stats["in_rotation"], stats["failures"]) == (False, 1)
+    assert "Lost connection" in stats["error"]
+
+
+def test_pick_prefers_least_loaded_then_rotates():
+    a, b = replicas.Replica("a"), replicas.Replica("b")
+    replica_set = replicas.ReplicaSet([a, b])
+    for replica in (a, b):
+        replica_set.update(replica, 0)
+    assert {replica_set.pick().host for _ in range(2)} == {"a", "b"}
+
+    a.in_use = lambda: 3
+    assert [replica_set.pick().host for _ in range(3)] == ["b"] * 3
+    replica_set.update(b, 60)
+    assert replica_set.pick() is a
+
+
+def test_cache_entries_from_replicas_expire_within_max_lag(servers):
+    cache = MemoryCache(ttl=60)
+
+    async def scenario():
+        token = replicas.set_route("replica")
+        try:
+            return await cache.get_or_load("k", lambda: database.run_query([("SELECT 1;", ())], only_one=True))
+        finally:
+            replicas.reset_route(token)
+
+    assert asyncio.run(scenario()) == {"server": "replica-1"}
+    assert cache.lru._entries["k"].expires_at - time.monotonic() <= 5
+
+
+def test_pinned_reads_skip_the_cache_and_refresh_it(servers):
+    primary, _, _ = servers
+    cache = MemoryCache(ttl=60)
+    app = routed_app()
+
+    @app.app.get("/cached")
+    async def cached():
+        return await cache.get_or_load("k", lambda: database.run_query([("SELECT 1;", ())], only_one=True))
+
+    assert app.get("/cached").json() == {"server": "replica-1"}
+    assert app.get("/cached").json() == {"server": "replica-1"}
+    app.post("/write")
+    assert app.get("/cached").json() == {"server": "primary"}
+    # The pinned read replaced the entry other clients get from the cache.
+    assert asyncio.run(cache.get("k")) == {"server": "primary"}
+
+
+def test_parse_hosts():
+    assert replicas.parse_hosts(" r1:3307, r2 ,", 3306) == [("r1", 3307), ("r2", 3306)]
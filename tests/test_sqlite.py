@@ -0,0 +1,240 @@
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from services import aggregates, search
+from services.sqlite_database import close_sqlite, translate
+from utils import pagination
+
+client = TestClient(main.app)
+
+
+@pytest.fixture(autouse=True)
+def sqlite_db(monkeypatch):
+    """A fresh in-memory database per test, through the real query path."""
+    monkeypatch.setenv("DB_MODE", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", ":memory:")
+    close_sqlite()
+    yield
+    close_sqlite()
+
+
+def test_translate_update_join_moves_set_params_first():
+    sql, order = translate(aggregates.change_rating_query("r1", 4)[0])
+    assert sql.startswith("UPDATE rating_aggregates AS a SET rating_sum = a.rating_sum - r.rating + ?")
+    assert "FROM ratings r WHERE r.spot_id = a.spot_id AND (r.id = ?)" in sql
+    assert order == (0, 1, 2, 3, 4, 5, 6)
+
+    sql, order = translate(aggregates.uncount_existing_query([("a", "u1")])[0])
+    assert "IN (VALUES (?, ?))" in sql
+    assert order == (0, 1)
+
+
+def test_review_lifecycle():
+    created = client.post("/review/spot-1/user/user-1", json={"review": "Quiet", "postDate": "2025-01-15T10:20:30Z"})
+    assert created.status_code == 201
+    review_id = created.json()["data"]["id"]
+
+    assert client.patch(f"/review/{review_id}", json={"review": "Quiet, good wifi"}).status_code == 200
+    fetched = client.get(f"/review/{review_id}").json()["data"]
+    assert fetched["review"] == "Quiet, good wifi"
+    assert fetched["created_at"] == "2025-01-15T10:20:30"
+
+    page = client.get("/reviews/spot-1")
+    assert [item["data"]["id"] for item in page.json()] == [review_id]
+    assert client.get("/reviews/spot-1", headers={"If-None-Match": page.headers["etag"]}).status_code == 304
+
+    assert client.delete(f"/review/{review_id}").status_code == 204
+    assert client.get(f"/review/{review_id}").status_code == 404
+    assert client.get("/reviews/spot-1", headers={"If-None-Match": page.headers["etag"]}).status_code == 200
+
+
+def test_spot_list_pages_follow_the_link_header():
+    for n in range(3):
+        client.post(f"/review/spot-p/user/user-{n}", json={"review": f"Review {n}", "postDate": f"2025-01-1{n}T00:00:00Z"})
+    first = client.get("/reviews/spot-p?limit=2")
+    assert [item["data"]["review"] for item in first.json()] == ["Review 2", "Review 1"]
+    next_url = first.headers["link"].split(">")[0].lstrip("<")
+    second = client.get(next_url)
+    assert [item["data"]["review"] for item in second.json()] == ["Review 0"]
+    assert "link" not in second.headers
+    assert len(client.get("/reviews/spot-p").json()) == 3
+
+
+def test_rating_upsert_keeps_average_in_step():
+    first = client.post("/rating/spot-1/user/user-1", json={"rating": 4})
+    again = client.post("/rating/spot-1/user/user-1", json={"rating": 2})
+    other = client.post("/rating/spot-1/user/user-2", json={"rating": 5})
+    assert (first.status_code, again.status_code, other.status_code) == (201, 200, 201)
+    assert again.json()["data"]["id"] == first.json()["data"]["id"]
+
+    average = client.get("/ratings/spot-1/average").json()["data"]
+    assert average["rating_count"] == 2
+    assert average["average_rating"] == 3.5
+    assert average["histogram"] == {"1": 0, "2": 1, "3": 0, "4": 0, "5": 1}
+
+    other_id = other.json()["data"]["id"]
+    client.patch(f"/rating/{other_id}", json={"rating": 3})
+    client.delete(f"/rating/{first.json()['data']['id']}")
+    average = client.get("/ratings/spot-1/average").json()["data"]
+    assert average["rating_count"] == 1
+    assert average["histogram"]["3"] == 1
+
+
+def test_bulk_rating_with_another_ratings_id_is_a_conflict():
+    taken = "00000000-0000-4000-8000-000000000001"
+    items = [
+        {"spot_id": "a", "user_id": "u1", "rating": 5, "id": taken},
+        {"spot_id": "b", "user_id": "u2", "rating": 1, "id": taken},
+    ]
+    body = client.post("/ratings/bulk", json={"items": items}).json()
+    assert [r["status"] for r in body["data"]] == [201, 409]
+    assert client.get("/ratings/a/average").json()["data"]["average_rating"] == 5.0
+    assert client.get("/ratings/b/average").json()["data"]["rating_count"] == 0
+
+
+def test_bulk_rating_replacing_an_existing_rating_reports_its_id():
+    original = client.post("/rating/s1/user/u1", json={"rating": 4}).json()["data"]["id"]
+    assert client.get(f"/rating/{original}").json()["data"]["rating"] == 4  # now cached
+
+    items = [
+        {"spot_id": "s1", "user_id": "u1", "rating": 1},
+        {"spot_id": "s1", "user_id": "u2", "rating": 5},
+    ]
+    body = client.post("/ratings/bulk", json={"items": items}).json()
+    assert [(r["status"], r["id"] == original) for r in body["data"]] == [(200, True), (201, False)]
+    assert (body["created"], body["failed"]) == (1, 0)
+    assert client.get(f"/rating/{body['data'][1]['id']}").status_code == 200
+    assert client.get(f"/rating/{original}").json()["data"]["rating"] == 1
+    assert client.get("/ratings/s1/average").json()["data"]["average_rating"] == 3.0
+
+
+def test_idempotency_key_round_trip():
+    headers = {"Idempotency-Key": "checkout-42"}
+    first = client.post("/rating/spot-1/user/user-1", json={"rating": 4}, headers=headers)
+    retry = client.post("/rating/spot-1/user/user-1", json={"rating": 4}, headers=headers)
+    assert retry.status_code == first.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+
+
+def test_leaderboard_ranks_by_bayesian_score():
+    client.post("/rating/one-five/user/u1", json={"rating": 5})
+    items = [{"spot_id": "many-fours", "user_id": f"u{n}", "rating": 5 if n % 5 else 4} for n in range(30)]
+    assert client.post("/ratings/bulk", json={"items": items}).status_code == 200
+    client.post("/rating/meh/user/u1", json={"rating": 3})
+    low = client.post("/rating/meh/user/u2", json={"rating": 1}).json()["data"]["id"]
+
+    board = client.get("/leaderboard").json()["data"]
+    assert [entry["spotId"] for entry in board] == ["many-fours", "one-five", "meh"]
+    assert board[0] == {"rank": 1, "spotId": "many-fours", "score": 4.35, "average_rating": 4.8, "rating_count": 30}
+    assert board[1]["score"] == round(35 / 11, 3) and board[1]["average_rating"] == 5.0
+
+    assert [e["spotId"] for e in client.get("/leaderboard?minCount=2").json()["data"]] == ["many-fours", "meh"]
+
+    # The score follows rating writes without a rebuild.
+    client.patch(f"/rating/{low}", json={"rating": 5})
+    meh = client.get("/leaderboard?limit=5").json()["data"][2]
+    assert meh["spotId"] == "meh" and meh["score"] == round(38 / 12, 3)
+
+
+def test_trend_from_rollups_follows_writes(monkeypatch):
+    from datetime import datetime, timedelta
+
+    from services import rollups
+    from services.sqlite_database import execute_query_sqlite
+
+    today = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+    for user, days_ago, rating in (("u1", 0, 5), ("u2", 0, 3), ("u3", 2, 4), ("u4", 40, 1)):
+        posted = (today - timedelta(days=days_ago)).isoformat() + "Z"
+        assert client.post(f"/rating/spot-t/user/{user}", json={"rating": rating, "postDate": posted}).status_code == 201
+
+    week = client.get("/ratings/spot-t/trend?last=7").json()["data"]
+    assert len(week["buckets"]) == 7 and week["end"] == today.date().isoformat()
+    assert (week["rating_count"], week["average_rating"]) == (3, 4.0)
+    assert week["buckets"][-1]["rating_count"] == 2 and week["buckets"][-3]["histogram"]["4"] == 1
+
+    assert client.get("/ratings/spot-t/trend?last=90").json()["data"]["rating_count"] == 4
+    weeks = client.get("/ratings/spot-t/trend?period=week&last=10").json()["data"]
+    assert weeks["buckets"][-1]["start"] == rollups.bucket_start("week", today.date()).isoformat()
+    assert weeks["rating_count"] == 4
+
+    # Re-rating keeps the original day; PATCH and DELETE move the buckets too.
+    client.post("/rating/spot-t/user/u2", json={"rating": 1})
+    rating_id = client.post("/rating/spot-t/user/u3", json={"rating": 5}).json()["data"]["id"]
+    client.patch(f"/rating/{rating_id}", json={"rating": 2})
+    client.delete(f"/rating/{rating_id}")
+    week = client.get("/ratings/spot-t/trend?last=7").json()["data"]
+    assert (week["rating_count"], week["histogram"]) == (2, {"1": 1, "2": 0, "3": 0, "4": 0, "5": 1})
+
+    rows = execute_query_sqlite([("SELECT * FROM rating_rollups ORDER BY period, bucket;", ())])
+    execute_query_sqlite(rollups.rebuild_queries())
+    assert execute_query_sqlite([("SELECT * FROM rating_rollups ORDER BY period, bucket;", ())]) == [
+        row for row in rows if row["rating_count"]
+    ]
+
+    assert execute_query_sqlite([rollups.compact_query(keep_days=30)]) == 1
+    monkeypatch.setenv("ROLLUP_DAY_RETENTION", "30")
+    assert client.get("/ratings/spot-t/trend?last=31").status_code == 400
+
+
+def test_review_search_ranks_and_follows_writes():
+    texts = {
+        "u1": "Quiet corner, fast wifi and outlets at every table.",
+        "u2": "Loud music but the wifi works.",
+        "u3": "Great coffee.",
+    }
+    ids = {
+        user: client.post(f"/review/spot-s/user/{user}", json={"review": text}).json()["data"]["id"]
+        for user, text in texts.items()
+    }
+    client.post("/review/spot-other/user/u1", json={"review": "Quiet too."})
+
+    found = client.get("/search/reviews?q=quiet+wifi+outlet&spotId=spot-s").json()
+    assert [item["data"]["id"] for item in found["data"]] == [ids["u1"], ids["u2"]]
+    assert found["data"][0]["data"]["score"] > found["data"][1]["data"]["score"]
+    assert len(client.get("/search/reviews?q=QUIET!").json()["data"]) == 2
+
+    first = client.get("/search/reviews?q=wifi&limit=1").json()
+    assert first["links"][0]["href"] == "next"
+    second = client.get(first["links"][0]["rel"]).json()
+    assert second["links"] == [] and len(second["data"]) == 1
+
+    client.patch(f"/review/{ids['u3']}", json={"review": "Great coffee, no wifi."})
+    client.delete(f"/review/{ids['u2']}")
+    found = client.get("/search/reviews?q=wifi").json()["data"]
+    assert {item["data"]["id"] for item in found} == {ids["u1"], ids["u3"]}
+
+    assert client.get("/search/reviews?q=%21%3F").status_code == 400
+    assert client.get("/search/reviews?q=wifi&cursor=bogus").status_code == 400
+    # Hand-made cursors can't page past SEARCH_MAX_RESULTS.
+    deep = pagination.encode_cursor(search.ORDER, [search.max_results()])
+    assert client.get(f"/search/reviews?q=wifi&cursor={deep}").status_code == 400
+
+
+def test_user_history_and_rating_lookup():
+    for n, spot in enumerate(["spot-a", "spot-b", "spot-c"]):
+        posted = f"2025-01-1{n}T10:00:00Z"
+        client.post(f"/rating/{spot}/user/u1", json={"rating": n + 2, "postDate": posted})
+        client.post(f"/review/{spot}/user/u1", json={"review": f"Review {n}", "postDate": posted})
+    client.post("/rating/spot-a/user/u2", json={"rating": 1})
+
+    first = client.get("/users/u1/ratings?limit=2").json()
+    assert [item["data"]["spot_id"] for item in first["data"]] == ["spot-c", "spot-b"]
+    rest = client.get(first["links"][0]["rel"]).json()
+    assert [item["data"]["spot_id"] for item in rest["data"]] == ["spot-a"] and rest["links"] == []
+
+    reviews = client.get("/users/u1/reviews?order=oldest&fields=spot_id,review").json()["data"]
+    assert [item["data"] for item in reviews][0] == {"id": reviews[0]["data"]["id"], "spot_id": "spot-a", "review": "Review 0"}
+
+    found = client.post("/users/u1/ratings/lookup", json={"spotIds": ["spot-b", "spot-x", "spot-a"]}).json()
+    assert [(item["data"]["spotId"], item["data"].get("rating")) for item in found] == [("spot-b", 3), ("spot-x", None), ("spot-a", 2)]
+    assert found[1]["links"] == [] and found[0]["links"][0]["rel"] == f"/rating/{found[0]['data']['id']}"
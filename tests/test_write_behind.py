@@ -0,0 +1,134 @@
+import asyncio
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from services.write_behind import WriteBehindQueue
+
+
+def test_batches_and_drains_on_stop():
+    batches = []
+
+    async def flush(batch):
+        batches.append(list(batch))
+        return 0
+
+    async def scenario():
+        queue = WriteBehindQueue(flush, max_size=100, batch_size=3, flush_interval=10)
+        queue.start()
+        assert all(queue.offer(i) for i in range(7))
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(scenario())
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+    assert stats["accepted"] == 7
+    assert stats["flushed"] == 7
+    assert stats["flushes"] == 3
+    assert stats["depth"] == 0
+    assert not stats["running"]
+
+
+def test_flushes_after_interval():
+    batches = []
+
+    async def flush(batch):
+        batches.append(list(batch))
+        return 0
+
+    async def scenario():
+        queue = WriteBehindQueue(flush, batch_size=100, flush_interval=0.01)
+        queue.start()
+        queue.offer("a")
+        await asyncio.sleep(0.1)
+        flushed_before_stop = list(batches)
+        await queue.stop()
+        return flushed_before_stop
+
+    assert asyncio.run(scenario()) == [["a"]]
+
+
+def test_rejects_when_full_or_stopped():
+    async def flush(batch):
+        await asyncio.sleep(0)
+        return 0
+
+    async def scenario():
+        queue = WriteBehindQueue(flush, max_size=2, batch_size=10, flush_interval=10)
+        assert not queue.offer("before start")
+        queue.start()
+        results = [queue.offer(i) for i in range(3)]
+        await queue.stop()
+        return results, queue.stats()
+
+    results, stats = asyncio.run(scenario())
+    assert results == [True, True, False]
+    assert stats["rejected"] == 2
+    assert stats["flushed"] == 2
+
+
+def test_counts_failed_items():
+    async def flush(batch):
+        if "bad" in batch:
+            raise RuntimeError("db down")
+        return 1
+
+    async def scenario():
+        queue = WriteBehindQueue(flush, batch_size=2, flush_interval=10)
+        queue.start()
+        for item in ["a", "b", "bad", "c"]:
+            queue.offer(item)
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["failed"] == 1 + 2
+    assert stats["flushed"] == 1
+
+
+def test_queued_rating_answers_with_the_id_it_will_have(monkeypatch):
+    """The upsert keeps the existing row's id, so the 202 and its link must use that id."""
+    from datetime import datetime
+
+    from fastapi.testclient import TestClient
+
+    import main
+
+    existing_id = "00000000-0000-4000-8000-0000000000aa"
+    queued = []
+
+    class FakeQueue:
+        def offer(self, item):
+            queued.append(item)
+            return True
+
+    async def fake_run_query(queries, only_one=False):
+        sql, params = queries[-1]
+        if sql.startswith("SELECT * FROM ratings WHERE spot_id"):
+            if params == ("s1", "old"):
+                return {"id": existing_id, "created_at": datetime(2025, 1, 1)}
+            return None
+        upsert = next(params for sql, params in queries if sql.startswith("INSERT INTO ratings"))
+        return [{"id": upsert[i], "spot_id": upsert[i + 1], "user_id": upsert[i + 2]} for i in range(0, len(upsert), 5)]
+
+    monkeypatch.setattr(main, "RATING_WRITE_BEHIND", True)
+    monkeypatch.setattr(main, "rating_queue", FakeQueue())
+    monkeypatch.setattr(main, "run_query", fake_run_query)
+    client = TestClient(main.app)
+
+    response = client.post("/rating/s1/user/old", json={"rating": 3})
+    assert response.status_code == 202
+    assert response.json()["data"]["id"] == existing_id
+    assert response.json()["links"][0]["rel"] == f"/rating/{existing_id}"
+
+    first = client.post("/rating/s1/user/new", json={"rating": 4}).json()["data"]["id"]
+    second = client.post("/rating/s1/user/new", json={"rating": 5}).json()["data"]["id"]
+    assert first == second
+    assert [str(item.id) for item in queued] == [existing_id, first, first]
+
+    assert asyncio.run(main.flush_ratings(queued)) == 0
+    assert main.pending_rating_ids == {}
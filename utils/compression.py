@@ -0,0 +1,145 @@
+"""Response compression: content negotiation, encoders and precompressed payloads.
+
+Settings, read at import:
+
+- ``COMPRESSION_ENABLED``         compress responses (default true)
+- ``COMPRESSION_MIN_SIZE``        bytes below which a response is sent as is (default 1024)
+- ``COMPRESSION_GZIP_LEVEL``      zlib level 1-9 for dynamic responses (default 6)
+- ``COMPRESSION_BROTLI_QUALITY``  brotli quality 0-11 for dynamic responses (default 4)
+
+Brotli is used when the ``brotli`` package is installed and the client
+accepts it; gzip otherwise. Dynamic responses are compressed by
+:class:`middleware.compression.CompressionMiddleware` at the levels above,
+which trade ratio for CPU per request. :class:`StaticPayload` bodies never
+change, so they are compressed once at the highest levels.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import zlib
+from typing import Callable, Dict, Optional, Sequence
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from utils import http_cache
+from utils.config import env_bool, env_int
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+ENABLED = env_bool("COMPRESSION_ENABLED", True)
+MIN_SIZE = env_int("COMPRESSION_MIN_SIZE", 1024)
+GZIP_LEVEL = env_int("COMPRESSION_GZIP_LEVEL", 6)
+BROTLI_QUALITY = env_int("COMPRESSION_BROTLI_QUALITY", 4)
+
+# Server preference when the client accepts several equally.
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/yaml", "text/")
+
+
+def compressible(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def negotiate(accept_encoding: Optional[str], available: Sequence[str] = ENCODINGS) -> Optional[str]:
+    """The encoding of ``available`` the client prefers, or None for identity."""
+    if not accept_encoding or not available:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class Encoder:
+    """Incremental compressor; each :meth:`chunk` returns output the client can decode at once."""
+
+    def __init__(self, encoding: str, level: Optional[int] = None):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY if level is None else level)
+        else:
+            self._zlib = zlib.compressobj(GZIP_LEVEL if level is None else level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    return Encoder(encoding, level).finish(data)
+
+
+MAX_LEVELS = {"br": 11, "gzip": 9}
+
+
+class StaticPayload:
+    """A body that never changes, kept with its compressed variants and ETag."""
+
+    def __init__(self, body: bytes, media_type: str):
+        self.body = body
+        self.media_type = media_type
+        self.etag = http_cache.make_etag(hashlib.sha1(body).hexdigest())
+        self.variants: Dict[str, bytes] = {}
+        if ENABLED and len(body) >= MIN_SIZE and compressible(media_type):
+            self.variants = {encoding: compress(body, encoding, MAX_LEVELS[encoding]) for encoding in ENCODINGS}
+
+    def response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": http_cache.cache_control("static")}
+        if self.variants:
+            headers["Vary"] = "Accept-Encoding"
+        if http_cache.not_modified(request, self.etag, None):
+            return Response(status_code=304, headers=headers)
+        encoding = negotiate(request.headers.get("accept-encoding"), tuple(self.variants))
+        if encoding is None:
+            return Response(self.body, media_type=self.media_type, headers=headers)
+        headers["Content-Encoding"] = encoding
+        return Response(self.variants[encoding], media_type=self.media_type, headers=headers)
+
+
+class StaticPayloads:
+    """Named payloads, each built on first use (or by :meth:`warm` at startup) and then kept."""
+
+    def __init__(self):
+        self._builders: Dict[str, Callable[[], StaticPayload]] = {}
+        self._built: Dict[str, StaticPayload] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, build: Callable[[], StaticPayload]) -> None:
+        self._builders[name] = build
+
+    def get(self, name: str) -> StaticPayload:
+        payload = self._built.get(name)
+        if payload is None:
+            with self._lock:
+                payload = self._built.get(name)
+                if payload is None:
+                    payload = self._built[name] = self._builders[name]()
+        return payload
+
+    def warm(self) -> None:
+        for name in self._builders:
+            self.get(name)
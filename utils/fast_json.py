@@ -0,0 +1,43 @@
+"""JSON rendering for responses built from our own database rows.
+
+Returning a dict from a route with a ``response_model`` makes FastAPI
+validate it into models, dump those back to plain data and then encode
+that with :mod:`json` — three passes over every row, which dominates the
+list endpoints at large page sizes. Rows read with our own SELECTs already
+have the right types, so :class:`FastJSONResponse` skips straight to
+encoding, with orjson when it is installed and pydantic-core's encoder
+otherwise. Routes that use it keep their ``response_model`` for the OpenAPI
+schema.
+
+Both encoders write naive datetimes (how DATETIME columns come back) and
+UUIDs exactly as the validated path does.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Any
+
+from pydantic_core import to_json
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional; pydantic-core is nearly as fast
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Can't encode value of type {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return to_json(content)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,75 @@
+"""ETag / Last-Modified validators and Cache-Control for the GET endpoints.
+
+Cache-Control is configurable per route group:
+
+- ``CACHE_CONTROL_REVIEWS``  GET /reviews/{spotId}
+- ``CACHE_CONTROL_RATINGS``  GET /ratings/{spotId}
+- ``CACHE_CONTROL_AVERAGE``  GET /ratings/{spotId}/average
+- ``CACHE_CONTROL_STATIC``   /, /docs, /openapi.json and the other static payloads
+
+All default to ``public, max-age=0, must-revalidate`` so clients and the CDN
+keep a copy but check it with a conditional request every time.
+"""
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Union
+
+from starlette.requests import Request
+
+from utils.config import env_str
+
+DEFAULT_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+ROUTES = ("reviews", "ratings", "average", "static")
+
+
+def cache_control(route: str) -> str:
+    return env_str(f"CACHE_CONTROL_{route.upper()}", DEFAULT_CACHE_CONTROL)
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _as_utc(value: Union[datetime, str, None]) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def validator_headers(route: str, etag: str, last_modified: Union[datetime, str, None]) -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control(route)}
+    last_modified = _as_utc(last_modified)
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+
+def not_modified(request: Request, etag: str, last_modified: Union[datetime, str, None]) -> bool:
+    """True when the client's copy is current. If-None-Match wins over If-Modified-Since."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison: W/"x" and "x" match.
+        wanted = etag.removeprefix("W/")
+        return any(tag.strip().removeprefix("W/") == wanted for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    last_modified = _as_utc(last_modified)
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified <= since
+    return False
@@ -0,0 +1,195 @@
+"""Request and database timing metrics, exposed in Prometheus text format.
+
+:class:`middleware.timing.TimingMiddleware` times every request by route
+template; :class:`middleware.timing.TimedRoute` splits the time between the
+endpoint and FastAPI's validation/serialization around it; the executors in
+``services/*database.py`` report connection wait, query and fetch time and
+rows returned through :func:`observe_db`. ``GET /metrics`` renders it all
+and, with ``SERVER_TIMING=true``, each response carries its own breakdown in
+a ``Server-Timing`` header.
+
+``METRICS_ENABLED=false`` skips the middleware and route wrapper entirely;
+what is left is one flag check per database batch.
+"""
+from __future__ import annotations
+
+import threading
+from contextvars import ContextVar
+from typing import Optional, Sequence
+
+from utils.config import env_bool
+
+ENABLED = env_bool("METRICS_ENABLED", True)
+SERVER_TIMING = env_bool("SERVER_TIMING", False)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+ROWS_BUCKETS = (0, 1, 10, 50, 100, 1_000, 10_000)
+
+_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._series: dict = {}
+
+    def observe(self, value: float, *label_values) -> None:
+        with _lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for key, counts, total, count in sorted(series):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: dict = {}
+
+    def inc(self, amount: float = 1, *label_values) -> None:
+        with _lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with _lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labels, key)} {value:g}" for key, value in values)
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time from request to the last response byte.",
+    LATENCY_BUCKETS, ("method", "route", "status"),
+)
+ENDPOINT_SECONDS = Histogram(
+    "http_endpoint_duration_seconds", "Time spent in the endpoint function, database calls included.",
+    LATENCY_BUCKETS, ("method", "route"),
+)
+SERIALIZE_SECONDS = Histogram(
+    "http_serialize_duration_seconds",
+    "Request parsing plus response validation and JSON encoding around the endpoint.",
+    LATENCY_BUCKETS, ("method", "route"),
+)
+RESPONSE_BYTES = Histogram(
+    "http_response_size_bytes", "Response body size.", SIZE_BUCKETS, ("method", "route"),
+)
+DB_SECONDS = Histogram(
+    "db_phase_duration_seconds",
+    "Database time per batch: connect (waiting for a pooled connection), query and fetch.",
+    LATENCY_BUCKETS, ("phase",),
+)
+DB_ROWS = Histogram("db_rows_returned", "Rows returned per database batch.", ROWS_BUCKETS)
+DB_BATCHES = Counter("db_batches_total", "Database batches run, by outcome.", ("outcome",))
+
+REGISTRY = [REQUEST_SECONDS, ENDPOINT_SECONDS, SERIALIZE_SECONDS, RESPONSE_BYTES, DB_SECONDS, DB_ROWS, DB_BATCHES]
+
+
+class RequestTimings:
+    """What one request spent where; shared with the threadpool through a ContextVar."""
+    __slots__ = ("db_connect", "db_query", "db_fetch", "db_rows", "db_batches", "endpoint", "route")
+
+    def __init__(self):
+        self.db_connect = self.db_query = self.db_fetch = 0.0
+        self.db_rows = self.db_batches = 0
+        self.endpoint = self.route = None
+
+    def server_timing(self, total: float) -> str:
+        parts = [
+            f'db;dur={(self.db_connect + self.db_query + self.db_fetch) * 1000:.2f};desc="{self.db_batches} batch(es), {self.db_rows} row(s)"',
+            f"db-connect;dur={self.db_connect * 1000:.2f}",
+            f"db-query;dur={self.db_query * 1000:.2f}",
+            f"db-fetch;dur={self.db_fetch * 1000:.2f}",
+        ]
+        if self.endpoint is not None:
+            parts.append(f"endpoint;dur={self.endpoint * 1000:.2f}")
+        if self.route is not None and self.endpoint is not None:
+            parts.append(f"serialize;dur={(self.route - self.endpoint) * 1000:.2f}")
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> tuple:
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token) -> None:
+    _current.reset(token)
+
+
+def current() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+def observe_db(connect: float, query: float, fetch: float, rows: int, ok: bool = True) -> None:
+    """Called by the executors once per batch."""
+    if not ENABLED:
+        return
+    DB_SECONDS.observe(connect, "connect")
+    DB_SECONDS.observe(query, "query")
+    DB_SECONDS.observe(fetch, "fetch")
+    DB_ROWS.observe(rows)
+    DB_BATCHES.inc(1, "ok" if ok else "error")
+    timings = _current.get()
+    if timings is not None:
+        timings.db_connect += connect
+        timings.db_query += query
+        timings.db_fetch += fetch
+        timings.db_rows += rows
+        timings.db_batches += 1
+
+
+def observe_request(method: str, route: str, status: int, seconds: float, size: int, timings: RequestTimings) -> None:
+    REQUEST_SECONDS.observe(seconds, method, route, str(status))
+    RESPONSE_BYTES.observe(size, method, route)
+    if timings.endpoint is not None:
+        ENDPOINT_SECONDS.observe(timings.endpoint, method, route)
+        if timings.route is not None:
+            SERIALIZE_SECONDS.observe(max(0.0, timings.route - timings.endpoint), method, route)
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
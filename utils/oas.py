@@ -0,0 +1,58 @@
+"""The checked-in ``oas.yaml``, generated from the app's OpenAPI schema.
+
+GET /oas.yaml serves the file as is, so regenerate it whenever a route or
+model changes::
+
+    python -m utils.oas           # rewrite oas.yaml
+    python -m utils.oas --check   # exit 1 if oas.yaml is out of date
+
+Needs PyYAML, which only this command (not the app) uses.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from typing import Optional
+
+OAS_YAML_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "oas.yaml")
+
+
+def to_yaml(schema: dict) -> str:
+    """``schema`` as YAML, keys in the order FastAPI emits them and lists indented under their key."""
+    import yaml
+
+    class Dumper(yaml.SafeDumper):
+        def increase_indent(self, flow=False, indentless=False):
+            return super().increase_indent(flow, False)
+
+    # Round trip through JSON so enums, tuples and the like become plain YAML types.
+    plain = json.loads(json.dumps(schema))
+    return yaml.dump(plain, Dumper=Dumper, sort_keys=False, allow_unicode=True, width=1000)
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.oas", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--check", action="store_true", help="fail instead of writing if oas.yaml is out of date")
+    args = parser.parse_args(argv)
+
+    from main import app
+
+    text = to_yaml(app.openapi())
+    with open(OAS_YAML_PATH, encoding="utf-8") as f:
+        current = f.read()
+    if text == current:
+        print("oas.yaml is up to date.")
+        return 0
+    if args.check:
+        print("oas.yaml is out of date; run python -m utils.oas", file=sys.stderr)
+        return 1
+    with open(OAS_YAML_PATH, "w", encoding="utf-8") as f:
+        f.write(text)
+    print("Wrote oas.yaml.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Keyset (cursor) pagination and field projection for the list endpoints.
+
+A cursor is the sort key of the last row on the previous page, so each page
+is an index range scan starting right after it instead of an OFFSET that
+re-reads every earlier row. Cursors are opaque url-safe base64 JSON.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence
+
+
+class PaginationError(ValueError):
+    """Bad cursor, order or fields parameter; surfaced to clients as a 400."""
+
+
+def encode_cursor(order: str, values: Sequence) -> str:
+    payload = [order, [v.isoformat() if isinstance(v, datetime) else v for v in values]]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order: str, columns: Sequence[str]) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_order, values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise PaginationError("Invalid cursor.")
+    if cursor_order != order or len(values) != len(columns):
+        raise PaginationError("Cursor does not match the requested order.")
+    decoded = []
+    for column, value in zip(columns, values):
+        if column.endswith("_at") and isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                raise PaginationError("Invalid cursor.")
+        decoded.append(value)
+    return decoded
+
+
+def keyset_condition(keys: Sequence[tuple], values: Sequence) -> tuple:
+    """``WHERE`` fragment selecting rows strictly after ``values``.
+
+    ``keys`` is the ORDER BY as ``(column, descending)`` pairs. The condition
+    is spelled out as nested OR/AND rather than a row comparison because the
+    sort directions can be mixed and MySQL only range-scans the expanded form
+    reliably.
+    """
+    column, descending = keys[0]
+    op = "<" if descending else ">"
+    if len(keys) == 1:
+        return f"{column} {op} %s", (values[0],)
+    rest_sql, rest_params = keyset_condition(keys[1:], values[1:])
+    return (
+        f"({column} {op} %s OR ({column} = %s AND {rest_sql}))",
+        (values[0], values[0], *rest_params),
+    )
+
+
+def parse_fields(fields: Optional[str], allowed: dict) -> list:
+    """Output field names requested by ``fields=a,b``; all of ``allowed`` if omitted.
+
+    ``id`` is always included because the per-item links are built from it.
+    """
+    if not fields:
+        return list(allowed)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise PaginationError(
+            f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(allowed)}."
+        )
+    return ["id"] + [f for f in dict.fromkeys(requested) if f != "id"]
+
+
+def page_query(
+    table: str,
+    filter_column: str,
+    filter_value,
+    columns: Sequence[str],
+    keys: Sequence[tuple],
+    order: str,
+    cursor: Optional[str],
+    limit: Optional[int],
+) -> tuple:
+    """SELECT for one page. Fetches ``limit + 1`` rows to know if there is a next page.
+
+    With ``limit`` None every remaining row is selected.
+    """
+    key_columns = [column for column, _ in keys]
+    select = ", ".join(dict.fromkeys([*columns, *key_columns]))
+    where = f"{filter_column} = %s"
+    params: tuple = (filter_value,)
+    if cursor:
+        condition, cursor_params = keyset_condition(keys, decode_cursor(cursor, order, key_columns))
+        where += f" AND {condition}"
+        params += cursor_params
+    order_by = ", ".join(f"{column} {'DESC' if desc else 'ASC'}" for column, desc in keys)
+    if limit is None:
+        return f"SELECT {select} FROM {table} WHERE {where} ORDER BY {order_by};", params
+    return (
+        f"SELECT {select} FROM {table} WHERE {where} ORDER BY {order_by} LIMIT %s;",
+        params + (limit + 1,),
+    )
+
+
+def split_page(rows: list, keys: Sequence[tuple], order: str, limit: Optional[int]) -> tuple:
+    """``(rows, next_cursor)``; ``next_cursor`` is None on the last page."""
+    rows = list(rows)
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(order, [last[column] for column, _ in keys])
@@ -0,0 +1,70 @@
+"""Slow-query log.
+
+The executors in ``services/*database.py`` time every statement and pass it
+to :func:`observe`; statements slower than ``SLOW_QUERY_MS`` (default 500,
+0 turns the log off) are logged as a warning on the ``slow_queries`` logger
+with their duration, row count and the route template of the request that
+ran them.
+
+Parameters are never logged: statements use ``%s`` placeholders, so the SQL
+text holds no user values, and it is logged with the placeholders as ``?``
+and long placeholder lists (bulk inserts, ``IN`` lists) folded into a count.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from contextvars import ContextVar
+from typing import Optional
+
+from utils.config import env_float
+
+THRESHOLD_MS = env_float("SLOW_QUERY_MS", 500.0)
+ENABLED = THRESHOLD_MS > 0
+_threshold = THRESHOLD_MS / 1000
+
+logger = logging.getLogger("slow_queries")
+
+# The ASGI scope of the request being served; routing fills in
+# scope["route"], so the template is read when something is logged.
+_scope: ContextVar[Optional[dict]] = ContextVar("request_scope", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+_PLACEHOLDER_RUN = re.compile(r"\?(?:, \?){7,}")
+_ROW_RUN = re.compile(r"(\((?:\?, )*\?\))(?:, \1){3,}")
+
+
+def set_request_scope(scope: Optional[dict]):
+    return _scope.set(scope)
+
+
+def reset_request_scope(token) -> None:
+    _scope.reset(token)
+
+
+def current_route() -> Optional[str]:
+    scope = _scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def redact(sql: str) -> str:
+    """``sql`` on one line, placeholders as ``?``, string literals and long lists folded."""
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    sql = _STRING_LITERAL.sub("'?'", sql)
+    sql = sql.replace("%s", "?")
+    sql = _ROW_RUN.sub(lambda m: f"{m.group(1)}, ... x{m.group(0).count(m.group(1))}", sql)
+    return _PLACEHOLDER_RUN.sub(lambda m: f"?, ... x{m.group(0).count('?')}", sql)
+
+
+def observe(sql: str, params, seconds: float, rows: int) -> None:
+    """Log ``sql`` if it ran for longer than the threshold."""
+    if not ENABLED or seconds < _threshold:
+        return
+    logger.warning(
+        "slow query %.1f ms rows=%d params=%d route=%s sql=%s",
+        seconds * 1000, rows, len(params or ()), current_route() or "-", redact(sql),
+    )